@@ -37,6 +37,8 @@ setup(
             'mycroft-skills=mycroft.skills.main:main',
             'mycroft-audio=mycroft.audio.main:main',
             'mycroft-echo-observer=mycroft.messagebus.client.ws:echo',
+            'mycroft-bus-record=mycroft.messagebus.record:main',
+            'mycroft-bus-replay=mycroft.messagebus.replay:main',
             'mycroft-audio-test=mycroft.util.audio_test:main',
             'mycroft-enclosure-client=mycroft.client.enclosure.main:main',
             'mycroft-skill-container=mycroft.skills.container:main',
@@ -405,14 +405,14 @@ class AudioService(object):
             Returns track info on the message bus.
 
             Args:
-                message: message bus message, not used but required
+                message: message bus message, replied to with the info
         """
         if self.current:
             track_info = self.current.track_info()
         else:
             track_info = {}
-        self.ws.emit(Message('mycroft.audio.service.track_info_reply',
-                             data=track_info))
+        self.ws.emit(message.reply('mycroft.audio.service.track_info_reply',
+                                   data=track_info))
 
     def setup_pulseaudio_handlers(self, pulse_choice=None):
         """
@@ -461,6 +461,8 @@ def main():
     """ Main function. Run when file is invoked. """
     reset_sigint_handler()
     ws = WebsocketClient()
+    # Only route messages this process has handlers for
+    ws.subscribe()
     Configuration.init(ws)
     speech.init(ws)
 
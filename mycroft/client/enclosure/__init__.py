@@ -243,6 +243,8 @@ class Enclosure(object):
 
     def __init__(self):
         self.ws = WebsocketClient()
+        # Only route messages this process has handlers for
+        self.ws.subscribe()
 
         Configuration.init(self.ws)
 
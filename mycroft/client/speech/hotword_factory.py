@@ -24,12 +24,19 @@ from os.path import dirname, exists, join, abspath, expanduser, isdir, isfile
 from os import mkdir, getcwd, chdir
 from time import time as get_time
 
+from collections import deque
+from mycroft.client.speech.ring_buffer import RingBuffer
 from mycroft.configuration import Configuration
 from subprocess import Popen, PIPE, call
-from threading import Thread
+from threading import Condition, Thread
 
 from mycroft.util.log import LOG
 
+try:
+    from time import thread_time as get_thread_time
+except ImportError:  # Python 2, count the wall time of the thread instead
+    from time import time as get_thread_time
+
 
 RECOGNIZER_DIR = join(abspath(dirname(__file__)), "recognizer")
 
@@ -52,8 +59,29 @@ class HotWordEngine(object):
     def update(self, chunk):
         pass
 
+    def reset(self):
+        """ Forget the audio passed to update(), called when the wake word
+            has been heard and the audio goes to the recording instead.
+        """
+        pass
+
+    def stop(self):
+        """ Release the resources of the engine. """
+        pass
+
 
 class PocketsphinxHotWord(HotWordEngine):
+    """
+        Keyword spotting with pocketsphinx.
+
+        found_wake_word() decodes the audio it is given. With
+        "incremental_wake_word" in the listener config the audio passed to
+        update() is decoded as it arrives instead and found_wake_word()
+        only checks the result.
+    """
+    # Seconds of audio decoded before the utterance is restarted
+    MAX_UTTERANCE_SEC = 30
+
     def __init__(self, key_phrase="hey mycroft", config=None, lang="en-us"):
         super(PocketsphinxHotWord, self).__init__(key_phrase, config, lang)
         # Hotword module imports
@@ -73,6 +101,18 @@ class PocketsphinxHotWord(HotWordEngine):
         config = self.create_config(dict_name, Decoder.default_config())
         self.decoder = Decoder(config)
 
+        # State of decoding the audio passed to update()
+        self.incremental = self.listener_config.get('incremental_wake_word',
+                                                    False)
+        self.in_utterance = False
+        self.found = False
+        self.utterance_bytes = 0
+        # The end of the audio, decoded again when a new utterance starts
+        # in case it holds the beginning of the wake word
+        len_phoneme = self.listener_config.get('phoneme_duration', 120)
+        self.overlap = RingBuffer(int(self.num_phonemes * len_phoneme /
+                                      1000.0 * self.sample_rate) * 2)
+
     def create_dict(self, key_phrase, phonemes):
         (fd, file_name) = tempfile.mkstemp()
         words = key_phrase.split()
@@ -104,7 +144,45 @@ class PocketsphinxHotWord(HotWordEngine):
             metrics.timer("mycroft.stt.local.time_s", time.time() - start)
         return self.decoder.hyp()
 
+    def update(self, chunk):
+        """ Decode the audio incrementally, every chunk only once. """
+        if not self.incremental:
+            return
+        if not self.in_utterance:
+            self.decoder.start_utt()
+            self.in_utterance = True
+            self.utterance_bytes = 0
+            if len(self.overlap):
+                self.decoder.process_raw(self.overlap.get(), False, False)
+        self.decoder.process_raw(chunk, False, False)
+        self.utterance_bytes += len(chunk)
+        self.overlap.append(chunk)
+
+        hyp = self.decoder.hyp()
+        if hyp and self.key_phrase in hyp.hypstr.lower():
+            self.found = True
+            self.overlap.clear()
+            self.end_utterance()
+        elif (self.utterance_bytes >
+              self.MAX_UTTERANCE_SEC * self.sample_rate * 2):
+            # Keep the decoder state small while nothing is said
+            self.end_utterance()
+
+    def end_utterance(self):
+        self.decoder.end_utt()
+        self.in_utterance = False
+
+    def reset(self):
+        if self.in_utterance:
+            self.end_utterance()
+        self.found = False
+        self.overlap.clear()
+
     def found_wake_word(self, frame_data):
+        if self.incremental:
+            # The audio has already been decoded by update()
+            found, self.found = self.found, False
+            return found
         hyp = self.transcribe(frame_data)
         return hyp and self.key_phrase in hyp.hypstr.lower()
 
@@ -252,6 +330,199 @@ class SnowboyHotWord(HotWordEngine):
         return wake_word == 1
 
 
+class HotWordWorker(Thread):
+    """ Run a hotword engine in a thread of its own.
+
+        Chunks are passed to update() in order, a check runs after the
+        chunks received before it. Only the latest check is kept when the
+        engine falls behind, and the oldest chunks are dropped when more
+        than max_backlog are waiting.
+
+        With "cpu_budget" in the engine config, e.g. 0.25 for a quarter of
+        a CPU core, the worker pauses after every call so the engine uses
+        no more than that on average.
+
+        Args:
+            engine (HotWordEngine): engine to run
+            multiplexer (HotWordMultiplexer): receives the check results
+            max_backlog (int): chunks waiting before the oldest is dropped
+    """
+
+    def __init__(self, engine, multiplexer, max_backlog=64):
+        super(HotWordWorker, self).__init__()
+        self.daemon = True
+        self.engine = engine
+        self.multiplexer = multiplexer
+        self.max_backlog = max_backlog
+        self.budget = engine.config.get("cpu_budget")
+        self.cond = Condition()
+        self.chunks = deque()
+        self.check = None  # (frame_data, check id)
+        self.resetting = False
+        self.cpu_time = 0.0
+        self.checks = 0
+        self.dropped = 0
+        self.running = True
+
+    def update(self, chunk):
+        with self.cond:
+            if len(self.chunks) >= self.max_backlog:
+                self.chunks.popleft()
+                self.dropped += 1
+            self.chunks.append(chunk)
+            self.cond.notify()
+
+    def request_check(self, frame_data, check_id):
+        with self.cond:
+            self.check = (frame_data, check_id)
+            self.cond.notify()
+
+    def clear(self):
+        with self.cond:
+            self.chunks.clear()
+            self.check = None
+
+    def reset(self):
+        """ Drop the waiting audio and reset the engine in this thread. """
+        with self.cond:
+            self.chunks.clear()
+            self.check = None
+            self.resetting = True
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while (self.running and not self.chunks and
+                       self.check is None and not self.resetting):
+                    self.cond.wait()
+                if not self.running:
+                    return
+                reset, self.resetting = self.resetting, False
+                if reset:
+                    chunk, check = None, None
+                elif self.chunks:
+                    chunk, check = self.chunks.popleft(), None
+                else:
+                    chunk, check = None, self.check
+                    self.check = None
+
+            start = get_thread_time()
+            found = False
+            try:
+                if reset:
+                    self.engine.reset()
+                elif check is None:
+                    self.engine.update(chunk)
+                else:
+                    found = self.engine.found_wake_word(check[0])
+            except Exception:
+                LOG.exception('Hotword engine for ' +
+                              self.engine.key_phrase + ' failed')
+            used = get_thread_time() - start
+            self.cpu_time += used
+            if check is not None:
+                self.checks += 1
+                self.multiplexer.check_done(self, check[1], found)
+            if self.budget and used > 0:
+                time.sleep(used * (1.0 / self.budget - 1))
+
+
+class HotWordMultiplexer(HotWordEngine):
+    """ Listen for several hotwords on the same audio.
+
+        Every engine runs in a HotWordWorker thread, update() and
+        found_wake_word() hand the audio to all of them without waiting
+        for the slowest. found_wake_word() waits at most max_wait seconds
+        for the engines to check the audio, a detection arriving later is
+        returned by the next call. key_phrase is the phrase that fired
+        last, the first engine's phrase before any detection.
+
+        Args:
+            engines (list): HotWordEngine instances, the first is the main
+                            wake word
+            max_wait (float): seconds found_wake_word() waits for results
+            max_backlog (int): chunks an engine may fall behind
+    """
+
+    def __init__(self, engines, max_wait=0.05, max_backlog=64):
+        self.engines = engines
+        self.key_phrase = engines[0].key_phrase
+        self.num_phonemes = max(e.num_phonemes for e in engines)
+        self.config = engines[0].config
+        self.listener_config = engines[0].listener_config
+        self.lang = engines[0].lang
+        self.max_wait = max_wait
+        self.found_phrase = None
+        self.cond = Condition()
+        self.check_id = 0
+        self.pending = 0  # Engines yet to check the latest audio
+        self.reset_id = 0  # Detections in older checks are ignored
+        self.workers = [HotWordWorker(e, self, max_backlog) for e in engines]
+        for worker in self.workers:
+            worker.start()
+
+    def update(self, chunk):
+        for worker in self.workers:
+            worker.update(chunk)
+
+    def found_wake_word(self, frame_data):
+        with self.cond:
+            self.check_id += 1
+            self.pending = len(self.workers)
+            check_id = self.check_id
+        for worker in self.workers:
+            worker.request_check(frame_data, check_id)
+
+        deadline = time.time() + self.max_wait
+        with self.cond:
+            while self.found_phrase is None and self.pending > 0:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            if self.found_phrase is None:
+                return False
+            self.key_phrase = self.found_phrase
+            self.found_phrase = None
+            self.reset_id = self.check_id
+        # The audio queued for the engines led up to this detection
+        for worker in self.workers:
+            worker.clear()
+        return True
+
+    def reset(self):
+        for worker in self.workers:
+            worker.reset()
+
+    def check_done(self, worker, check_id, found):
+        with self.cond:
+            if found and check_id > self.reset_id and not self.found_phrase:
+                LOG.debug('Hotword found: ' + worker.engine.key_phrase)
+                self.found_phrase = worker.engine.key_phrase
+            if check_id == self.check_id:
+                self.pending -= 1
+            self.cond.notify_all()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+        for engine in self.engines:
+            engine.stop()
+
+    def stats(self):
+        """ CPU seconds, checks and dropped chunks per engine. """
+        return {w.engine.key_phrase: {'cpu_time': w.cpu_time,
+                                      'checks': w.checks,
+                                      'dropped': w.dropped}
+                for w in self.workers}
+
+
 class HotWordFactory(object):
     CLASSES = {
         "pocketsphinx": PocketsphinxHotWord,
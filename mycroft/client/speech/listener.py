@@ -13,7 +13,9 @@
 # limitations under the License.
 #
 import time
-from threading import Thread
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
 import sys
 import speech_recognition as sr
 from pyee import EventEmitter
@@ -21,7 +23,8 @@ from requests import RequestException, HTTPError
 from requests.exceptions import ConnectionError
 
 from mycroft import dialog
-from mycroft.client.speech.hotword_factory import HotWordFactory
+from mycroft.client.speech.hotword_factory import HotWordFactory, \
+    HotWordMultiplexer
 from mycroft.client.speech.mic import MutableMicrophone, ResponsiveRecognizer
 from mycroft.configuration import Configuration
 from mycroft.metrics import MetricsAggregator, Stopwatch, report_timing
@@ -39,7 +42,7 @@ class AudioProducer(Thread):
     mic for potential speech chunks and pushes them onto the queue.
     """
 
-    def __init__(self, state, queue, mic, recognizer, emitter):
+    def __init__(self, state, queue, mic, recognizer, emitter, stt=None):
         super(AudioProducer, self).__init__()
         self.daemon = True
         self.state = state
@@ -47,15 +50,25 @@ class AudioProducer(Thread):
         self.mic = mic
         self.recognizer = recognizer
         self.emitter = emitter
+        self.stt = stt
 
     def run(self):
         with self.mic as source:
             self.recognizer.adjust_for_ambient_noise(source)
             while self.state.running:
+                # Transcribe the phrase while it is recorded, the audio is
+                # only checked for the wake up word while sleeping
+                stream = None
+                if self.stt and not self.state.sleeping:
+                    stream = self.stt.stream(on_partial=self.emit_partial)
                 try:
-                    audio = self.recognizer.listen(source, self.emitter)
-                    self.queue.put(audio)
+                    audio = self.recognizer.listen(source, self.emitter,
+                                                   stream)
+                    if audio is not None:
+                        self.queue.put((audio, stream, time.time()))
                 except IOError as e:
+                    if stream:
+                        stream.cancel()
                     # NOTE: Audio stack on raspi is slightly different, throws
                     # IOError every other listen, almost like it can't handle
                     # buffering audio between listen loops.
@@ -63,6 +76,11 @@ class AudioProducer(Thread):
                     # http://stackoverflow.com/questions/10733903/pyaudio-input-overflowed
                     self.emitter.emit("recognizer_loop:ioerror", e)
 
+    def emit_partial(self, text):
+        self.emitter.emit('recognizer_loop:partial_utterance',
+                          {'utterance': text.lower().strip(),
+                           'lang': self.stt.lang})
+
     def stop(self):
         """
             Stop producer thread.
@@ -75,13 +93,26 @@ class AudioConsumer(Thread):
     """
     AudioConsumer
     Consumes AudioData chunks off the queue
+
+    With more than one STT worker, utterances are transcribed concurrently
+    by a pool of threads while the next ones are read from the queue. The
+    transcriptions are still emitted in the order the utterances were
+    recorded.
+
+    Args:
+        workers (int): threads transcribing utterances, 1 transcribes
+                       every utterance before reading the next one
+        max_audio_age (float): seconds after recording an utterance is
+                               dropped instead of transcribed, 0 to never
+                               drop audio
     """
 
     # In seconds, the minimum audio size to be sent to remote STT
     MIN_AUDIO_SIZE = 0.5
 
     def __init__(self, state, queue, emitter, stt,
-                 wakeup_recognizer, wakeword_recognizer):
+                 wakeup_recognizer, wakeword_recognizer, workers=1,
+                 max_audio_age=0):
         super(AudioConsumer, self).__init__()
         self.daemon = True
         self.queue = queue
@@ -91,10 +122,17 @@ class AudioConsumer(Thread):
         self.wakeup_recognizer = wakeup_recognizer
         self.wakeword_recognizer = wakeword_recognizer
         self.metrics = MetricsAggregator()
+        self.max_audio_age = max_audio_age
+        self.pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        self.pending = deque()  # Transcriptions in order of recording
+        # Guards pending and the metrics, updated by the STT workers
+        self.lock = Lock()
 
     def run(self):
         while self.state.running:
             self.read()
+        if self.pool:
+            self.pool.shutdown()
 
     def read(self):
         try:
@@ -105,10 +143,22 @@ class AudioConsumer(Thread):
         if audio is None:
             return
 
+        # Audio from the producer comes with the stream transcribing it
+        # while it was recorded and the time the recording ended
+        stream = recorded = None
+        if isinstance(audio, tuple):
+            audio, stream, recorded = audio
+
+        with self.lock:
+            self.metrics.level('stt.queue_depth',
+                               self.queue.qsize() + len(self.pending))
+
         if self.state.sleeping:
+            if stream:
+                stream.cancel()
             self.wake_up(audio)
         else:
-            self.process(audio)
+            self.process(audio, stream, recorded)
 
     # TODO: Localization
     def wake_up(self, audio):
@@ -116,7 +166,8 @@ class AudioConsumer(Thread):
             SessionManager.touch()
             self.state.sleeping = False
             self.emitter.emit('recognizer_loop:awoken')
-            self.metrics.increment("mycroft.wakeup")
+            with self.lock:
+                self.metrics.increment("mycroft.wakeup")
 
     @staticmethod
     def _audio_length(audio):
@@ -124,7 +175,7 @@ class AudioConsumer(Thread):
             audio.sample_rate * audio.sample_width)
 
     # TODO: Localization
-    def process(self, audio):
+    def process(self, audio, stream=None, recorded=None):
         SessionManager.touch()
         payload = {
             'utterance': self.wakeword_recognizer.key_phrase,
@@ -134,32 +185,98 @@ class AudioConsumer(Thread):
 
         if self._audio_length(audio) < self.MIN_AUDIO_SIZE:
             LOG.warning("Audio too short to be processed")
+            if stream:
+                stream.cancel()
+        elif self.pool:
+            future = self.pool.submit(self.run_stt, audio, stream, recorded)
+            with self.lock:
+                self.pending.append(future)
+            future.add_done_callback(self.emit_in_order)
         else:
-            stopwatch = Stopwatch()
-            with stopwatch:
-                transcription = self.transcribe(audio)
-            if transcription:
-                ident = str(stopwatch.timestamp) + str(hash(transcription))
-                # STT succeeded, send the transcribed speech on for processing
-                payload = {
-                    'utterances': [transcription],
-                    'lang': self.stt.lang,
-                    'session': SessionManager.get().session_id,
-                    'ident': ident
-                }
-                self.emitter.emit("recognizer_loop:utterance", payload)
-                self.metrics.attr('utterances', [transcription])
-            else:
-                ident = str(stopwatch.timestamp)
-            # Report timing metrics
-            report_timing(ident, 'stt', stopwatch,
-                          {'transcription': transcription,
-                           'stt': self.stt.__class__.__name__})
+            self.emit_transcription(self.run_stt(audio, stream, recorded))
 
-    def transcribe(self, audio):
+    def run_stt(self, audio, stream=None, recorded=None):
+        """ Transcribe an utterance unless it is too old.
+
+            Returns:
+                dict: transcription and timing of the stages, None if the
+                      audio was dropped
+        """
+        started = time.time()
+        queued = started - recorded if recorded else None
+        if self.max_audio_age and queued and queued > self.max_audio_age:
+            LOG.warning("Dropping audio recorded {:.1f} seconds "
+                        "ago".format(queued))
+            if stream:
+                stream.cancel()
+            with self.lock:
+                self.metrics.increment('stt.dropped')
+            return None
+
+        stopwatch = Stopwatch()
+        with stopwatch:
+            transcription = self.transcribe(audio, stream)
+        return {'transcription': transcription, 'stopwatch': stopwatch,
+                'queued': queued, 'done': time.time()}
+
+    def emit_in_order(self, future=None):
+        """ Emit the finished transcriptions not waiting for older ones. """
+        with self.lock:
+            while self.pending and self.pending[0].done():
+                future = self.pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    LOG.exception(e)
+                    continue
+                self.emit_transcription(result)
+
+    def emit_transcription(self, result):
+        if result is None:
+            return
+        transcription = result['transcription']
+        stopwatch = result['stopwatch']
+        if transcription:
+            ident = str(stopwatch.timestamp) + str(hash(transcription))
+            # STT succeeded, send the transcribed speech on for processing
+            payload = {
+                'utterances': [transcription],
+                'lang': self.stt.lang,
+                'session': SessionManager.get().session_id,
+                'ident': ident
+            }
+            self.emitter.emit("recognizer_loop:utterance", payload)
+            self.metrics.attr('utterances', [transcription])
+        else:
+            ident = str(stopwatch.timestamp)
+
+        # Time waiting for a worker, transcribing and waiting for the
+        # transcriptions of older utterances
+        stages = {'stt': stopwatch.time,
+                  'order_wait': time.time() - result['done']}
+        if result['queued'] is not None:
+            stages['queue_wait'] = result['queued']
+        for stage, latency in stages.items():
+            self.metrics.timer('stt.' + stage, latency)
+        LOG.debug('STT stage latencies: ' + ', '.join(
+            '{} {:.3f}s'.format(*stage) for stage in sorted(stages.items())))
+
+        # Report timing metrics
+        report_timing(ident, 'stt', stopwatch,
+                      {'transcription': transcription,
+                       'stt': self.stt.__class__.__name__,
+                       'queue_wait': result['queued'],
+                       'order_wait': stages['order_wait']})
+
+    def transcribe(self, audio, stream=None):
         try:
-            # Invoke the STT engine on the audio clip
-            text = self.stt.execute(audio).lower().strip()
+            if stream:
+                # Get the result of the STT engine fed while recording
+                text = stream.finish()
+            else:
+                # Invoke the STT engine on the audio clip
+                text = self.stt.execute(audio)
+            text = text.lower().strip()
             LOG.debug("STT: " + text)
             return text
         except sr.RequestError as e:
@@ -255,7 +372,16 @@ class RecognizerLoop(EventEmitter):
             config[word]["threshold"] = thresh
         if phonemes is None or thresh is None:
             config = None
-        return HotWordFactory.create_hotword(word, config, self.lang)
+        engine = HotWordFactory.create_hotword(word, config, self.lang)
+
+        # Further hotwords listened for on the same audio
+        extra_words = self.config.get("extra_wake_words", [])
+        if not extra_words:
+            return engine
+        engines = [engine] + [HotWordFactory.create_hotword(w, lang=self.lang)
+                              for w in extra_words]
+        return HotWordMultiplexer(engines,
+                                  self.config.get("hotword_max_wait", 0.05))
 
     def create_wakeup_recognizer(self):
         LOG.info("creating stand up word engine")
@@ -268,13 +394,15 @@ class RecognizerLoop(EventEmitter):
         """
         self.state.running = True
         queue = Queue()
+        stt = STTFactory.create()
         self.producer = AudioProducer(self.state, queue, self.microphone,
-                                      self.responsive_recognizer, self)
+                                      self.responsive_recognizer, self, stt)
         self.producer.start()
-        self.consumer = AudioConsumer(self.state, queue, self,
-                                      STTFactory.create(),
+        self.consumer = AudioConsumer(self.state, queue, self, stt,
                                       self.wakeup_recognizer,
-                                      self.wakeword_recognizer)
+                                      self.wakeword_recognizer,
+                                      self.config.get('stt_workers', 1),
+                                      self.config.get('max_audio_age', 0))
         self.consumer.start()
 
     def stop(self):
@@ -342,6 +470,7 @@ class RecognizerLoop(EventEmitter):
             Reload configuration and restart consumer and producer
         """
         self.stop()
+        self.wakeword_recognizer.stop()
         # load config
         self._load_config()
         # restart
@@ -66,6 +66,14 @@ def handle_utterance(event):
     ws.emit(Message('recognizer_loop:utterance', event, context))
 
 
+def handle_partial_utterance(event):
+    ws.emit(Message('recognizer_loop:partial_utterance', event))
+
+
+def handle_mic_level(event):
+    ws.emit(Message('recognizer_loop:mic_level', event))
+
+
 def handle_unknown():
     ws.emit(Message('mycroft.speech.recognition.unknown'))
 
@@ -137,9 +145,12 @@ def main():
     reset_sigint_handler()
     PIDLock("voice")
     ws = WebsocketClient()
+    # Only route messages this process has handlers for
+    ws.subscribe()
     Configuration.init(ws)
     loop = RecognizerLoop()
     loop.on('recognizer_loop:utterance', handle_utterance)
+    loop.on('recognizer_loop:partial_utterance', handle_partial_utterance)
     loop.on('recognizer_loop:speech.recognition.unknown', handle_unknown)
     loop.on('speak', handle_speak)
     loop.on('recognizer_loop:record_begin', handle_record_begin)
@@ -147,6 +158,7 @@ def main():
     loop.on('recognizer_loop:wakeword', handle_wakeword)
     loop.on('recognizer_loop:record_end', handle_record_end)
     loop.on('recognizer_loop:no_internet', handle_no_internet)
+    loop.on('recognizer_loop:mic_level', handle_mic_level)
     ws.on('open', handle_open)
     ws.on('complete_intent_failure', handle_complete_intent_failure)
     ws.on('recognizer_loop:sleep', handle_sleep)
@@ -35,15 +35,17 @@ import requests
 from subprocess import check_output, Popen, PIPE
 
 from mycroft.api import DeviceApi
+from mycroft.client.speech.ring_buffer import RingBuffer
+from mycroft.client.speech.vad import VADFactory
 from mycroft.configuration import Configuration
 from mycroft.session import SessionManager
 from mycroft.util import (
     check_for_signal,
-    get_ipc_directory,
     resolve_resource_file,
     play_wav
 )
 from mycroft.util.log import LOG
+from mycroft.util.mic_level import MicLevelWriter
 
 
 class MutableStream(object):
@@ -155,22 +157,10 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
     # Padding of silence when feeding to pocketsphinx
     SILENCE_SEC = 0.01
 
-    # The minimum seconds of noise before a
-    # phrase can be considered complete
-    MIN_LOUD_SEC_PER_PHRASE = 0.5
-
-    # The minimum seconds of silence required at the end
-    # before a phrase will be considered complete
-    MIN_SILENCE_AT_END = 0.25
-
     # The maximum seconds a phrase can be recorded,
     # provided there is noise the entire time
     RECORDING_TIMEOUT = 10.0
 
-    # The maximum time it will continue to record silence
-    # when not enough noise has been detected
-    RECORDING_TIMEOUT_WITH_SILENCE = 3.0
-
     # Time between pocketsphinx checks for the wake word
     SEC_BETWEEN_WW_CHECKS = 0.2
 
@@ -188,6 +178,10 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         self.audio = pyaudio.PyAudio()
         self.multiplier = listener_config.get('multiplier')
         self.energy_ratio = listener_config.get('energy_ratio')
+        # Decides when the phrase after the wake word is complete
+        self.vad = VADFactory.create(listener_config.get('vad'),
+                                     listener_config.get('sample_rate',
+                                                         16000))
         # check the config for the flag to save wake words.
 
         self.save_utterances = listener_config.get('record_utterances', False)
@@ -196,7 +190,11 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         self.upload_lock = Lock()
         self.save_wake_words_dir = join(gettempdir(), 'mycroft_wake_words')
         self.filenames_to_upload = []
-        self.mic_level_file = os.path.join(get_ipc_directory(), "mic_level")
+        self.mic_level = MicLevelWriter()
+        # Maximum mic level messages per second on the bus, 0 for none
+        self.mic_level_rate = listener_config.get('mic_level_rate', 0)
+        self.last_mic_level_emit = 0.0
+        self.emitter = None
         self._stop_signaled = False
 
         # The maximum audio in seconds to keep for transcribing a phrase
@@ -218,94 +216,75 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
     def calc_energy(sound_chunk, sample_width):
         return audioop.rms(sound_chunk, sample_width)
 
-    def _record_phrase(self, source, sec_per_buffer):
+    def _record_phrase(self, source, sec_per_buffer, stream=None):
         """Record an entire spoken phrase.
 
         Essentially, this code waits for a period of silence and then returns
         the audio.  If silence isn't detected, it will terminate and return
-        a buffer of RECORDING_TIMEOUT duration.
+        a buffer of RECORDING_TIMEOUT duration.  The configured VAD decides
+        when the phrase is complete.
 
         Args:
             source (AudioSource):  Source producing the audio chunks
             sec_per_buffer (float):  Fractional number of seconds in each chunk
+            stream (STTStream): stream fed with the audio as it is recorded
 
         Returns:
-            bytearray: complete audio buffer recorded, including any
-                       silence at the end of the user's utterance
+            bytes: complete audio buffer recorded, including any
+                   silence at the end of the user's utterance
         """
 
-        num_loud_chunks = 0
-        noise = 0
-
-        max_noise = 25
-        min_noise = 0
-
-        silence_duration = 0
-
-        def increase_noise(level):
-            if level < max_noise:
-                return level + 200 * sec_per_buffer
-            return level
-
-        def decrease_noise(level):
-            if level > min_noise:
-                return level - 100 * sec_per_buffer
-            return level
-
-        # Smallest number of loud chunks required to return
-        min_loud_chunks = int(self.MIN_LOUD_SEC_PER_PHRASE / sec_per_buffer)
-
         # Maximum number of chunks to record before timing out
         max_chunks = int(self.RECORDING_TIMEOUT / sec_per_buffer)
         num_chunks = 0
 
-        # Will return if exceeded this even if there's not enough loud chunks
-        max_chunks_of_silence = int(self.RECORDING_TIMEOUT_WITH_SILENCE /
-                                    sec_per_buffer)
+        self.vad.start(sec_per_buffer, self.energy_threshold)
 
-        # bytearray to store audio in
-        byte_data = get_silence(source.SAMPLE_WIDTH)
+        # Preallocated buffer large enough for the longest recording
+        audio_buffer = RingBuffer((max_chunks * source.CHUNK + 1) *
+                                  source.SAMPLE_WIDTH)
+        audio_buffer.append(get_silence(source.SAMPLE_WIDTH))
+        if stream:
+            stream.feed(get_silence(source.SAMPLE_WIDTH))
 
         phrase_complete = False
         while num_chunks < max_chunks and not phrase_complete:
             chunk = self.record_sound_chunk(source)
-            byte_data += chunk
+            audio_buffer.append(chunk)
+            if stream:
+                stream.feed(chunk)
             num_chunks += 1
 
             energy = self.calc_energy(chunk, source.SAMPLE_WIDTH)
             test_threshold = self.energy_threshold * self.multiplier
             is_loud = energy > test_threshold
-            if is_loud:
-                noise = increase_noise(noise)
-                num_loud_chunks += 1
-            else:
-                noise = decrease_noise(noise)
+            if not is_loud:
                 self._adjust_threshold(energy, sec_per_buffer)
 
-            if num_chunks % 10 == 0:
-                with open(self.mic_level_file, 'w') as f:
-                    f.write("Energy:  cur=" + str(energy) + " thresh=" +
-                            str(self.energy_threshold))
-                f.close()
+            self._publish_mic_level(energy)
 
-            was_loud_enough = num_loud_chunks > min_loud_chunks
-
-            quiet_enough = noise <= min_noise
-            if quiet_enough:
-                silence_duration += sec_per_buffer
-                if silence_duration < self.MIN_SILENCE_AT_END:
-                    quiet_enough = False  # gotta be silent for min of 1/4 sec
-            else:
-                silence_duration = 0
-            recorded_too_much_silence = num_chunks > max_chunks_of_silence
-            if quiet_enough and (was_loud_enough or recorded_too_much_silence):
-                phrase_complete = True
+            phrase_complete = self.vad.update(chunk, is_loud)
 
             # Pressing top-button will end recording immediately
             if check_for_signal('buttonPress'):
                 phrase_complete = True
 
-        return byte_data
+        return audio_buffer.get()
+
+    def _publish_mic_level(self, energy):
+        """ Share the level with other processes, rate limited on the bus.
+
+            Args:
+                energy (float): energy of the latest chunk of audio
+        """
+        self.mic_level.set(energy, self.energy_threshold)
+        if self.mic_level_rate and self.emitter:
+            now = get_time()
+            if now - self.last_mic_level_emit >= 1.0 / self.mic_level_rate:
+                self.last_mic_level_emit = now
+                self.emitter.emit('recognizer_loop:mic_level',
+                                  {'energy': energy,
+                                   'threshold': self.energy_threshold})
 
     @staticmethod
     def sec_to_bytes(sec, source):
@@ -380,15 +359,15 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
 
         silence = get_silence(num_silent_bytes)
 
-        # bytearray to store audio in
-        byte_data = silence
-
         buffers_per_check = self.SEC_BETWEEN_WW_CHECKS / sec_per_buffer
         buffers_since_check = 0.0
 
-        # Max bytes for byte_data before audio is removed from the front
+        # The most recent SAVED_WW_SEC of audio, the oldest audio is
+        # overwritten when the buffer is full
         max_size = self.sec_to_bytes(self.SAVED_WW_SEC, source)
         test_size = self.sec_to_bytes(self.TEST_WW_SEC, source)
+        audio_buffer = RingBuffer(max_size)
+        audio_buffer.append(silence)
 
         said_wake_word = False
 
@@ -406,7 +385,6 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             model_hash = check_output(['md5sum', model_path]).split()[0]
         else:
             model_hash = '0'
-        counter = 0
 
         while not said_wake_word and not self._stop_signaled:
             if self._skip_wake_word():
@@ -434,36 +412,27 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
                         # bump the threshold to just above this value
                         self.energy_threshold = energy * 1.2
 
-            # Periodically output energy level stats.  This can be used to
-            # visualize the microphone input, e.g. a needle on a meter.
-            if counter % 3:
-                with open(self.mic_level_file, 'w') as f:
-                    f.write("Energy:  cur=" + str(energy) + " thresh=" +
-                            str(self.energy_threshold))
-                f.close()
-            counter += 1
-
-            # At first, the buffer is empty and must fill up.  After that
-            # just drop the first chunk bytes to keep it the same size.
-            needs_to_grow = len(byte_data) < max_size
-            if needs_to_grow:
-                byte_data += chunk
-            else:  # Remove beginning of audio and add new chunk to end
-                byte_data = byte_data[len(chunk):] + chunk
+            # Output energy level stats.  This can be used to visualize
+            # the microphone input, e.g. a needle on a meter.
+            self._publish_mic_level(energy)
+
+            audio_buffer.append(chunk)
 
             buffers_since_check += 1.0
             self.wake_word_recognizer.update(chunk)
             if buffers_since_check > buffers_per_check:
                 buffers_since_check -= buffers_per_check
-                chopped = byte_data[-test_size:] \
-                    if test_size < len(byte_data) else byte_data
-                audio_data = chopped + silence
+                # The audio tested with silence appended, join() copies
+                # the view straight into the result
+                chopped = audio_buffer.get_last(test_size)
+                audio_data = b''.join((chopped, silence))
                 said_wake_word = \
                     self.wake_word_recognizer.found_wake_word(audio_data)
                 # if a wake word is success full then record audio in temp
                 # file.
                 if self.save_wake_words and said_wake_word:
-                    audio = self._create_audio_data(byte_data, source)
+                    audio = self._create_audio_data(audio_buffer.get(),
+                                                    source)
 
                     if not isdir(self.save_wake_words_dir):
                         mkdir(self.save_wake_words_dir)
@@ -486,6 +455,9 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
                         t.daemon = True
                         t.start()
 
+        # The audio following the wake word is recorded, not decoded
+        self.wake_word_recognizer.reset()
+
     @staticmethod
     def _create_audio_data(raw_data, source):
         """
@@ -494,7 +466,7 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         """
         return AudioData(raw_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
 
-    def listen(self, source, emitter):
+    def listen(self, source, emitter, stream=None):
         """Listens for chunks of audio that Mycroft should perform STT on.
 
         This will listen continuously for a wake-up-word, then return the
@@ -505,11 +477,14 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             source (AudioSource):  Source producing the audio chunks
             emitter (EventEmitter): Emitter for notifications of when recording
                                     begins and ends.
+            stream (STTStream): stream started when recording begins and fed
+                                with the phrase while it is recorded
 
         Returns:
             AudioData: audio with the user's utterance, minus the wake-up-word
         """
         assert isinstance(source, AudioSource), "Source must be an AudioSource"
+        self.emitter = emitter
 
         #        bytes_per_sec = source.SAMPLE_RATE * source.SAMPLE_WIDTH
         sec_per_buffer = float(source.CHUNK) / source.SAMPLE_RATE
@@ -537,7 +512,9 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             if file:
                 play_wav(file)
 
-        frame_data = self._record_phrase(source, sec_per_buffer)
+        if stream:
+            stream.start(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        frame_data = self._record_phrase(source, sec_per_buffer, stream)
         audio_data = self._create_audio_data(frame_data, source)
         emitter.emit("recognizer_loop:record_end")
         if self.save_utterances:
@@ -0,0 +1,87 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+class RingBuffer(object):
+    """ Preallocated circular buffer keeping the most recent audio bytes.
+
+        Every byte is stored twice, at its position and size bytes later,
+        so the most recent audio can always be read as one contiguous
+        memoryview without copying. Appending copies only the new chunk.
+
+        Args:
+            size (int): number of bytes kept
+    """
+
+    def __init__(self, size):
+        if size <= 0:
+            raise ValueError('RingBuffer size must be positive')
+        self.size = size
+        self.data = bytearray(2 * size)
+        self.view = memoryview(self.data)
+        self.pos = 0  # Where the next byte is written
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, chunk):
+        """ Add audio, dropping the oldest bytes when full.
+
+            Args:
+                chunk (bytes): audio to add
+        """
+        n = len(chunk)
+        if n >= self.size:
+            chunk = memoryview(chunk)[n - self.size:]
+            n = self.size
+        size = self.size
+        pos = self.pos
+        first = min(n, size - pos)
+        self.data[pos:pos + first] = chunk[:first]
+        self.data[pos + size:pos + size + first] = chunk[:first]
+        rest = n - first
+        if rest:
+            self.data[:rest] = chunk[first:]
+            self.data[size:size + rest] = chunk[first:]
+        self.pos = (pos + n) % size
+        self.length = min(self.length + n, size)
+
+    def get_last(self, n):
+        """ Get the most recent audio without copying it.
+
+            The view is only valid until the next call to append().
+
+            Args:
+                n (int): number of bytes, all available bytes if more
+
+            Returns:
+                memoryview: the last n bytes in the order they were added
+        """
+        n = min(n, self.length)
+        end = self.pos + self.size
+        return self.view[end - n:end]
+
+    def get(self):
+        """ Get a copy of all audio in the buffer.
+
+            Returns:
+                bytes: the buffered audio
+        """
+        return self.get_last(self.length).tobytes()
+
+    def clear(self):
+        self.pos = 0
+        self.length = 0
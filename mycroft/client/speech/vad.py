@@ -0,0 +1,232 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from abc import ABCMeta, abstractmethod
+from math import log10
+
+from mycroft.util.log import LOG
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class VAD(object):
+    """
+        Voice activity detection deciding when the phrase recorded after
+        the wake word is complete.
+
+        Args:
+            config (dict): settings of the implementation
+            sample_rate (int): samples per second of the audio
+            sample_width (int): bytes per sample
+    """
+    __metaclass__ = ABCMeta
+
+    # The maximum time it will continue to record silence
+    # when not enough speech has been detected
+    RECORDING_TIMEOUT_WITH_SILENCE = 3.0
+
+    def __init__(self, config=None, sample_rate=16000, sample_width=2):
+        self.config = config or {}
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+    def start(self, sec_per_buffer, noise_level=0):
+        """ Called before recording a phrase.
+
+            Args:
+                sec_per_buffer (float): seconds of audio in each chunk
+                noise_level (float): energy threshold of the listener, just
+                                     above the background noise
+        """
+        pass
+
+    @abstractmethod
+    def update(self, chunk, is_loud):
+        """ Check the next chunk of the phrase.
+
+            Args:
+                chunk (bytes): audio recorded
+                is_loud (bool): chunk is above the energy threshold of the
+                                listener
+
+            Returns:
+                bool: True if the phrase is complete
+        """
+        pass
+
+
+class EnergyVAD(VAD):
+    """ Counts loud and quiet chunks, as judged by the listener. """
+    # The minimum seconds of noise before a
+    # phrase can be considered complete
+    MIN_LOUD_SEC_PER_PHRASE = 0.5
+
+    # The minimum seconds of silence required at the end
+    # before a phrase will be considered complete
+    MIN_SILENCE_AT_END = 0.25
+
+    MAX_NOISE = 25
+    MIN_NOISE = 0
+
+    def start(self, sec_per_buffer, noise_level=0):
+        self.sec_per_buffer = sec_per_buffer
+        self.num_chunks = 0
+        self.num_loud_chunks = 0
+        self.noise = 0
+        self.silence_duration = 0
+
+        # Smallest number of loud chunks required to return
+        self.min_loud_chunks = int(self.MIN_LOUD_SEC_PER_PHRASE /
+                                   sec_per_buffer)
+        # Will return if exceeded this even if there's not enough loud chunks
+        self.max_chunks_of_silence = int(self.RECORDING_TIMEOUT_WITH_SILENCE /
+                                         sec_per_buffer)
+
+    def update(self, chunk, is_loud):
+        self.num_chunks += 1
+        if is_loud:
+            if self.noise < self.MAX_NOISE:
+                self.noise += 200 * self.sec_per_buffer
+            self.num_loud_chunks += 1
+        elif self.noise > self.MIN_NOISE:
+            self.noise -= 100 * self.sec_per_buffer
+
+        was_loud_enough = self.num_loud_chunks > self.min_loud_chunks
+
+        quiet_enough = self.noise <= self.MIN_NOISE
+        if quiet_enough:
+            self.silence_duration += self.sec_per_buffer
+            if self.silence_duration < self.MIN_SILENCE_AT_END:
+                quiet_enough = False  # gotta be silent for min of 1/4 sec
+        else:
+            self.silence_duration = 0
+        recorded_too_much_silence = \
+            self.num_chunks > self.max_chunks_of_silence
+        return quiet_enough and (was_loud_enough or recorded_too_much_silence)
+
+
+class SpectralVAD(VAD):
+    """
+        Frame based detection on energy over the noise floor and spectral
+        flatness, computed with numpy for all frames of a chunk at once.
+
+        A frame is speech when it is louder than the tracked noise floor by
+        "snr_db", or by a third of that when its spectrum in the speech band
+        is not flat like noise (below "max_flatness"). The phrase is
+        complete after "min_speech_sec" of speech followed by
+        "hangover_sec" without speech, the hangover bridges the pauses
+        between words.
+    """
+    SPEECH_BAND = (300, 3400)  # Hz
+
+    def __init__(self, config=None, sample_rate=16000, sample_width=2):
+        super(SpectralVAD, self).__init__(config, sample_rate, sample_width)
+        if np is None:
+            raise ImportError('The spectral VAD needs numpy')
+        if sample_width != 2:
+            raise ValueError('The spectral VAD needs 16 bit audio')
+        self.frame_size = int(self.config.get('frame_ms', 20) *
+                              sample_rate / 1000)
+        self.frame_sec = float(self.frame_size) / sample_rate
+        self.snr_db = self.config.get('snr_db', 9.0)
+        self.max_flatness = self.config.get('max_flatness', 0.4)
+        self.min_speech_sec = self.config.get('min_speech_sec', 0.3)
+        self.hangover_sec = self.config.get('hangover_sec', 0.5)
+        # How fast the noise floor may rise, it drops immediately
+        self.noise_rise_db = self.config.get('noise_rise_db_per_sec', 3.0)
+
+        self.window = np.hanning(self.frame_size).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_size, 1.0 / sample_rate)
+        self.band = (freqs >= self.SPEECH_BAND[0]) & \
+            (freqs <= self.SPEECH_BAND[1])
+        self.noise_db = None
+        self.start(0)
+
+    def start(self, sec_per_buffer, noise_level=0):
+        self.remainder = b''
+        self.frames = 0
+        self.speech_frames = 0
+        self.silent_frames = 0  # Since the last speech
+        if noise_level > 0:
+            self.noise_db = 20 * log10(noise_level)
+
+    def features(self, samples):
+        """ Energy in dB and spectral flatness of every frame.
+
+            Args:
+                samples (ndarray): frames x frame_size samples
+        """
+        energy_db = 10 * np.log10(np.mean(samples ** 2, axis=1) + 1e-10)
+        spectrum = np.abs(np.fft.rfft(samples * self.window, axis=1)) ** 2
+        spectrum = spectrum[:, self.band] + 1e-10
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / \
+            np.mean(spectrum, axis=1)
+        return energy_db, flatness
+
+    def update(self, chunk, is_loud):
+        data = self.remainder + chunk
+        num_frames = len(data) // (2 * self.frame_size)
+        self.remainder = data[num_frames * 2 * self.frame_size:]
+        if num_frames == 0:
+            return False
+
+        samples = np.frombuffer(data, dtype='<i2', count=num_frames *
+                                self.frame_size).astype(np.float32)
+        energy_db, flatness = self.features(
+            samples.reshape(num_frames, self.frame_size))
+        if self.noise_db is None:
+            self.noise_db = float(energy_db.min())
+        snr_db = energy_db - self.noise_db
+        is_speech = (snr_db > self.snr_db) | \
+            ((snr_db > self.snr_db / 3) & (flatness < self.max_flatness))
+
+        # Track the noise floor on the frames without speech
+        noise = energy_db[~is_speech]
+        if len(noise):
+            rise = self.noise_rise_db * num_frames * self.frame_sec
+            self.noise_db = min(self.noise_db + rise, float(noise.min()))
+
+        self.frames += num_frames
+        self.speech_frames += int(is_speech.sum())
+        speech = np.flatnonzero(is_speech)
+        if len(speech):
+            self.silent_frames = num_frames - 1 - int(speech[-1])
+        else:
+            self.silent_frames += num_frames
+
+        if self.speech_frames * self.frame_sec >= self.min_speech_sec:
+            return self.silent_frames * self.frame_sec >= self.hangover_sec
+        return self.frames * self.frame_sec > \
+            self.RECORDING_TIMEOUT_WITH_SILENCE
+
+
+class VADFactory(object):
+    CLASSES = {
+        "energy": EnergyVAD,
+        "spectral": SpectralVAD
+    }
+
+    @staticmethod
+    def create(config=None, sample_rate=16000, sample_width=2):
+        config = config or {}
+        module = config.get("module", "energy")
+        clazz = VADFactory.CLASSES.get(module)
+        try:
+            return clazz(config.get(module), sample_rate, sample_width)
+        except Exception:
+            LOG.exception('Could not create VAD. Falling back to default.')
+            return EnergyVAD()
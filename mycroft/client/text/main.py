@@ -41,8 +41,8 @@ import mycroft.version
 from threading import Thread, Lock
 from mycroft.messagebus.client.ws import WebsocketClient
 from mycroft.messagebus.message import Message
-from mycroft.util import get_ipc_directory
 from mycroft.util.log import LOG
+from mycroft.util.mic_level import MicLevelReader
 
 import locale
 # Curses uses LC_ALL to determine how to display chars set it to system
@@ -250,47 +250,28 @@ def start_log_monitor(filename):
 
 
 class MicMonitorThread(Thread):
-    def __init__(self, filename):
+    def __init__(self, reader):
         Thread.__init__(self)
-        self.filename = filename
-        self.st_results = os.stat(filename)
+        self.reader = reader
 
     def run(self):
+        global meter_cur
+        global meter_thresh
+
         while True:
             try:
-                st_results = os.stat(self.filename)
-
-                if (not st_results.st_ctime == self.st_results.st_ctime or
-                        not st_results.st_mtime == self.st_results.st_mtime):
-                    self.read_file_from(0)
-                    self.st_results = st_results
+                level = self.reader.read(only_changed=True)
+                if level:
+                    meter_cur, meter_thresh = level
                     draw_screen()
             finally:
                 time.sleep(0.2)
 
-    def read_file_from(self, bytefrom):
-        global meter_cur
-        global meter_thresh
-
-        with io.open(self.filename, 'r') as fh:
-            fh.seek(bytefrom)
-            while True:
-                line = fh.readline()
-                if line == "":
-                    break
 
-                # Just adjust meter settings
-                # Ex:Energy:  cur=4 thresh=1.5
-                parts = line.split("=")
-                meter_thresh = float(parts[-1])
-                meter_cur = float(parts[-2].split(" ")[0])
-
-
-def start_mic_monitor(filename):
-    if os.path.isfile(filename):
-        thread = MicMonitorThread(filename)
-        thread.setDaemon(True)  # this thread won't prevent prog from exiting
-        thread.start()
+def start_mic_monitor():
+    thread = MicMonitorThread(MicLevelReader())
+    thread.setDaemon(True)  # this thread won't prevent prog from exiting
+    thread.start()
 
 
 def add_log_message(message):
@@ -1061,8 +1042,8 @@ start_log_monitor(localLogPath + "/mycroft-voice.log")
 start_log_monitor("/var/log/mycroft-skills.log")
 start_log_monitor("/var/log/mycroft-speech-client.log")
 
-# Monitor IPC file containing microphone level info
-start_mic_monitor(os.path.join(get_ipc_directory(), "mic_level"))
+# Monitor the microphone level shared by the listener
+start_mic_monitor()
 
 
 def main():
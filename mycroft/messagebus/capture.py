@@ -0,0 +1,289 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Capture files of messagebus traffic.
+
+A capture file is a sequence of records appended as messages arrive:
+
+    header: kind (uint8), timestamp (float64), type id (uint16),
+            payload length (uint32)
+    payload: the message frame as received, or the name of a message type
+
+The name of every message type is written once, in a TYPE record before
+its first message. A record cut short by a crash is ignored when reading
+and overwritten when recording continues.
+
+Next to the capture an index file (<capture>.idx) holds fixed size
+entries (kind, timestamp, capture offset) for every TYPE record and for
+a message at least every index_interval seconds, so a replay can start at
+any time without reading the capture up to there.
+"""
+import os
+import struct
+import time
+from bisect import bisect_right
+from collections import namedtuple, Counter
+
+from mycroft.messagebus.wire import peek_type
+
+MAGIC = b'MYCROFT-BUS-CAPTURE\x01'
+INDEX_MAGIC = b'MYCROFT-BUS-INDEX\x01'
+
+# Record kinds
+TYPE = 1
+TEXT = 2
+BINARY = 3
+
+RECORD_HEADER = struct.Struct('<BdHI')
+INDEX_ENTRY = struct.Struct('<BdQ')
+
+Record = namedtuple('Record', ['timestamp', 'type', 'frame', 'binary'])
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+class CaptureWriter(object):
+    """ Append messagebus frames to a capture file.
+
+        Recording into an existing capture continues it.
+
+        Args:
+            path (str): capture file
+            index_interval (float): seconds between index entries
+    """
+
+    def __init__(self, path, index_interval=1.0):
+        self.index_interval = index_interval
+        self.types = {}  # type name -> type id
+        self.last_indexed = None
+        self.messages = 0
+
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            reader = CaptureReader(path)
+            self.types = {name: i for i, name in reader.types.items()}
+            self.file = open(path, 'r+b')
+            self.file.truncate(reader.size)  # Drop an incomplete record
+            self.file.seek(reader.size)
+            # Write the index again, it may lack records before a crash
+            self.index = open(index_path(path), 'wb')
+            self.index.write(INDEX_MAGIC)
+            entries = sorted([(o, TYPE, t) for t, o in reader.type_offsets] +
+                             [(o, TEXT, t) for t, o in reader.index])
+            for offset, kind, timestamp in entries:
+                self.index.write(INDEX_ENTRY.pack(kind, timestamp, offset))
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+            self.index = open(index_path(path), 'wb')
+            self.index.write(INDEX_MAGIC)
+
+    def write(self, frame, timestamp=None, msg_type=None, binary=None):
+        """ Append a frame.
+
+            Args:
+                frame (str or bytes): message frame
+                timestamp (float): time received, defaults to now
+                msg_type (str): message type, read from the frame if None
+                binary (bool): binary frame, defaults to frame being bytes
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if binary is None:
+            binary = isinstance(frame, bytes) and frame[:1] != b'{'
+        if msg_type is None:
+            msg_type = peek_type(frame) or ''
+        if not isinstance(frame, bytes):
+            frame = frame.encode('utf-8')
+
+        type_id = self.types.get(msg_type)
+        if type_id is None:
+            type_id = self._write_type(msg_type, timestamp)
+
+        if (self.last_indexed is None or
+                timestamp - self.last_indexed >= self.index_interval):
+            self._write_index(TEXT, timestamp)
+            self.last_indexed = timestamp
+        self.file.write(RECORD_HEADER.pack(BINARY if binary else TEXT,
+                                           timestamp, type_id, len(frame)))
+        self.file.write(frame)
+        self.messages += 1
+
+    def _write_type(self, msg_type, timestamp):
+        type_id = len(self.types)
+        if type_id > 0xffff:
+            raise ValueError('Too many message types in one capture')
+        name = msg_type.encode('utf-8')
+        self._write_index(TYPE, timestamp)
+        self.file.write(RECORD_HEADER.pack(TYPE, timestamp, type_id,
+                                           len(name)))
+        self.file.write(name)
+        self.types[msg_type] = type_id
+        return type_id
+
+    def _write_index(self, kind, timestamp):
+        self.index.write(INDEX_ENTRY.pack(kind, timestamp, self.file.tell()))
+
+    def flush(self):
+        """ Write buffered records to disk, the capture before its index. """
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class CaptureReader(object):
+    """ Read the records of a capture file.
+
+        Args:
+            path (str): capture file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.types = {}  # type id -> type name
+        self.type_offsets = []  # (timestamp, offset) of TYPE records
+        self.index = []  # (timestamp, offset) of message records
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('{} is not a bus capture'.format(path))
+            self.size = self._load_index(f)
+            if self.size is None:
+                # Missing or out of sync index, read the whole capture
+                self.types = {}
+                self.type_offsets = []
+                self.index = []
+                self.size = self._scan(f, len(MAGIC))
+
+    def _load_index(self, f):
+        """ Read type names and message offsets from the index file.
+
+            Returns:
+                int: end of the last complete record in the capture or
+                     None if the index is unusable
+        """
+        try:
+            with open(index_path(self.path), 'rb') as index:
+                data = index.read()
+        except IOError:
+            return None
+        if not data.startswith(INDEX_MAGIC):
+            return None
+
+        start = len(INDEX_MAGIC)
+        end = start + ((len(data) - start) // INDEX_ENTRY.size *
+                       INDEX_ENTRY.size)
+        for pos in range(start, end, INDEX_ENTRY.size):
+            kind, timestamp, offset = INDEX_ENTRY.unpack_from(data, pos)
+            record = self._read_record(f, offset)
+            if record is None or (record[0] == TYPE) != (kind == TYPE):
+                return None
+            if kind == TYPE:
+                self.types[record[2]] = record[3].decode('utf-8')
+                self.type_offsets.append((timestamp, offset))
+            else:
+                self.index.append((timestamp, offset))
+
+        # Only the records after the last index entry need checking
+        offsets = [o for _, o in self.index + self.type_offsets]
+        return self._scan(f, max(offsets or [len(MAGIC)]))
+
+    def _read_record(self, f, offset):
+        f.seek(offset)
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        kind, timestamp, type_id, length = RECORD_HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length:
+            return None
+        return kind, timestamp, type_id, payload
+
+    def _scan(self, f, offset):
+        """ Find the end of the last complete record, reading types. """
+        while True:
+            record = self._read_record(f, offset)
+            if record is None:
+                return offset
+            kind, timestamp, type_id, payload = record
+            if kind == TYPE and type_id not in self.types:
+                self.types[type_id] = payload.decode('utf-8')
+                self.type_offsets.append((timestamp, offset))
+            offset = f.tell()
+
+    def records(self, start=None, end=None):
+        """ Iterate over the messages in the capture.
+
+            Args:
+                start (float): skip messages before this timestamp
+                end (float): stop at this timestamp
+
+            Yields:
+                Record: timestamp, type, frame (bytes) and binary flag
+        """
+        offset = len(MAGIC)
+        if start is not None and self.index:
+            i = bisect_right(self.index, (start, float('inf'))) - 1
+            if i >= 0:
+                offset = self.index[i][1]
+
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while offset < self.size:
+                header = f.read(RECORD_HEADER.size)
+                kind, timestamp, type_id, length = RECORD_HEADER.unpack(
+                    header)
+                payload = f.read(length)
+                offset += RECORD_HEADER.size + length
+                if kind == TYPE:
+                    self.types[type_id] = payload.decode('utf-8')
+                    continue
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    return
+                yield Record(timestamp, self.types.get(type_id), payload,
+                             kind == BINARY)
+
+    def summary(self):
+        """ Count messages and bytes per message type.
+
+            Returns:
+                dict: totals, duration and per type counts and bytes
+        """
+        counts = Counter()
+        sizes = Counter()
+        first = last = None
+        for record in self.records():
+            counts[record.type] += 1
+            sizes[record.type] += len(record.frame)
+            first = record.timestamp if first is None else first
+            last = record.timestamp
+        return {
+            'messages': sum(counts.values()),
+            'bytes': sum(sizes.values()),
+            'start': first,
+            'duration': (last - first) if first is not None else 0,
+            'types': {t: {'messages': counts[t], 'bytes': sizes[t]}
+                      for t in counts}
+        }
@@ -0,0 +1,193 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+from mycroft.util.log import LOG
+
+
+class Lane(object):
+    """ Messages of one type, or of one type and key, handled in order by
+        one worker at a time when the type is ordered.
+
+        Args:
+            name (str): message type, "<type>:<key>" for keyed lanes
+            msg_type (str): message type
+    """
+
+    def __init__(self, name, msg_type):
+        self.name = name
+        self.msg_type = msg_type
+        self.queue = deque()  # (message, time received)
+        self.running = False
+        self.pending = 0  # Handed to the pool, not yet started
+        self.handled = 0
+        self.wait_time = 0.0
+        self.handler_time = 0.0
+        self.max_handler_time = 0.0
+
+    def record(self, wait_time, handler_time):
+        self.handled += 1
+        self.wait_time += wait_time
+        self.handler_time += handler_time
+        self.max_handler_time = max(self.max_handler_time, handler_time)
+
+    def stats(self):
+        handled = self.handled or 1
+        return {
+            'queued': len(self.queue) + self.pending,
+            'handled': self.handled,
+            'avg_wait_ms': 1000 * self.wait_time / handled,
+            'avg_handler_ms': 1000 * self.handler_time / handled,
+            'max_handler_ms': 1000 * self.max_handler_time
+        }
+
+
+class Dispatcher(object):
+    """ Runs the handlers of received messages.
+
+        Message types are dispatched in one of three ways:
+
+        inline: handled directly on the thread receiving from the bus, for
+                short latency critical handlers.
+        priority: every priority type is handled by a small pool of its
+                  own, so it is never queued behind slow handlers,
+                  including those of other priority types.
+        default: handled by the shared worker pool.
+
+        Messages of the ordered types are handled in the order they were
+        received, one at a time, in a serial lane. A slow handler then
+        holds up only its own type instead of a growing share of the pool.
+        Messages of other types are handed to the pool directly and may be
+        handled concurrently.
+
+        Lanes are per message type. For a type in lane_keys the lane is
+        also per value of a field of the message data, e.g. "skill_id" to
+        keep the order per skill without one slow skill holding up the
+        others.
+
+        Args:
+            emit: function(message type, message) running the handlers
+            pool_size (int): number of workers in the shared pool
+            ordered (list): message types handled in order
+            inline (list): message types handled on the receiving thread
+            priority (list): message types handled by a priority pool
+            priority_pool_size (int): number of workers of each priority
+                                      pool
+            lane_keys (dict): message type -> data field keying its lanes
+    """
+    # Messages handled by a lane before giving its worker to other lanes
+    BATCH_SIZE = 16
+
+    def __init__(self, emit, pool_size=10, ordered=None, inline=None,
+                 priority=None, priority_pool_size=2, lane_keys=None):
+        self.emit = emit
+        self.pool = ThreadPool(pool_size)
+        self.priority_pools = {msg_type: ThreadPool(priority_pool_size)
+                               for msg_type in priority or []}
+        self.ordered = set(ordered or [])
+        self.inline = set(inline or [])
+        self.lane_keys = dict(lane_keys or {})
+        self.lanes = {}
+        self.lock = Lock()
+
+    def _lane(self, message):
+        name = message.type
+        field = self.lane_keys.get(message.type)
+        if field:
+            name += ':{}'.format(message.data.get(field))
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = self.lanes[name] = Lane(name, message.type)
+        return lane
+
+    def keep_order(self, msg_type):
+        """ Handle the messages of a type in order from now on.
+
+            Args:
+                msg_type (str): message type
+        """
+        with self.lock:
+            self.ordered.add(msg_type)
+
+    def dispatch(self, message):
+        """ Run the handlers of a message according to its type.
+
+            Args:
+                message (Message): message received from the bus
+        """
+        received = time.time()
+        inline = message.type in self.inline
+        with self.lock:
+            lane = self._lane(message)
+            ordered = message.type in self.ordered and not inline
+            start_lane = False
+            if ordered:
+                lane.queue.append((message, received))
+                start_lane = not lane.running
+                lane.running = True
+            elif not inline:
+                lane.pending += 1
+
+        if inline:
+            self._handle(lane, message, received)
+        elif not ordered:
+            self._pool(lane).apply_async(self._run_pending,
+                                         (lane, message, received))
+        elif start_lane:
+            self._pool(lane).apply_async(self._run_lane, (lane,))
+
+    def _pool(self, lane):
+        return self.priority_pools.get(lane.msg_type, self.pool)
+
+    def _run_pending(self, lane, message, received):
+        with self.lock:
+            lane.pending -= 1
+        self._handle(lane, message, received)
+
+    def _run_lane(self, lane):
+        for _ in range(self.BATCH_SIZE):
+            with self.lock:
+                if not lane.queue:
+                    lane.running = False
+                    return
+                message, received = lane.queue.popleft()
+            self._handle(lane, message, received)
+        # Let other lanes use this worker, continue later
+        self._pool(lane).apply_async(self._run_lane, (lane,))
+
+    def _handle(self, lane, message, received):
+        start = time.time()
+        try:
+            self.emit(message.type, message)
+        except Exception:
+            LOG.exception('Error handling {}'.format(message.type))
+        end = time.time()
+        with self.lock:
+            lane.record(start - received, end - start)
+
+    def stats(self):
+        """ Get queue depth and handler latency of every lane.
+
+            The queue depth counts the messages waiting in an ordered lane
+            and those handed to a pool but not yet started.
+
+            Returns:
+                dict: lane name -> lane statistics
+        """
+        with self.lock:
+            return {name: lane.stats() for name, lane in self.lanes.items()}
@@ -0,0 +1,94 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+from uuid import uuid4
+
+
+# Message context key used to correlate a reply with its request
+REQUEST_ID = 'request_id'
+
+
+class PendingRequests(object):
+    """ Requests waiting for a reply, keyed by request id.
+
+        Replies are matched on the request id in the message context, which
+        Message.reply() and Message.response() carry over from the request.
+        A reply without a request id is handed to the oldest request waiting
+        for that message type, for responders that build a new Message.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.requests = OrderedDict()  # request id -> (reply type, future)
+
+    def add(self, message, reply_type):
+        """ Tag message with a new request id and track the reply.
+
+            Args:
+                message (Message): request to send
+                reply_type (str): message type of the expected reply
+
+            Returns:
+                Future: resolved with the reply message
+        """
+        request_id = str(uuid4())
+        message.context = message.context or {}
+        message.context[REQUEST_ID] = request_id
+
+        future = Future()
+        with self.lock:
+            self.requests[request_id] = (reply_type, future)
+        future.add_done_callback(lambda f: self.discard(request_id))
+        return future
+
+    def discard(self, request_id):
+        with self.lock:
+            self.requests.pop(request_id, None)
+
+    def resolve(self, message):
+        """ Complete the request a message is a reply to, if any.
+
+            Args:
+                message (Message): message received from the bus
+
+            Returns:
+                bool: True if the message was a reply to a pending request
+        """
+        if not self.requests:
+            return False
+        if not any(r[0] == message.type for r in list(self.requests.values())):
+            # Avoid decoding the context of unrelated messages
+            return False
+        request_id = (message.context or {}).get(REQUEST_ID)
+        with self.lock:
+            pending = self.requests.get(request_id)
+            if pending and pending[0] != message.type:
+                pending = None
+            elif pending is None and request_id is None:
+                for request_id, pending in self.requests.items():
+                    if pending[0] == message.type:
+                        break
+                else:
+                    pending = None
+            if pending is None:
+                return False
+            del self.requests[request_id]
+
+        future = pending[1]
+        if future.set_running_or_notify_cancel():
+            future.set_result(message)
+        return True
@@ -13,25 +13,49 @@
 # limitations under the License.
 #
 import json
+import os
+import socket
+import sys
 import time
-from multiprocessing.pool import ThreadPool
+from os.path import basename
+from concurrent.futures import TimeoutError
 from threading import Event
 
-import monotonic
 from pyee import EventEmitter
-from websocket import (WebSocketApp, WebSocketConnectionClosedException,
-                       WebSocketException)
+from websocket import (ABNF, WebSocketApp,
+                       WebSocketConnectionClosedException, WebSocketException)
 
 from mycroft.configuration import Configuration
+from mycroft.messagebus import wire
+from mycroft.messagebus.client.dispatch import Dispatcher
+from mycroft.messagebus.client.rpc import PendingRequests
 from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.routing import SUBSCRIBE, UNSUBSCRIBE
+from mycroft.messagebus.transport import (UNIX, get_unix_socket_path,
+                                          client_supports_unix_socket,
+                                          create_unix_socket)
 from mycroft.util import validate_param, create_echo_function
 from mycroft.util.log import LOG
 
+# Events emitted by the client itself rather than received from the bus
+LOCAL_EVENTS = ('open', 'close', 'error', 'message')
+
+# Control message answered by every client with its dispatch statistics
+DISPATCH_STATS = 'mycroft.bus.dispatch.stats'
+
 
 class WebsocketClient(object):
     def __init__(self, host=None, port=None, route=None, ssl=None):
 
         config = Configuration.get().get("websocket")
+        # Local clients may use the unix socket, explicit hosts use TCP
+        self.unix_socket = None
+        if not host and config.get("transport") == UNIX:
+            self.unix_socket = get_unix_socket_path(config)
+            if self.unix_socket and not client_supports_unix_socket():
+                LOG.warning('websocket-client is too old for the unix '
+                            'socket transport, using TCP')
+                self.unix_socket = None
         host = host or config.get("host")
         port = port or config.get("port")
         route = route or config.get("route")
@@ -40,13 +64,40 @@ class WebsocketClient(object):
         validate_param(port, "websocket.port")
         validate_param(route, "websocket.route")
 
+        self.wire_format = wire.select_format(config.get("format"))
+        # Messages sent are also handed to the handlers of this client
+        # directly, the service then doesn't send them back
+        self.local_delivery = config.get("local_delivery", False)
         self.url = WebsocketClient.build_url(host, port, route, ssl)
+        params = []
+        if self.wire_format != wire.JSON:
+            params.append("format=" + self.wire_format)
+        if self.local_delivery:
+            params.append("echo=0")
+        if params:
+            self.url += "?" + "&".join(params)
         self.emitter = EventEmitter()
         self.client = self.create_client()
-        self.pool = ThreadPool(10)
+        dispatch_config = dict(config.get("dispatch", {}))
+        # Answered even when all workers are busy
+        dispatch_config['inline'] = \
+            list(dispatch_config.get('inline', [])) + [DISPATCH_STATS]
+        self.dispatcher = Dispatcher(self.emitter.emit, **dispatch_config)
         self.retry = 5
         self.connected_event = Event()
         self.started_running = False
+        self.pending_requests = PendingRequests()
+        # Message types routed to this client, None receives everything
+        self.subscriptions = None
+        self._registered_types = set()
+        self.on(DISPATCH_STATS, self.handle_dispatch_stats)
+
+    def handle_dispatch_stats(self, message):
+        """ Reply with the queue depth and handler latency of every lane.
+        """
+        self.emit(message.response({'process': basename(sys.argv[0]),
+                                    'pid': os.getpid(),
+                                    'lanes': self.dispatcher.stats()}))
 
     @staticmethod
     def build_url(host, port, route, ssl):
@@ -54,13 +105,21 @@ class WebsocketClient(object):
         return scheme + "://" + host + ":" + str(port) + route
 
     def create_client(self):
+        kwargs = {}
+        if self.unix_socket:
+            # Connected in run_forever, the url is only used for the handshake
+            self.unix_connection = create_unix_socket()
+            kwargs['socket'] = self.unix_connection
         return WebSocketApp(self.url,
                             on_open=self.on_open, on_close=self.on_close,
-                            on_error=self.on_error, on_message=self.on_message)
+                            on_error=self.on_error, on_message=self.on_message,
+                            **kwargs)
 
     def on_open(self, ws):
         LOG.info("Connected")
         self.connected_event.set()
+        if self.subscriptions is not None:
+            self._send_subscription(SUBSCRIBE, self.subscriptions)
         self.emitter.emit("open")
         # Restore reconnect timer to 5 seconds on sucessful connect
         self.retry = 5
@@ -92,10 +151,17 @@ class WebsocketClient(object):
             pass
 
     def on_message(self, ws, message):
-        self.emitter.emit('message', message)
-        parsed_message = Message.deserialize(message)
-        self.pool.apply_async(
-            self.emitter.emit, (parsed_message.type, parsed_message))
+        # Only the type is decoded here, data and context on first access
+        parsed_message = wire.decode_lazy(message)
+        if self.emitter.listeners('message'):
+            if wire.is_binary(self.wire_format):
+                # 'message' listeners always get the json representation
+                message = parsed_message.serialize()
+            self.emitter.emit('message', message)
+        if (not self.pending_requests.resolve(parsed_message) and
+                not self.emitter.listeners(parsed_message.type)):
+            return  # Nobody is interested, drop without decoding
+        self.dispatcher.dispatch(parsed_message)
 
     def emit(self, message):
         if not self.connected_event.wait(10):
@@ -104,15 +170,44 @@ class WebsocketClient(object):
                                  'before emitting messages')
             self.connected_event.wait()
 
+        frame = None
         try:
             if hasattr(message, 'serialize'):
-                self.client.send(message.serialize())
+                frame = self._send(message)
             else:
-                self.client.send(json.dumps(message.__dict__))
+                frame = json.dumps(message.__dict__)
+                self.client.send(frame)
         except WebSocketConnectionClosedException:
             LOG.warning('Could not send {} message because connection '
                         'has been closed'.format(message.type))
 
+        if self.local_delivery:
+            if frame is None and hasattr(message, 'serialize'):
+                frame = wire.encode(message, self.wire_format)
+            if frame is not None:
+                # Handled from a copy decoded from the frame, just like a
+                # message received from the bus
+                self.on_message(self.client, frame)
+
+    def request(self, message, reply_type=None):
+        """Send a message and return a future for the response.
+
+        A unique request id is added to the message context and the reply
+        carrying the same id resolves the future.
+
+        Args:
+            message (Message): message to send
+            reply_type (str): the message type of the expected reply.
+                              Defaults to "<message.type>.response".
+        Returns:
+            concurrent.futures.Future resolved with the received message
+        """
+        reply_type = reply_type or message.type + '.response'
+        self._auto_subscribe(reply_type)
+        future = self.pending_requests.add(message, reply_type)
+        self.emit(message)
+        return future
+
     def wait_for_response(self, message, reply_type=None, timeout=None):
         """Send a message and wait for a response.
 
@@ -124,36 +219,86 @@ class WebsocketClient(object):
         Returns:
             The received message or None if the response timed out
         """
-        response = []
+        future = self.request(message, reply_type)
+        try:
+            return future.result(timeout or 3.0)
+        except TimeoutError:
+            future.cancel()
+            return None
 
-        def handler(message):
-            """Receive response data."""
-            response.append(message)
+    def subscribe(self, message_types=None):
+        """Only receive selected message types from the bus.
 
-        # Setup response handler
-        self.once(reply_type or message.type + '.response', handler)
-        # Send request
-        self.emit(message)
-        # Wait for response
-        start_time = monotonic.monotonic()
-        while len(response) == 0:
-            time.sleep(0.2)
-            if monotonic.monotonic() - start_time > (timeout or 3.0):
-                try:
-                    self.remove(reply_type, handler)
-                except (ValueError, KeyError):
-                    # ValueError occurs on pyee 1.0.1 removing handlers
-                    # registered with once.
-                    # KeyError may theoretically occur if the event occurs as
-                    # the handler is removbed
-                    pass
-                return None
-        return response[0]
+        Switches the connection to selective routing; the service stops
+        sending every message to this client and only forwards the types
+        with a registered handler plus the given types or glob patterns
+        (e.g. 'recognizer_loop:*'). Handlers registered later are
+        subscribed automatically.
+
+        Args:
+            message_types (list): extra message types or glob patterns
+        """
+        new_types = set(message_types or [])
+        if self.subscriptions is None:
+            self.subscriptions = set()
+            new_types.update(self._registered_types)
+        new_types -= self.subscriptions
+        self.subscriptions.update(new_types)
+        self._send_subscription(SUBSCRIBE, new_types)
+
+    def unsubscribe(self, message_types):
+        """Stop receiving message types or glob patterns from the bus.
+
+        Args:
+            message_types (list): message types or glob patterns
+        """
+        if self.subscriptions is None:
+            return
+        old_types = self.subscriptions.intersection(message_types)
+        self.subscriptions -= old_types
+        self._send_subscription(UNSUBSCRIBE, old_types)
+
+    def _send_subscription(self, message_type, message_types):
+        """Send a subscription update, on_open sends it if not connected."""
+        if not message_types or not self.connected_event.is_set():
+            return
+        try:
+            self._send(Message(message_type, {'types': sorted(message_types)}))
+        except WebSocketConnectionClosedException:
+            pass
+
+    def _send(self, message):
+        """Encode and send a message in the wire format of the connection.
+
+        Returns:
+            the frame sent
+        """
+        opcode = (ABNF.OPCODE_BINARY if wire.is_binary(self.wire_format)
+                  else ABNF.OPCODE_TEXT)
+        frame = wire.encode(message, self.wire_format)
+        self.client.send(frame, opcode)
+        return frame
+
+    def _auto_subscribe(self, event_name):
+        if event_name in LOCAL_EVENTS:
+            return
+        self._registered_types.add(event_name)
+        if (self.subscriptions is not None and
+                event_name not in self.subscriptions):
+            self.subscribe([event_name])
 
     def on(self, event_name, func):
+        self._auto_subscribe(event_name)
         self.emitter.on(event_name, func)
 
+    def keep_order(self, event_name):
+        """ Run the handlers of messages of this type one message at a time,
+            in the order the messages were received.
+        """
+        self.dispatcher.keep_order(event_name)
+
     def once(self, event_name, func):
+        self._auto_subscribe(event_name)
         self.emitter.once(event_name, func)
 
     def remove(self, event_name, func):
@@ -175,6 +320,12 @@ class WebsocketClient(object):
 
     def run_forever(self):
         self.started_running = True
+        if self.unix_socket:
+            try:
+                self.unix_connection.connect(self.unix_socket)
+            except socket.error as e:
+                self.on_error(self.client, e)
+                return
         self.client.run_forever()
 
     def close(self):
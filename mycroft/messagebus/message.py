@@ -13,6 +13,8 @@
 # limitations under the License.
 #
 import json
+from collections import OrderedDict
+
 from mycroft.util.parse import normalize
 
 
@@ -44,16 +46,18 @@ class Message(object):
         """This returns a string of the message info.
 
         This makes it easy to send over a websocket. This uses
-        json dumps to generate the string with type, data and context
+        json dumps to generate the string with type, data and context.
+        The type is always the first key so receivers can read it without
+        parsing the whole message.
 
         Returns:
             str: a json string representation of the message.
         """
-        return json.dumps({
-            'type': self.type,
-            'data': self.data,
-            'context': self.context
-        })
+        return json.dumps(OrderedDict([
+            ('type', self.type),
+            ('data', self.data),
+            ('context', self.context)
+        ]))
 
     @staticmethod
     def deserialize(value):
@@ -161,3 +165,59 @@ class Message(object):
             for token in self.data["__tags__"]:
                 utt = utt.replace(token.get("key", ""), "")
         return normalize(utt)
+
+
+class LazyMessage(Message):
+    """Message received from the bus, decoded on first use.
+
+    Only the type is read when the message is received; data and context
+    are decoded from the frame the first time either of them is accessed,
+    so messages without a handler are never fully parsed.
+
+    Attributes:
+        type (str): type of data sent within the message.
+    """
+
+    def __init__(self, type, frame, decoder):
+        """Construct a message from a frame whose type is already known
+
+        Args:
+            type (str): type of the message
+            frame: the received frame
+            decoder: function decoding the frame to a dict with data and
+                     context
+        """
+        self.type = type
+        self._frame = frame
+        self._decoder = decoder
+        self._data = None
+        self._context = None
+        self._decoded = False
+
+    def _decode(self):
+        if not self._decoded:
+            obj = self._decoder(self._frame)
+            self._data = obj.get('data') or {}
+            self._context = obj.get('context')
+            self._decoded = True
+            self._frame = None
+
+    @property
+    def data(self):
+        self._decode()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._decode()
+        self._data = value
+
+    @property
+    def context(self):
+        self._decode()
+        return self._context
+
+    @context.setter
+    def context(self, value):
+        self._decode()
+        self._context = value
@@ -0,0 +1,93 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Record messagebus traffic to a capture file.
+
+Usage:
+    python -m mycroft.messagebus.record capture.bus [--duration SECONDS]
+
+Every message on the bus is appended to the capture as it arrives, until
+the duration has passed or Ctrl+C is pressed. Recording into an existing
+capture continues it. Use mycroft.messagebus.replay to play it back.
+"""
+import argparse
+import time
+from threading import Lock, Thread
+
+from mycroft.messagebus.capture import CaptureWriter
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.util import wait_for_exit_signal
+from mycroft.util.log import LOG
+
+# Seconds between flushes of the capture to disk
+FLUSH_INTERVAL = 1.0
+
+
+class Recorder(object):
+    """ Append every message received by a bus client to a capture.
+
+        Args:
+            ws (WebsocketClient): connection to the bus
+            writer (CaptureWriter): capture to append to
+    """
+
+    def __init__(self, ws, writer):
+        self.ws = ws
+        self.writer = writer
+        self.lock = Lock()
+        self.last_flush = time.time()
+        ws.on('message', self.record)
+
+    def record(self, frame):
+        now = time.time()
+        with self.lock:
+            self.writer.write(frame, now)
+            if now - self.last_flush > FLUSH_INTERVAL:
+                self.writer.flush()
+                self.last_flush = now
+
+    def close(self):
+        self.ws.remove('message', self.record)
+        with self.lock:
+            self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('capture', help='capture file to write')
+    parser.add_argument('-d', '--duration', type=float,
+                        help='seconds to record, until Ctrl+C if not set')
+    args = parser.parse_args()
+
+    ws = WebsocketClient()
+    recorder = Recorder(ws, CaptureWriter(args.capture))
+    thread = Thread(target=ws.run_forever)
+    thread.daemon = True
+    thread.start()
+
+    LOG.info('Recording bus traffic to {}'.format(args.capture))
+    if args.duration:
+        try:
+            time.sleep(args.duration)
+        except KeyboardInterrupt:
+            pass
+    else:
+        wait_for_exit_signal()
+    recorder.close()
+    ws.close()
+    print('Recorded {} messages'.format(recorder.writer.messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Replay a messagebus capture file.
+
+Usage:
+    python -m mycroft.messagebus.replay capture.bus [--speed 2]
+        [--start SECONDS] [--end SECONDS] [--types 'enclosure.*' ...]
+    python -m mycroft.messagebus.replay capture.bus --info
+
+Messages are sent with the same time between them as when recorded,
+divided by --speed. --speed 0 sends them as fast as possible. --start and
+--end select a part of the capture, in seconds from its first message.
+"""
+import argparse
+import json
+import time
+from fnmatch import fnmatchcase
+
+from websocket import ABNF, create_connection
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.capture import CaptureReader
+from mycroft.messagebus.client.ws import WebsocketClient
+
+
+def replay(reader, send, speed=1.0, start=None, end=None, types=None):
+    """ Send the messages of a capture with their recorded timing.
+
+        Args:
+            reader (CaptureReader): capture to replay
+            send: function(record) sending a message
+            speed (float): replay speed factor, 0 for as fast as possible
+            start (float): timestamp of the first message to send
+            end (float): timestamp to stop at
+            types (list): glob patterns of message types to send, all
+                          types if empty
+
+        Returns:
+            dict: messages sent and the largest delay behind schedule
+    """
+    sent = 0
+    max_lag = 0.0
+    first = None
+    replay_start = None
+    for record in reader.records(start, end):
+        if types and not any(fnmatchcase(record.type or '', pattern)
+                             for pattern in types):
+            continue
+        if first is None:
+            first = record.timestamp
+            replay_start = time.time()
+        if speed:
+            due = replay_start + (record.timestamp - first) / speed
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+        send(record)
+        sent += 1
+    return {'messages': sent, 'max_lag': max_lag}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('capture', help='capture file to replay')
+    parser.add_argument('-s', '--speed', type=float, default=1.0,
+                        help='replay speed factor, 0 for no delays')
+    parser.add_argument('--start', type=float,
+                        help='seconds from the start of the capture')
+    parser.add_argument('--end', type=float,
+                        help='seconds from the start of the capture')
+    parser.add_argument('-t', '--types', nargs='*',
+                        help='message types to replay, glob patterns')
+    parser.add_argument('--info', action='store_true',
+                        help='show message counts instead of replaying')
+    args = parser.parse_args()
+
+    reader = CaptureReader(args.capture)
+    if args.info:
+        print(json.dumps(reader.summary(), indent=2, sort_keys=True))
+        return
+
+    first = next(reader.records(), None)
+    if first is None:
+        print('The capture is empty')
+        return
+    start = first.timestamp + args.start if args.start else None
+    end = first.timestamp + args.end if args.end else None
+
+    config = Configuration.get().get("websocket")
+    url = WebsocketClient.build_url(config.get("host"), config.get("port"),
+                                    config.get("route"), config.get("ssl"))
+    ws = create_connection(url)
+
+    def send(record):
+        if record.binary:
+            ws.send(record.frame, ABNF.OPCODE_BINARY)
+        else:
+            ws.send(record.frame.decode('utf-8'))
+
+    try:
+        result = replay(reader, send, args.speed, start, end, args.types)
+    finally:
+        ws.close()
+    print('Replayed {} messages, at most {:.3f} s behind'.format(
+        result['messages'], result['max_lag']))
+
+
+if __name__ == '__main__':
+    main()
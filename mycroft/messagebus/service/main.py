@@ -13,10 +13,13 @@
 # limitations under the License.
 #
 from tornado import autoreload, web, ioloop
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_unix_socket
 
 from mycroft.configuration import Configuration
 from mycroft.lock import Lock  # creates/supports PID locking file
 from mycroft.messagebus.service.ws import WebsocketEventHandler
+from mycroft.messagebus.transport import get_unix_socket_path
 from mycroft.util import validate_param, reset_sigint_handler, create_daemon, \
     wait_for_exit_signal
 
@@ -47,10 +50,17 @@ def main():
     validate_param(route, "websocket.route")
 
     routes = [
-        (route, WebsocketEventHandler)
+        (route, WebsocketEventHandler,
+         {'send_queue': config.get('send_queue')})
     ]
     application = web.Application(routes, **settings)
     application.listen(port, host)
+
+    # Serve local clients on a unix domain socket as well
+    unix_socket = get_unix_socket_path(config)
+    if unix_socket:
+        server = HTTPServer(application)
+        server.add_socket(bind_unix_socket(unix_socket, mode=0o666))
     create_daemon(ioloop.IOLoop.instance().start)
 
     wait_for_exit_signal()
@@ -0,0 +1,114 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from fnmatch import fnmatchcase
+
+
+# Control messages handled by the service itself, never forwarded
+SUBSCRIBE = 'mycroft.bus.subscribe'
+UNSUBSCRIBE = 'mycroft.bus.unsubscribe'
+
+GLOB_CHARS = ('*', '?', '[')
+
+
+def is_pattern(message_type):
+    """ Check if a subscription is a glob pattern rather than a type. """
+    return any(c in message_type for c in GLOB_CHARS)
+
+
+class SubscriptionIndex(object):
+    """ Index from message type to the clients that should receive it.
+
+        Clients start out receiving every message. Once a client subscribes
+        to anything it only receives the message types (or glob patterns
+        such as 'recognizer_loop:*') it subscribed to.
+    """
+
+    def __init__(self):
+        self.broadcast = set()  # Clients that never subscribed
+        self.exact = {}  # message type -> set of clients
+        self.patterns = {}  # glob pattern -> set of clients
+        self.subscriptions = {}  # client -> set of types and patterns
+        self._pattern_cache = {}  # message type -> frozenset of clients
+
+    def add_client(self, client):
+        self.broadcast.add(client)
+
+    def remove_client(self, client):
+        self.broadcast.discard(client)
+        for message_type in self.subscriptions.pop(client, ()):
+            self._discard(message_type, client)
+        self._pattern_cache.clear()
+
+    def subscribe(self, client, message_types):
+        """ Subscribe client to a list of message types or glob patterns.
+
+            Args:
+                client: connection to route messages to
+                message_types (list): types or glob patterns
+        """
+        self.broadcast.discard(client)
+        subscriptions = self.subscriptions.setdefault(client, set())
+        for message_type in message_types:
+            subscriptions.add(message_type)
+            index = self.patterns if is_pattern(message_type) else self.exact
+            index.setdefault(message_type, set()).add(client)
+        self._pattern_cache.clear()
+
+    def unsubscribe(self, client, message_types):
+        """ Remove message types or glob patterns from a client.
+
+            The client stays in selective mode even if it has no
+            subscriptions left.
+        """
+        subscriptions = self.subscriptions.get(client, set())
+        for message_type in message_types:
+            if message_type in subscriptions:
+                subscriptions.remove(message_type)
+                self._discard(message_type, client)
+        self._pattern_cache.clear()
+
+    def _discard(self, message_type, client):
+        index = self.patterns if is_pattern(message_type) else self.exact
+        clients = index.get(message_type)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del index[message_type]
+
+    def _pattern_clients(self, message_type):
+        clients = self._pattern_cache.get(message_type)
+        if clients is None:
+            matched = set()
+            for pattern, subscribers in self.patterns.items():
+                if fnmatchcase(message_type, pattern):
+                    matched.update(subscribers)
+            clients = frozenset(matched)
+            self._pattern_cache[message_type] = clients
+        return clients
+
+    def recipients(self, message_type):
+        """ Get all clients that should receive a message type.
+
+            Args:
+                message_type (str): type of the message to route
+
+            Returns:
+                set: clients to deliver the message to
+        """
+        recipients = set(self.broadcast)
+        recipients.update(self.exact.get(message_type, ()))
+        if self.patterns and message_type:
+            recipients.update(self._pattern_clients(message_type))
+        return recipients
@@ -0,0 +1,203 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import deque, Counter
+from fnmatch import fnmatchcase
+
+from tornado.iostream import StreamClosedError
+from tornado.websocket import WebSocketClosedError
+
+from mycroft.util.log import LOG
+
+
+# Overflow policies
+DROP_OLDEST = 'drop_oldest'
+DROP_TYPE = 'drop_type'
+DISCONNECT = 'disconnect'
+POLICIES = (DROP_OLDEST, DROP_TYPE, DISCONNECT)
+
+
+class SendQueue(object):
+    """ Bounded outbound message queue of a bus connection.
+
+        Frames are written to the connection right away as long as less
+        than window_bytes are waiting to be flushed to the socket. Beyond
+        that, frames wait in the queue which is limited to max_messages
+        and max_bytes. When a new frame doesn't fit the overflow policy
+        decides what happens:
+
+        drop_oldest: queued frames are dropped, oldest first
+        drop_type: queued frames with a type matching drop_types (glob
+                   patterns) are dropped first, then the oldest frames
+        disconnect: the connection is closed
+
+        Args:
+            write: function(frame, binary) writing to the connection,
+                   returning a Future resolved when the frame is flushed
+            close: function closing the connection
+            max_messages (int): maximum number of queued frames
+            max_bytes (int): maximum size of queued frames
+            window_bytes (int): bytes written but not yet flushed before
+                                frames are queued
+            policy (str): overflow policy, one of POLICIES
+            drop_types (list): message types dropped first by drop_type
+    """
+
+    def __init__(self, write, close, max_messages=1000,
+                 max_bytes=4 * 1024 * 1024, window_bytes=64 * 1024,
+                 policy=DROP_OLDEST, drop_types=None):
+        if policy not in POLICIES:
+            LOG.warning('Unknown send queue policy {}, '
+                        'using {}'.format(policy, DROP_OLDEST))
+            policy = DROP_OLDEST
+        self.write = write
+        self.close = close
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.window_bytes = window_bytes
+        self.policy = policy
+        self.drop_types = drop_types or []
+
+        self.queue = deque()  # (message type, frame, binary)
+        self.queued_bytes = 0
+        self.unflushed_bytes = 0
+        self.sent = 0
+        self.dropped = Counter()  # message type -> number of dropped frames
+        self.closed = False
+        self.overflowing = False
+        self.pumping = False
+
+    def put(self, msg_type, frame, binary=False):
+        """ Send a frame, queueing it if the client is not keeping up.
+
+            Args:
+                msg_type (str): type of the message in the frame
+                frame (str or bytes): encoded message
+                binary (bool): send as binary websocket frame
+        """
+        if self.closed:
+            return
+        if not self.queue and self.unflushed_bytes < self.window_bytes:
+            self._write(msg_type, frame, binary)
+            return
+
+        size = len(frame)
+        if (len(self.queue) >= self.max_messages or
+                self.queued_bytes + size > self.max_bytes):
+            if not self._make_room(msg_type, size):
+                return
+        self.queue.append((msg_type, frame, binary))
+        self.queued_bytes += size
+
+    def _make_room(self, msg_type, size):
+        """ Apply the overflow policy to fit a new frame.
+
+            Returns:
+                bool: True if the new frame should be queued
+        """
+        if not self.overflowing:
+            LOG.warning('Bus client is not keeping up, {} messages queued, '
+                        'applying {} policy'.format(len(self.queue),
+                                                    self.policy))
+            self.overflowing = True
+
+        if self.policy == DISCONNECT:
+            self.dropped[msg_type] += 1
+            self.shutdown()
+            self.close()
+            return False
+
+        if self.policy == DROP_TYPE:
+            kept = deque()
+            remaining = len(self.queue)
+            for queued in self.queue:
+                if (self._is_droppable(queued[0]) and
+                        not self._fits(size, remaining)):
+                    self._drop(queued)
+                    remaining -= 1
+                else:
+                    kept.append(queued)
+            self.queue = kept
+            if not self._fits(size) and self._is_droppable(msg_type):
+                self.dropped[msg_type] += 1
+                return False
+
+        while self.queue and not self._fits(size):
+            self._drop(self.queue.popleft())
+        return True
+
+    def _fits(self, size, queued=None):
+        if queued is None:
+            queued = len(self.queue)
+        return (queued < self.max_messages and
+                self.queued_bytes + size <= self.max_bytes)
+
+    def _is_droppable(self, msg_type):
+        return any(fnmatchcase(msg_type or '', pattern)
+                   for pattern in self.drop_types)
+
+    def _drop(self, queued):
+        self.queued_bytes -= len(queued[1])
+        self.dropped[queued[0]] += 1
+
+    def _write(self, msg_type, frame, binary):
+        try:
+            future = self.write(frame, binary)
+        except (WebSocketClosedError, StreamClosedError):
+            self.shutdown()
+            return
+        self.sent += 1
+        if future is not None:
+            size = len(frame)
+            self.unflushed_bytes += size
+            future.add_done_callback(lambda f: self._on_flushed(f, size))
+
+    def _on_flushed(self, future, size):
+        self.unflushed_bytes -= size
+        if future.exception() is not None:
+            self.shutdown()
+            return
+        self._pump()
+
+    def _pump(self):
+        if self.pumping:
+            return  # Flushed synchronously while already pumping
+        self.pumping = True
+        try:
+            while self.queue and self.unflushed_bytes < self.window_bytes:
+                msg_type, frame, binary = self.queue.popleft()
+                self.queued_bytes -= len(frame)
+                self._write(msg_type, frame, binary)
+        finally:
+            self.pumping = False
+        if not self.queue:
+            self.overflowing = False
+
+    def shutdown(self):
+        """ Discard queued frames, the connection is closed. """
+        self.closed = True
+        self.queue.clear()
+        self.queued_bytes = 0
+
+    def stats(self):
+        """ Get queue depth and drop counters. """
+        return {
+            'queued_messages': len(self.queue),
+            'queued_bytes': self.queued_bytes,
+            'unflushed_bytes': self.unflushed_bytes,
+            'sent': self.sent,
+            'dropped': sum(self.dropped.values()),
+            'dropped_types': dict(self.dropped),
+            'policy': self.policy
+        }
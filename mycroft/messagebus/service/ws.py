@@ -15,17 +15,27 @@
 import json
 import sys
 import traceback
+from itertools import count
 
 import tornado.websocket
 from pyee import EventEmitter
 
+from mycroft.messagebus import wire
 from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.routing import (SubscriptionIndex,
+                                                SUBSCRIBE, UNSUBSCRIBE)
+from mycroft.messagebus.service.send_queue import SendQueue
 from mycroft.util.log import LOG
 
 
 EventBusEmitter = EventEmitter()
 
 client_connections = []
+subscriptions = SubscriptionIndex()
+connection_ids = count(1)
+
+# Control message answered by the service with send queue statistics
+STATS = 'mycroft.bus.stats'
 
 
 class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
@@ -33,6 +43,20 @@ class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
         tornado.websocket.WebSocketHandler.__init__(
             self, application, request, **kwargs)
         self.emitter = EventBusEmitter
+        self.wire_format = wire.JSON
+        # Clients delivering their own messages locally don't get them back
+        self.echo = True
+        self.connection_id = next(connection_ids)
+        self.send_queue = None
+
+    def initialize(self, send_queue=None):
+        """ Setup handler.
+
+            Args:
+                send_queue (dict): SendQueue arguments from the
+                                   websocket.send_queue config
+        """
+        self.queue_config = send_queue or {}
 
     def on(self, event_name, handler):
         self.emitter.on(event_name, handler)
@@ -40,33 +64,83 @@ class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
     def on_message(self, message):
         LOG.debug(message)
         try:
-            deserialized_message = Message.deserialize(message)
+            # Routing only needs the type, data is decoded if required
+            deserialized_message = wire.decode_lazy(message)
         except:
             return
 
+        if deserialized_message.type in (SUBSCRIBE, UNSUBSCRIBE):
+            self.handle_subscription(deserialized_message)
+            return
+        if deserialized_message.type == STATS:
+            self.handle_stats(deserialized_message)
+            return
+
         try:
-            self.emitter.emit(deserialized_message.type, deserialized_message)
+            if self.emitter.listeners(deserialized_message.type):
+                self.emitter.emit(deserialized_message.type,
+                                  deserialized_message)
         except Exception as e:
             LOG.exception(e)
             traceback.print_exc(file=sys.stdout)
             pass
 
+        # Encode once per wire format in use by the recipients
+        frames = {self.wire_format: message}
+        for client in subscriptions.recipients(deserialized_message.type):
+            if client is self and not self.echo:
+                continue
+            frame = frames.get(client.wire_format)
+            if frame is None:
+                frame = wire.encode(deserialized_message, client.wire_format)
+                frames[client.wire_format] = frame
+            client.send_queue.put(deserialized_message.type, frame,
+                                  wire.is_binary(client.wire_format))
+
+    def handle_subscription(self, message):
+        """ Update the message types routed to this connection. """
+        message_types = message.data.get('types', [])
+        if message.type == SUBSCRIBE:
+            subscriptions.subscribe(self, message_types)
+        else:
+            subscriptions.unsubscribe(self, message_types)
+
+    def handle_stats(self, message):
+        """ Reply with the send queue statistics of all connections. """
+        stats = []
         for client in client_connections:
-            client.write_message(message)
+            client_stats = client.send_queue.stats()
+            client_stats['id'] = client.connection_id
+            client_stats['remote_ip'] = client.request.remote_ip
+            client_stats['wire_format'] = client.wire_format
+            stats.append(client_stats)
+        self.emit(message.response({'connections': stats}))
 
     def open(self):
-        self.write_message(Message("connected").serialize())
+        self.wire_format = wire.select_format(
+            self.get_argument('format', wire.JSON))
+        self.echo = self.get_argument('echo', '1') != '0'
+        self.send_queue = SendQueue(self.write_message, self.close,
+                                    **self.queue_config)
+        # Bus messages are small, don't hold them back waiting for ACKs
+        self.set_nodelay(True)
+        self.emit(Message("connected"))
         client_connections.append(self)
+        subscriptions.add_client(self)
 
     def on_close(self):
         client_connections.remove(self)
+        subscriptions.remove_client(self)
+        self.send_queue.shutdown()
 
     def emit(self, channel_message):
         if (hasattr(channel_message, 'serialize') and
                 callable(getattr(channel_message, 'serialize'))):
-            self.write_message(channel_message.serialize())
+            self.send_queue.put(channel_message.type,
+                                wire.encode(channel_message, self.wire_format),
+                                wire.is_binary(self.wire_format))
         else:
-            self.write_message(json.dumps(channel_message))
+            self.send_queue.put(None, json.dumps(channel_message))
 
     def check_origin(self, origin):
         return True
@@ -0,0 +1,65 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Transports for the messagebus websocket.
+
+The service always listens on TCP and, when websocket.unix_socket is set,
+on a unix domain socket as well. Local clients use the unix socket when
+websocket.transport is "unix", remote clients keep using TCP.
+"""
+import inspect
+import socket
+from os.path import isabs, join
+
+from websocket import WebSocketApp
+
+from mycroft.util.signal import get_ipc_directory
+
+TCP = 'tcp'
+UNIX = 'unix'
+
+
+def get_unix_socket_path(config):
+    """ Get the path of the bus unix socket.
+
+        Args:
+            config (dict): the websocket config section
+
+        Returns:
+            str: absolute path, relative paths are in the IPC directory,
+                 or None if the unix socket is disabled
+    """
+    path = config.get('unix_socket')
+    if not path:
+        return None
+    if not isabs(path):
+        path = join(get_ipc_directory(), path)
+    return path
+
+
+def client_supports_unix_socket():
+    """ Check if WebSocketApp accepts a prepared socket.
+
+        This was added in websocket-client 1.4.
+    """
+    try:
+        args = inspect.getfullargspec(WebSocketApp.__init__).args
+    except AttributeError:  # Python 2
+        args = inspect.getargspec(WebSocketApp.__init__).args
+    return 'socket' in args
+
+
+def create_unix_socket():
+    """ Create an unconnected unix stream socket for a client. """
+    return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
@@ -0,0 +1,157 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Wire formats for messages sent over the messagebus websocket.
+
+'json' messages are sent as text frames and 'msgpack' messages as binary
+frames. Each connection picks its format when connecting by adding
+'?format=<name>' to the websocket url, the service translates between
+formats so clients using different formats can talk to each other.
+"""
+import json
+from collections import OrderedDict
+from json.decoder import scanstring
+
+from mycroft.messagebus.message import Message, LazyMessage
+from mycroft.util.log import LOG
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# Start of every json frame created by Message.serialize()
+JSON_TYPE_PREFIX = '{"type": "'
+
+
+def supported_formats():
+    """ Get the wire formats usable with the installed packages. """
+    return [JSON, MSGPACK] if msgpack else [JSON]
+
+
+def select_format(wire_format):
+    """ Get the wire format to use, falling back to json if unsupported.
+
+        Args:
+            wire_format (str): requested wire format
+
+        Returns:
+            str: wire format to use
+    """
+    wire_format = wire_format or JSON
+    if wire_format not in supported_formats():
+        LOG.warning('Wire format {} is not available, '
+                    'using {}'.format(wire_format, JSON))
+        return JSON
+    return wire_format
+
+
+def encode(message, wire_format=JSON):
+    """ Encode a message into a websocket frame.
+
+        Args:
+            message (Message): message to encode
+            wire_format (str): one of supported_formats()
+
+        Returns:
+            str for text frames or bytes for binary frames
+    """
+    if wire_format == MSGPACK:
+        return msgpack.packb(OrderedDict([
+            ('type', message.type),
+            ('data', message.data),
+            ('context', message.context)
+        ]), use_bin_type=True)
+    return message.serialize()
+
+
+def _is_msgpack(frame):
+    return isinstance(frame, bytes) and msgpack and frame[:1] != b'{'
+
+
+def _loads(frame):
+    if _is_msgpack(frame):
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+
+def decode(frame):
+    """ Decode a websocket frame into a message.
+
+        Binary frames are msgpack encoded, text frames are json. A msgpack
+        encoded message never starts with '{' so json received as bytes
+        (e.g. on python 2) is still detected.
+
+        Args:
+            frame (str or bytes): frame received from the websocket
+
+        Returns:
+            Message: the decoded message
+    """
+    obj = _loads(frame)
+    return Message(obj.get('type'), obj.get('data'), obj.get('context'))
+
+
+def peek_type(frame):
+    """ Read the message type without decoding the rest of the frame.
+
+        Only works for frames with the type as first key, as created by
+        encode().
+
+        Args:
+            frame (str or bytes): frame received from the websocket
+
+        Returns:
+            str: the message type, or None if it can't be read cheaply
+    """
+    try:
+        if _is_msgpack(frame):
+            unpacker = msgpack.Unpacker(raw=False)
+            unpacker.feed(frame)
+            if unpacker.read_map_header() and unpacker.unpack() == 'type':
+                return unpacker.unpack() or None
+            return None
+        if isinstance(frame, bytes):
+            frame = frame.decode('utf-8')
+        if frame.startswith(JSON_TYPE_PREFIX):
+            return scanstring(frame, len(JSON_TYPE_PREFIX))[0]
+    except Exception:
+        pass
+    return None
+
+
+def decode_lazy(frame):
+    """ Decode the type of a frame, leaving data and context for later.
+
+        Frames not created by encode() are decoded right away.
+
+        Args:
+            frame (str or bytes): frame received from the websocket
+
+        Returns:
+            Message: message decoding data and context on first access
+    """
+    msg_type = peek_type(frame)
+    if msg_type is None:
+        return decode(frame)
+    return LazyMessage(msg_type, frame, _loads)
+
+
+def is_binary(wire_format):
+    """ Check if frames of a wire format are sent as binary frames. """
+    return wire_format == MSGPACK
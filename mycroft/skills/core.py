@@ -827,7 +827,8 @@ class MycroftSkill(object):
                 entity_type:    Intent handler entity to tie the word to
         """
         self.emitter.emit(Message('register_vocab', {
-            'start': entity, 'end': to_alnum(self.skill_id) + entity_type
+            'start': entity, 'end': to_alnum(self.skill_id) + entity_type,
+            'skill_id': str(self.skill_id)
         }))
 
     def register_regex(self, regex_str):
@@ -837,7 +838,8 @@ class MycroftSkill(object):
         """
         regex = munge_regex(regex_str, self.skill_id)
         re.compile(regex)  # validate regex
-        self.emitter.emit(Message('register_vocab', {'regex': regex}))
+        self.emitter.emit(Message('register_vocab', {
+            'regex': regex, 'skill_id': str(self.skill_id)}))
 
     def speak(self, utterance, expect_response=False):
         """
@@ -1065,28 +1067,17 @@ class MycroftSkill(object):
         event_name = self._unique_name(name)
         data = {'name': event_name}
 
-        # making event_status an object so it's refrence can be changed
-        event_status = [None]
-        finished_callback = [False]
-
-        def callback(message):
-            if message.data is not None:
-                event_time = int(message.data[0][0])
-                current_time = int(time.time())
-                time_left_in_seconds = event_time - current_time
-                event_status[0] = time_left_in_seconds
-            finished_callback[0] = True
-
         emitter_name = 'mycroft.event_status.callback.{}'.format(event_name)
-        self.emitter.once(emitter_name, callback)
-        self.emitter.emit(Message('mycroft.scheduler.get_event', data=data))
-
-        start_wait = time.time()
-        while finished_callback[0] is False and time.time() - start_wait < 3.0:
-            time.sleep(0.1)
-        if time.time() - start_wait > 3.0:
+        status = self.emitter.wait_for_response(
+            Message('mycroft.scheduler.get_event', data=data),
+            reply_type=emitter_name)
+        if status is None:
             raise Exception("Event Status Messagebus Timeout")
-        return event_status[0]
+        if not status.data:
+            return None
+        event_time = int(status.data[0][0])
+        current_time = int(time.time())
+        return event_time - current_time
 
     def cancel_all_repeating_events(self):
         """ Cancel any repeating events started by the skill. """
@@ -12,13 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import json
 import time
+from collections import OrderedDict
+from concurrent.futures import TimeoutError
+from copy import deepcopy
+from hashlib import md5
+from threading import Lock, Timer
+
+import psutil
 from adapt.context import ContextManagerFrame
 from adapt.engine import IntentDeterminationEngine
 
 from mycroft.configuration import Configuration
 from mycroft.messagebus.message import Message
 from mycroft.skills.core import open_intent_envelope
+from mycroft.util import create_daemon
 from mycroft.util.log import LOG
 from mycroft.util.parse import normalize
 from mycroft.metrics import report_timing, Stopwatch
@@ -120,10 +129,92 @@ class ContextManager(object):
         return result
 
 
+class IntentCache(object):
+    """
+    Least recently used cache of Adapt matches.
+
+    Args:
+        size (int): maximum number of matches kept, 0 disables the cache
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Look up a match.
+
+        Returns:
+            tuple: (True, copy of the match) if cached, else (False, None)
+        """
+        with self.lock:
+            if key in self.entries:
+                # Move to the most recently used end
+                value = self.entries.pop(key)
+                self.entries[key] = value
+                self.hits += 1
+                return True, deepcopy(value)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        if not self.size:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = deepcopy(value)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0
+            }
+
+
 class IntentService(object):
-    def __init__(self, emitter):
+    """
+        Adapt intent matching of the utterances.
+
+        Args:
+            emitter: messagebus connection
+            snapshot (IntentSnapshot): restored at start and kept up to
+                                       date with the registered intents,
+                                       None to not use a snapshot
+    """
+    # Seconds without registrations before the snapshot is saved
+    SNAPSHOT_DELAY = 5
+    # Seconds converse answers are waited for after the deadline, only to
+    # report the latency of slow skills
+    CONVERSE_REPORT_TIMEOUT = 30
+
+    def __init__(self, emitter, snapshot=None):
         self.config = Configuration.get().get('context', {})
         self.engine = IntentDeterminationEngine()
+        # Bumped whenever the registered vocabulary or intents change,
+        # cached matches of older versions are never used
+        self.registry_version = 0
+        skills_config = Configuration.get().get('skills', {})
+        self.intent_cache = IntentCache(
+            skills_config.get('intent_cache_size', 256))
+        # Seconds to wait for all active skills to answer a converse request
+        self.converse_deadline = skills_config.get('converse_deadline', 5)
+        # Ask all active skills at once instead of in recency order
+        self.converse_concurrent = skills_config.get('converse_concurrent',
+                                                     False)
 
         # Dictionary for translating a skill id to a name
         self.skill_names = {}
@@ -135,17 +226,19 @@ class IntentService(object):
         self.context_manager = ContextManager(self.context_timeout)
         self.emitter = emitter
         self.emitter.on('register_vocab', self.handle_register_vocab)
+        self.emitter.on('register_vocab_batch',
+                        self.handle_register_vocab_batch)
         self.emitter.on('register_intent', self.handle_register_intent)
         self.emitter.on('recognizer_loop:utterance', self.handle_utterance)
         self.emitter.on('detach_intent', self.handle_detach_intent)
         self.emitter.on('detach_skill', self.handle_detach_skill)
+        self.emitter.on('intent.service.cache.stats',
+                        self.handle_cache_stats)
         # Context related handlers
         self.emitter.on('add_context', self.handle_add_context)
         self.emitter.on('remove_context', self.handle_remove_context)
         self.emitter.on('clear_context', self.handle_clear_context)
         # Converse method
-        self.emitter.on('skill.converse.response',
-                        self.handle_converse_response)
         self.emitter.on('mycroft.speech.recognition.unknown',
                         self.reset_converse)
         self.emitter.on('mycroft.skills.loaded', self.update_skill_name_dict)
@@ -155,6 +248,33 @@ class IntentService(object):
         self.emitter.on('active_skill_request', add_active_skill_handler)
         self.active_skills = []  # [skill_id , timestamp]
         self.converse_timeout = 5  # minutes to prune active_skills
+        self.speculative_matchers = []
+
+        # Intents are ready once the first can be matched, timed from the
+        # start of the process to catch regressions anywhere in startup
+        self.start_time = psutil.Process().create_time()
+        self.intents_ready = False
+        self.skills_initialized = False
+        self.snapshot_timer = None
+        self.snapshot = snapshot
+        if self.snapshot:
+            self.emitter.on('mycroft.skills.loaded',
+                            self.handle_skill_loaded)
+            self.emitter.on('mycroft.skills.initialized',
+                            self.handle_skills_initialized)
+            self.restore_snapshot()
+
+    def add_speculative_matcher(self, matcher):
+        """ Start matching every utterance early, while converse and
+        Adapt are still working on it.
+
+        The matcher must not block, the result is only used if the
+        utterance ends up with the fallback handlers.
+
+        Args:
+            matcher: function(utterances, lang)
+        """
+        self.speculative_matchers.append(matcher)
 
     def update_skill_name_dict(self, message):
         """
@@ -178,28 +298,41 @@ class IntentService(object):
         """Let skills know there was a problem with speech recognition"""
         lang = message.data.get('lang', "en-us")
         for skill in self.active_skills:
-            self.do_converse(None, skill[0], lang)
-
-    def do_converse(self, utterances, skill_id, lang):
-        self.emitter.emit(Message("skill.converse.request", {
-            "skill_id": skill_id, "utterances": utterances, "lang": lang}))
-        self.waiting = True
-        self.result = False
-        start_time = time.time()
-        t = 0
-        while self.waiting and t < 5:
-            t = time.time() - start_time
-            time.sleep(0.1)
-        self.waiting = False
-        return self.result
-
-    def handle_converse_response(self, message):
-        # id = message.data["skill_id"]
-        # no need to crosscheck id because waiting before new request is made
-        # no other skill will make this request is safe assumption
-        result = message.data["result"]
-        self.result = result
-        self.waiting = False
+            # The answers don't matter, nothing waits for them
+            self.emitter.emit(Message("skill.converse.request", {
+                "skill_id": skill[0], "utterances": None, "lang": lang}))
+
+    def request_converse(self, utterances, skill_id, lang):
+        """ Ask a skill to converse without waiting for the answer.
+
+        Args:
+            utterances (list):  list of utterances
+            skill_id:           id of the active skill
+            lang (string):      4 letter ISO language code
+
+        Returns:
+            Future resolved with the skill.converse.response message
+        """
+        return self.emitter.request(
+            Message("skill.converse.request", {
+                "skill_id": skill_id, "utterances": utterances, "lang": lang}),
+            reply_type="skill.converse.response")
+
+    def report_converse_timing(self, ident, skill_id, start, end, result):
+        """ Report how long an active skill took to answer converse. """
+        stopwatch = Stopwatch()
+        stopwatch.timestamp = start
+        stopwatch.time = end - start if end else None
+        if end is None:
+            LOG.warning('{} did not answer converse within {} s'.format(
+                self.get_skill_name(skill_id),
+                self.converse_deadline + self.CONVERSE_REPORT_TIMEOUT))
+        elif stopwatch.time > self.converse_deadline:
+            LOG.warning('{} answered converse after {:.1f} s'.format(
+                self.get_skill_name(skill_id), stopwatch.time))
+        report_timing(ident, 'converse', stopwatch,
+                      {'skill': self.get_skill_name(skill_id),
+                       'result': result})
 
     def remove_active_skill(self, skill_id):
         for skill in self.active_skills:
@@ -272,11 +405,17 @@ class IntentService(object):
             # Get language of the utterance
             lang = message.data.get('lang', "en-us")
             utterances = message.data.get('utterances', '')
+            ident = (message.context or {}).get('ident')
+            for matcher in self.speculative_matchers:
+                try:
+                    matcher(utterances, lang)
+                except Exception:
+                    LOG.exception('Speculative matcher failed')
 
             stopwatch = Stopwatch()
             with stopwatch:
                 # Give active skills an opportunity to handle the utterance
-                converse = self._converse(utterances, lang)
+                converse = self._converse(utterances, lang, ident)
 
                 if not converse:
                     # No conversation, use intent system to handle utterance
@@ -284,7 +423,6 @@ class IntentService(object):
 
             if converse:
                 # Report that converse handled the intent and return
-                ident = message.context['ident'] if message.context else None
                 report_timing(ident, 'intent_service', stopwatch,
                               {'intent_type': 'converse'})
                 return
@@ -302,12 +440,26 @@ class IntentService(object):
         except Exception as e:
             LOG.exception(e)
 
-    def _converse(self, utterances, lang):
+    def _converse(self, utterances, lang, ident=None):
         """ Give active skills a chance at the utterance
 
+        The most recently active skill is asked first, the next one only
+        once it declined, until a skill handles the utterance. Skills not
+        answering before the converse deadline, shared by all skills,
+        count as declined and skills not asked by then are skipped.
+
+        With converse_concurrent all active skills are asked at once and
+        the answers checked in the same order, the first skill handling it
+        wins as soon as all more recent skills declined. Less recent skills
+        then also run converse() on the utterance, their answer is ignored.
+
+        The latency of every asked skill is reported when it answers, late
+        answers included.
+
         Args:
             utterances (list):  list of utterances
             lang (string):      4 letter ISO language code
+            ident (str):        identifier of the interaction for metrics
 
         Returns:
             bool: True if converse handled it, False if  no skill processes it
@@ -317,14 +469,69 @@ class IntentService(object):
         self.active_skills = [skill for skill in self.active_skills
                               if time.time() - skill[
                                   1] <= self.converse_timeout * 60]
-
-        # check if any skill wants to handle utterance
-        for skill in self.active_skills:
-            if self.do_converse(utterances, skill[0], lang):
-                # update timestamp, or there will be a timeout where
-                # intent stops conversing whether its being used or not
-                self.add_active_skill(skill[0])
-                return True
+        if not self.active_skills:
+            return False
+
+        start = time.time()
+        deadline = start + self.converse_deadline
+
+        def report(skill_id):
+            def handler(future):
+                if future.cancelled():
+                    end, result = None, False
+                else:
+                    end = time.time()
+                    result = future.result().data.get('result', False)
+                # Not on the thread receiving from the bus
+                create_daemon(self.report_converse_timing,
+                              (ident, skill_id, start, end, result))
+            return handler
+
+        def ask(skill_id):
+            future = self.request_converse(utterances, skill_id, lang)
+            future.add_done_callback(report(skill_id))
+            return future
+
+        skill_ids = [skill[0] for skill in self.active_skills]
+        requests = OrderedDict()
+        if self.converse_concurrent:
+            for skill_id in skill_ids:
+                requests[skill_id] = ask(skill_id)
+
+        handled_by = None
+        for skill_id in skill_ids:
+            if skill_id not in requests:
+                if time.time() >= deadline:
+                    break
+                requests[skill_id] = ask(skill_id)
+            try:
+                response = requests[skill_id].result(
+                    max(deadline - time.time(), 0))
+            except TimeoutError:
+                continue
+            if response.data.get('result'):
+                handled_by = skill_id
+                break
+
+        # Answers still missing are reported as they arrive, or as missing
+        # once the report timeout has passed
+        unanswered = [f for f in requests.values() if not f.done()]
+
+        def give_up():
+            for future in unanswered:
+                future.cancel()
+
+        if unanswered:
+            timer = Timer(max(deadline - time.time(), 0) +
+                          self.CONVERSE_REPORT_TIMEOUT, give_up)
+            timer.daemon = True
+            timer.start()
+
+        if handled_by is not None:
+            # update timestamp, or there will be a timeout where
+            # intent stops conversing whether its being used or not
+            self.add_active_skill(handled_by)
+            return True
         return False
 
     def _adapt_intent_match(self, utterances, lang):
@@ -338,18 +545,25 @@ class IntentService(object):
             Intent structure, or None if no match was found.
         """
         best_intent = None
+        context_digest = self._context_digest()
         for utterance in utterances:
             try:
                 # normalize() changes "it's a boy" to "it is boy", etc.
-                best_intent = next(self.engine.determine_intent(
-                    normalize(utterance, lang), 100,
-                    include_tags=True,
-                    context_manager=self.context_manager))
+                normalized = normalize(utterance, lang)
+                key = (normalized, lang, self.registry_version,
+                       context_digest)
+                found, intent = self.intent_cache.get(key)
+                if not found:
+                    intent = next(self.engine.determine_intent(
+                        normalized, 100,
+                        include_tags=True,
+                        context_manager=self.context_manager), None)
+                    self.intent_cache.put(key, intent)
+                if intent is None:
+                    continue
+                best_intent = intent
                 # TODO - Should Adapt handle this?
                 best_intent['utterance'] = utterance
-            except StopIteration:
-                # don't show error in log
-                continue
             except Exception as e:
                 LOG.exception(e)
                 continue
@@ -361,26 +575,168 @@ class IntentService(object):
             self.add_active_skill(skill_id)
             return best_intent
 
-    def handle_register_vocab(self, message):
-        start_concept = message.data.get('start')
-        end_concept = message.data.get('end')
-        regex_str = message.data.get('regex')
-        alias_of = message.data.get('alias_of')
+    def _context_digest(self):
+        """ Digest of the context Adapt would use for a match now. """
+        context = self.context_manager.get_context()
+        if not context:
+            return None
+        return md5(json.dumps(context, sort_keys=True,
+                              default=str).encode('utf-8')).hexdigest()
+
+    def _registry_changed(self, source='skills'):
+        self.registry_version += 1
+        # Entries of older versions can't be hit anymore
+        self.intent_cache.clear()
+        if not self.intents_ready and self.engine.intent_parsers:
+            self._report_intents_ready(source)
+        if self.snapshot and self.skills_initialized:
+            self._schedule_snapshot()
+
+    def _report_intents_ready(self, source):
+        """ Report the time from process start to the first intent. """
+        self.intents_ready = True
+        stopwatch = Stopwatch()
+        stopwatch.timestamp = self.start_time
+        stopwatch.time = time.time() - self.start_time
+        LOG.info('Intents ready {:.2f} s after start, from the {}'.format(
+            stopwatch.time, source))
+        self.emitter.emit(Message('intent.service.ready', {
+            'seconds': stopwatch.time, 'source': source,
+            'intents': len(self.engine.intent_parsers)}))
+        report_timing(None, 'intent_service_ready', stopwatch,
+                      {'source': source})
+
+    def restore_snapshot(self):
+        """ Register the vocabulary and intents of the saved snapshot. """
+        skills = self.snapshot.load()
+        for record in skills.values():
+            for data in record['vocab']:
+                self._register_vocab(data)
+            for data in record['intents'].values():
+                self._register_intent(Message('register_intent', data))
+        if skills:
+            LOG.info('Restored {} intents of {} skills from {}'.format(
+                sum(len(r['intents']) for r in skills.values()),
+                len(skills), self.snapshot.path))
+            self._registry_changed('snapshot')
+
+    def save_snapshot(self):
+        try:
+            if self.snapshot.save():
+                LOG.debug('Saved intent snapshot ' + self.snapshot.path)
+        except Exception:
+            LOG.exception('Could not save intent snapshot')
+
+    def _schedule_snapshot(self):
+        if self.snapshot_timer:
+            self.snapshot_timer.cancel()
+        self.snapshot_timer = Timer(self.SNAPSHOT_DELAY, self.save_snapshot)
+        self.snapshot_timer.daemon = True
+        self.snapshot_timer.start()
+
+    def _detach_intents(self, intent_names):
+        self.engine.intent_parsers = [
+            p for p in self.engine.intent_parsers
+            if p.name not in intent_names]
+
+    def _remove_vocab(self, data):
+        """ Remove vocabulary registered with _register_vocab(). """
+        regex_str = data.get('regex')
+        if regex_str:
+            self.engine._regex_strings.discard(regex_str)
+            # The tagger uses the same list
+            self.engine.regular_expressions_entities[:] = [
+                r for r in self.engine.regular_expressions_entities
+                if r.pattern != regex_str]
+            return
+        start_concept = data['start']
+        end_concept = data['end']
+        entity = (data.get('alias_of') or start_concept, end_concept)
+        try:
+            self.engine.trie.remove(start_concept.lower(), data=entity)
+        except KeyError:
+            pass  # Not registered
+
+    def _remove_stale(self, stale):
+        """ Remove restored vocab and intents no longer registered.
+
+            Returns:
+                bool: True if anything was removed
+        """
+        vocab, intents = stale
+        if intents:
+            LOG.debug('Removing intents no longer registered: ' +
+                      ', '.join(intents))
+            self._detach_intents(intents)
+        for data in vocab:
+            self._remove_vocab(data)
+        return bool(vocab or intents)
+
+    def handle_skill_loaded(self, message):
+        """ Drop restored vocab and intents the loaded skill no longer has.
+        """
+        if self._remove_stale(self.snapshot.stale(message.data['id'])):
+            self._registry_changed()
+
+    def handle_skills_initialized(self, message):
+        """ Drop restored vocab and intents that were not registered again
+        and save.
+        """
+        self.skills_initialized = True
+        self._remove_stale(self.snapshot.reconcile())
+        self._registry_changed()
+
+    def handle_cache_stats(self, message):
+        """ Reply with the hit and miss counts of the intent cache. """
+        self.emitter.emit(message.response(self.intent_cache.stats()))
+
+    def _register_vocab(self, data):
+        start_concept = data.get('start')
+        end_concept = data.get('end')
+        regex_str = data.get('regex')
+        alias_of = data.get('alias_of')
         if regex_str:
             self.engine.register_regex_entity(regex_str)
         else:
             self.engine.register_entity(
                 start_concept, end_concept, alias_of=alias_of)
 
-    def handle_register_intent(self, message):
+    def handle_register_vocab(self, message):
+        self._register_vocab(message.data)
+        if self.snapshot:
+            self.snapshot.add_vocab(message.data.get('skill_id'),
+                                    [message.data])
+        self._registry_changed()
+
+    def handle_register_vocab_batch(self, message):
+        """ Register a list of vocabulary, each entry like the data of a
+        register_vocab message.
+        """
+        vocab = message.data.get('vocab', [])
+        for data in vocab:
+            self._register_vocab(data)
+        if self.snapshot:
+            self.snapshot.add_vocab(message.data.get('skill_id'), vocab)
+        self._registry_changed()
+
+    def _register_intent(self, message):
         intent = open_intent_envelope(message)
+        # Replaces the intent restored from the snapshot
+        self._detach_intents([intent.name])
         self.engine.register_intent_parser(intent)
 
+    def handle_register_intent(self, message):
+        self._register_intent(message)
+        if self.snapshot:
+            self.snapshot.add_intent(message.data)
+        self._registry_changed()
+
     def handle_detach_intent(self, message):
         intent_name = message.data.get('intent_name')
-        new_parsers = [
-            p for p in self.engine.intent_parsers if p.name != intent_name]
-        self.engine.intent_parsers = new_parsers
+        self._detach_intents([intent_name])
+        if self.snapshot:
+            self.snapshot.remove_intent(intent_name)
+        self._registry_changed()
 
     def handle_detach_skill(self, message):
         skill_id = message.data.get('skill_id')
@@ -388,6 +744,9 @@ class IntentService(object):
             p for p in self.engine.intent_parsers if
             not p.name.startswith(skill_id)]
         self.engine.intent_parsers = new_parsers
+        if self.snapshot:
+            self.snapshot.remove_skill(skill_id.rstrip(':'))
+        self._registry_changed()
 
     def handle_add_context(self, message):
         """ Add context
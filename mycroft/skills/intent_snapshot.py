@@ -0,0 +1,226 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Snapshot of the Adapt vocabulary and intents registered by the skills.
+
+The intent service saves it to disk so intents can be matched right after
+a restart, before the skills have loaded and registered them again.
+"""
+import json
+import os
+from hashlib import md5
+from threading import Lock
+
+from os.path import dirname, expanduser, isdir, isfile
+
+from mycroft.util.log import LOG
+
+
+def intent_skill_id(intent_name):
+    """ Skill id from an intent name in the format <skill_id>:<name>. """
+    return intent_name.split(':')[0]
+
+
+def vocab_key(vocab):
+    """ Hashable key of a recorded register_vocab entry. """
+    return tuple(sorted(vocab.items()))
+
+
+class IntentSnapshot(object):
+    """
+        Vocabulary, regexes and intents of every skill, with a content hash
+        per skill.
+
+        The record of a skill restored from disk is replaced with what the
+        skill registers after the restart, skills that never register again
+        are dropped by reconcile(). stale() and reconcile() return what was
+        restored but is no longer registered, to remove it from the engine.
+
+        Args:
+            path (str): file the snapshot is saved to
+            lang (str): language of the vocabulary, the snapshot is not
+                        restored for another language
+    """
+    VERSION = 1
+    VOCAB_KEYS = ('start', 'end', 'alias_of', 'regex')
+
+    def __init__(self, path, lang):
+        self.path = expanduser(path)
+        self.lang = lang
+        self.lock = Lock()
+        # skill id: {'vocab': [register_vocab data],
+        #            'intents': {intent name: register_intent data}}
+        self.skills = {}
+        # skill id: {'vocab': [vocab], 'intents': [intent names]} restored
+        # from disk and not yet reconciled
+        self.restored = {}
+        self.registered = set()  # Skills registering since the restart
+        self.saved_hashes = {}
+
+    @staticmethod
+    def content_hash(record):
+        return md5(json.dumps(record, sort_keys=True).encode('utf-8')) \
+            .hexdigest()
+
+    def _record(self, skill_id):
+        skill_id = str(skill_id or '')
+        if skill_id not in self.registered:
+            # Registers everything again, forget what was restored
+            self.registered.add(skill_id)
+            self.skills[skill_id] = {'vocab': [], 'intents': {}}
+        return self.skills[skill_id]
+
+    def add_vocab(self, skill_id, vocab):
+        """ Record register_vocab data of a skill.
+
+            Args:
+                skill_id (str): skill registering the vocab, None if unknown
+                vocab (list): register_vocab message data
+        """
+        with self.lock:
+            record = self._record(skill_id)
+            for data in vocab:
+                record['vocab'].append({k: data[k] for k in self.VOCAB_KEYS
+                                        if data.get(k) is not None})
+
+    def add_intent(self, data):
+        """ Record register_intent data, the skill is part of the name. """
+        with self.lock:
+            record = self._record(intent_skill_id(data['name']))
+            record['intents'][data['name']] = json.loads(json.dumps(data))
+
+    def remove_intent(self, intent_name):
+        with self.lock:
+            record = self.skills.get(intent_skill_id(intent_name))
+            if record:
+                record['intents'].pop(intent_name, None)
+
+    def remove_skill(self, skill_id):
+        with self.lock:
+            self.skills.pop(str(skill_id), None)
+            self.restored.pop(str(skill_id), None)
+            self.registered.discard(str(skill_id))
+
+    def stale(self, skill_id):
+        """ Restored vocabulary and intents the skill did not register again.
+
+            Called when the skill has loaded, the restored record of the
+            skill is considered reconciled afterwards. If the skill has not
+            registered anything yet it is left for reconcile().
+
+            Returns:
+                tuple: (vocab no skill registers anymore, intent names)
+        """
+        with self.lock:
+            skill_id = str(skill_id)
+            if skill_id not in self.registered or \
+                    skill_id not in self.restored:
+                return [], []
+            return self._stale([skill_id])
+
+    def reconcile(self):
+        """ Forget the restored skills that did not register again.
+
+            Called once all skills have loaded.
+
+            Returns:
+                tuple: (vocab no skill registers anymore, intent names) of
+                       all restored skills not reconciled before
+        """
+        with self.lock:
+            for skill_id in self.restored:
+                if skill_id not in self.registered:
+                    self.skills.pop(skill_id)
+            return self._stale(list(self.restored))
+
+    def _stale(self, skill_ids):
+        restored = [self.restored.pop(skill_id) for skill_id in skill_ids]
+        # The engine holds one entry for vocab registered by several skills
+        in_use = set(vocab_key(v) for record in self.skills.values()
+                     for v in record['vocab'])
+        vocab = {}
+        intents = []
+        for skill_id, old in zip(skill_ids, restored):
+            record = self.skills.get(skill_id, {'intents': {}})
+            intents += [name for name in old['intents']
+                        if name not in record['intents']]
+            vocab.update((vocab_key(v), v) for v in old['vocab']
+                         if vocab_key(v) not in in_use)
+        return list(vocab.values()), intents
+
+    def load(self):
+        """ Read the snapshot from disk.
+
+            Returns:
+                dict: skill id: record of the skills with a valid hash
+        """
+        if not isfile(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except Exception:
+            LOG.exception('Could not read intent snapshot ' + self.path)
+            return {}
+        if (snapshot.get('version') != self.VERSION or
+                snapshot.get('lang') != self.lang):
+            return {}
+
+        with self.lock:
+            for skill_id, entry in snapshot.get('skills', {}).items():
+                record = {'vocab': entry.get('vocab', []),
+                          'intents': entry.get('intents', {})}
+                if self.content_hash(record) != entry.get('hash'):
+                    LOG.warning('Intent snapshot of {} is corrupt, '
+                                'skipped'.format(skill_id))
+                    continue
+                self.skills[skill_id] = record
+                self.restored[skill_id] = {
+                    'vocab': list(record['vocab']),
+                    'intents': list(record['intents'])}
+                self.saved_hashes[skill_id] = entry['hash']
+            return dict(self.skills)
+
+    def save(self):
+        """ Write the snapshot to disk if any skill changed since the last
+            time it was loaded or saved.
+
+            Returns:
+                bool: True if the snapshot was written
+        """
+        with self.lock:
+            skills = {}
+            for skill_id, record in self.skills.items():
+                # A copy, bus handlers may change the record while it is
+                # written
+                record = json.loads(json.dumps(record))
+                skills[skill_id] = dict(record,
+                                        hash=self.content_hash(record))
+            hashes = {s: skills[s]['hash'] for s in skills}
+            if hashes == self.saved_hashes:
+                return False
+            snapshot = {'version': self.VERSION, 'lang': self.lang,
+                        'skills': skills}
+
+        directory = dirname(self.path)
+        if directory and not isdir(directory):
+            os.makedirs(directory)
+        # Written next to it and moved, never leaving half a snapshot
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.rename(tmp_path, self.path)
+        with self.lock:
+            self.saved_hashes = hashes
+        return True
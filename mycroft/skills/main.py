@@ -35,6 +35,7 @@ from mycroft.skills.core import load_skill, create_skill_descriptor, \
     MainModule, FallbackSkill
 from mycroft.skills.event_scheduler import EventScheduler
 from mycroft.skills.intent_service import IntentService
+from mycroft.skills.intent_snapshot import IntentSnapshot
 from mycroft.skills.padatious_service import PadatiousService
 from mycroft.util import (
     connected, wait_while_speaking, reset_sigint_handler,
@@ -83,7 +84,12 @@ def _starting_up():
     # Create the Intent manager, which converts utterances to intents
     # This is the heart of the voice invoked skill system
 
-    service = IntentService(ws)
+    # Intents are matched from the snapshot until the skills have loaded
+    snapshot = None
+    if skills_config.get('intent_snapshot'):
+        snapshot = IntentSnapshot(skills_config['intent_snapshot'],
+                                  Configuration.get().get('lang', 'en-us'))
+    service = IntentService(ws, snapshot)
     PadatiousService(ws, service)
     event_scheduler = EventScheduler(ws)
 
@@ -433,7 +439,8 @@ class SkillManager(Thread):
             Send list of loaded skills.
         """
         try:
-            self.ws.emit(Message('mycroft.skills.list', data={'skills': [
+            message = message or Message('skillmanager.list')
+            self.ws.emit(message.reply('mycroft.skills.list', data={'skills': [
                 basename(skill_path) for skill_path in self.loaded_skills
             ]}))
         except Exception as e:
@@ -469,19 +476,19 @@ class SkillManager(Thread):
                     instance = self.loaded_skills[skill]["instance"]
                 except BaseException:
                     LOG.error("converse requested but skill not loaded")
-                    self.ws.emit(Message("skill.converse.response", {
+                    self.ws.emit(message.reply("skill.converse.response", {
                         "skill_id": 0, "result": False}))
                     return
                 try:
                     result = instance.converse(utterances, lang)
-                    self.ws.emit(Message("skill.converse.response", {
+                    self.ws.emit(message.reply("skill.converse.response", {
                         "skill_id": skill_id, "result": result}))
                     return
                 except BaseException:
                     LOG.exception(
                         "Error in converse method for skill " + str(skill_id))
-        self.ws.emit(Message("skill.converse.response",
-                             {"skill_id": 0, "result": False}))
+        self.ws.emit(message.reply("skill.converse.response",
+                                   {"skill_id": 0, "result": False}))
 
 
 def main():
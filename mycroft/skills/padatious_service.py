@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import call
-from threading import Event
+from threading import Event, Lock
 from time import time as get_time, sleep
 
 from os.path import expanduser, isfile
@@ -26,6 +28,8 @@ from mycroft.util.log import LOG
 
 
 PADATIOUS_VERSION = '0.3.7'  # Also update in requirements.txt
+# Speculative results kept for utterances not (yet) failing Adapt
+MAX_SPECULATIONS = 4
 
 
 class PadatiousService(FallbackSkill):
@@ -63,6 +67,13 @@ class PadatiousService(FallbackSkill):
         self.train_delay = self.config['train_delay']
         self.train_time = get_time() + self.train_delay
 
+        # Utterance: future of the intent calculated while Adapt matched
+        self.speculations = OrderedDict()
+        self.speculation_lock = Lock()
+        if self.config.get('speculative', False):
+            self.speculation_pool = ThreadPoolExecutor(1)
+            service.add_speculative_matcher(self.speculate)
+
     def train(self, message=None):
         self.finished_training_event.clear()
         LOG.info('Training...')
@@ -70,6 +81,8 @@ class PadatiousService(FallbackSkill):
         LOG.info('Training complete.')
         self.finished_training_event.set()
         self.finished_initial_train = True
+        with self.speculation_lock:
+            self.speculations.clear()  # Calculated with the old model
 
     def wait_and_train(self):
         if not self.finished_initial_train:
@@ -102,15 +115,42 @@ class PadatiousService(FallbackSkill):
     def register_entity(self, message):
         self._register_object(message, 'entity', self.container.load_entity)
 
-    def handle_fallback(self, message):
-        utt = message.data.get('utterance')
-        LOG.debug("Padatious fallback attempt: " + utt)
-
+    def calc_intent(self, utt):
         if not self.finished_training_event.is_set():
             LOG.debug('Waiting for training to finish...')
             self.finished_training_event.wait()
+        return self.container.calc_intent(utt)
+
+    def speculate(self, utterances, lang):
+        """ Start calculating the intent before Adapt has failed. """
+        if not utterances:
+            return
+        utt = utterances[0]
+        with self.speculation_lock:
+            if utt in self.speculations:
+                return
+            self.speculations[utt] = self.speculation_pool.submit(
+                self.calc_intent, utt)
+            while len(self.speculations) > MAX_SPECULATIONS:
+                self.speculations.popitem(last=False)[1].cancel()
+
+    def get_speculation(self, utt):
+        """ Result calculated for the utterance by speculate(), if any. """
+        with self.speculation_lock:
+            future = self.speculations.pop(utt, None)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            LOG.exception('Speculative Padatious match failed')
+            return None
+
+    def handle_fallback(self, message):
+        utt = message.data.get('utterance')
+        LOG.debug("Padatious fallback attempt: " + utt)
 
-        data = self.container.calc_intent(utt)
+        data = self.get_speculation(utt) or self.calc_intent(utt)
 
         if data.conf < 0.5:
             return False
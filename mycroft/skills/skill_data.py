@@ -24,16 +24,17 @@ import re
 from mycroft.messagebus.message import Message
 
 
-def load_vocab_from_file(path, vocab_type, emitter):
-    """Load Mycroft vocabulary from file
-    The vocab is sent to the intent handler using the message bus
+def read_vocab_file(path, vocab_type):
+    """Read the vocabulary in a file
 
     Args:
         path:           path to vocabulary file (*.voc)
         vocab_type:     keyword name
-        emitter:        emitter to access the message bus
-        skill_id(str):  skill id
+
+    Returns:
+        list: register_vocab message data of every entity and alias
     """
+    vocab = []
     if path.endswith('.voc'):
         with open(path, 'r') as voc_file:
             for line in voc_file.readlines():
@@ -41,62 +42,109 @@ def load_vocab_from_file(path, vocab_type, emitter):
                     continue
                 parts = line.strip().split("|")
                 entity = parts[0]
-                emitter.emit(Message("register_vocab", {
-                    'start': entity, 'end': vocab_type
-                }))
+                vocab.append({'start': entity, 'end': vocab_type})
                 for alias in parts[1:]:
-                    emitter.emit(Message("register_vocab", {
-                        'start': alias, 'end': vocab_type, 'alias_of': entity
-                    }))
+                    vocab.append({'start': alias, 'end': vocab_type,
+                                  'alias_of': entity})
+    return vocab
 
 
-def load_regex_from_file(path, emitter, skill_id):
-    """Load regex from file
-    The regex is sent to the intent handler using the message bus
+def read_regex_file(path, skill_id):
+    """Read the regular expressions in a file
 
     Args:
-        path:       path to vocabulary file (*.voc)
-        emitter:    emitter to access the message bus
+        path:       path to regex file (*.rx)
+        skill_id:   skill id
+
+    Returns:
+        list: register_vocab message data of every regex
     """
+    vocab = []
     if path.endswith('.rx'):
         with open(path, 'r') as reg_file:
             for line in reg_file.readlines():
                 if line.startswith("#"):
                     continue
-                re.compile(munge_regex(line.strip(), skill_id))
-                emitter.emit(
-                    Message("register_vocab",
-                            {'regex': munge_regex(line.strip(), skill_id)}))
+                regex = munge_regex(line.strip(), skill_id)
+                re.compile(regex)
+                vocab.append({'regex': regex})
+    return vocab
+
+
+def register_vocab_batch(vocab, emitter, skill_id=None):
+    """Send vocabulary to the intent service in a single message
+
+    Args:
+        vocab (list):   register_vocab message data of the entries
+        emitter:        emitter to access the message bus
+        skill_id:       skill the vocabulary belongs to
+    """
+    if vocab:
+        data = {'vocab': vocab}
+        if skill_id is not None:
+            data['skill_id'] = str(skill_id)
+        emitter.emit(Message("register_vocab_batch", data))
+
+
+def load_vocab_from_file(path, vocab_type, emitter):
+    """Load Mycroft vocabulary from file
+    The vocab is sent to the intent handler using the message bus
+
+    Args:
+        path:           path to vocabulary file (*.voc)
+        vocab_type:     keyword name
+        emitter:        emitter to access the message bus
+    """
+    register_vocab_batch(read_vocab_file(path, vocab_type), emitter)
+
+
+def load_regex_from_file(path, emitter, skill_id):
+    """Load regex from file
+    The regex is sent to the intent handler using the message bus
+
+    Args:
+        path:       path to regex file (*.rx)
+        emitter:    emitter to access the message bus
+        skill_id:   skill id
+    """
+    register_vocab_batch(read_regex_file(path, skill_id), emitter, skill_id)
 
 
 def load_vocabulary(basedir, emitter, skill_id):
     """Load vocabulary from all files in the specified directory.
 
+    All of it is sent to the intent service in one message.
+
     Args:
         basedir (str): path of directory to load from
         emitter (messagebus emitter): websocket used to send the vocab to
                                       the intent service
         skill_id: skill the data belongs to
     """
+    vocab = []
     for vocab_file in listdir(basedir):
         if vocab_file.endswith(".voc"):
             vocab_type = to_alnum(skill_id) + splitext(vocab_file)[0]
-            load_vocab_from_file(
-                join(basedir, vocab_file), vocab_type, emitter)
+            vocab += read_vocab_file(join(basedir, vocab_file), vocab_type)
+    register_vocab_batch(vocab, emitter, skill_id)
 
 
 def load_regex(basedir, emitter, skill_id):
     """Load regex from all files in the specified directory.
 
+    All of them are sent to the intent service in one message.
+
     Args:
         basedir (str): path of directory to load from
         emitter (messagebus emitter): websocket used to send the vocab to
                                       the intent service
         skill_id (str): skill identifier
     """
+    vocab = []
     for regex_type in listdir(basedir):
         if regex_type.endswith(".rx"):
-            load_regex_from_file(join(basedir, regex_type), emitter, skill_id)
+            vocab += read_regex_file(join(basedir, regex_type), skill_id)
+    register_vocab_batch(vocab, emitter, skill_id)
 
 
 def to_alnum(skill_id):
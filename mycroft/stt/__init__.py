@@ -14,24 +14,32 @@
 #
 import re
 import json
+import time
 import requests
 from abc import ABCMeta, abstractmethod
 from requests import post, exceptions
 from speech_recognition import Recognizer
+from threading import Event, Lock, Thread
+from queue import Queue, Empty
+from websocket import create_connection, WebSocketConnectionClosedException
 
 from mycroft.api import STTApi
 from mycroft.configuration import Configuration
+from mycroft.metrics import Stopwatch, report_timing
+from mycroft.stt.stream import STTStream, BatchSTTStream
 from mycroft.util.log import LOG
 
 
 class STT(object):
     __metaclass__ = ABCMeta
 
-    def __init__(self):
+    def __init__(self, config=None):
         config_core = Configuration.get()
         self.lang = str(self.init_language(config_core))
-        config_stt = config_core.get("stt", {})
-        self.config = config_stt.get(config_stt.get("module"), {})
+        if config is None:
+            config_stt = config_core.get("stt", {})
+            config = config_stt.get(config_stt.get("module"), {})
+        self.config = config
         self.credential = self.config.get("credential", {})
         self.recognizer = Recognizer()
 
@@ -47,28 +55,43 @@ class STT(object):
     def execute(self, audio, language=None):
         pass
 
+    def stream(self, language=None, on_partial=None):
+        """ Create a stream transcribing audio while it is recorded.
+
+            Engines without streaming support transcribe the complete
+            recording when the stream is finished.
+
+            Args:
+                language (str): language of the utterance
+                on_partial: function(text) called with partial results
+
+            Returns:
+                STTStream: stream for one utterance
+        """
+        return BatchSTTStream(self, language, on_partial)
+
 
 class TokenSTT(STT):
     __metaclass__ = ABCMeta
 
-    def __init__(self):
-        super(TokenSTT, self).__init__()
+    def __init__(self, config=None):
+        super(TokenSTT, self).__init__(config)
         self.token = str(self.credential.get("token"))
 
 
 class GoogleJsonSTT(STT):
     __metaclass__ = ABCMeta
 
-    def __init__(self):
-        super(GoogleJsonSTT, self).__init__()
+    def __init__(self, config=None):
+        super(GoogleJsonSTT, self).__init__(config)
         self.json_credentials = json.dumps(self.credential.get("json"))
 
 
 class BasicSTT(STT):
     __metaclass__ = ABCMeta
 
-    def __init__(self):
-        super(BasicSTT, self).__init__()
+    def __init__(self, config=None):
+        super(BasicSTT, self).__init__(config)
         self.username = str(self.credential.get("username"))
         self.password = str(self.credential.get("password"))
 
@@ -76,15 +99,15 @@ class BasicSTT(STT):
 class KeySTT(STT):
     __metaclass__ = ABCMeta
 
-    def __init__(self):
-        super(KeySTT, self).__init__()
+    def __init__(self, config=None):
+        super(KeySTT, self).__init__(config)
         self.id = str(self.credential.get("client_id"))
         self.key = str(self.credential.get("client_key"))
 
 
 class GoogleSTT(TokenSTT):
-    def __init__(self):
-        super(GoogleSTT, self).__init__()
+    def __init__(self, config=None):
+        super(GoogleSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         self.lang = language or self.lang
@@ -92,8 +115,8 @@ class GoogleSTT(TokenSTT):
 
 
 class GoogleCloudSTT(GoogleJsonSTT):
-    def __init__(self):
-        super(GoogleCloudSTT, self).__init__()
+    def __init__(self, config=None):
+        super(GoogleCloudSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         self.lang = language or self.lang
@@ -103,8 +126,8 @@ class GoogleCloudSTT(GoogleJsonSTT):
 
 
 class WITSTT(TokenSTT):
-    def __init__(self):
-        super(WITSTT, self).__init__()
+    def __init__(self, config=None):
+        super(WITSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         LOG.warning("WITSTT language should be configured at wit.ai settings.")
@@ -112,8 +135,8 @@ class WITSTT(TokenSTT):
 
 
 class IBMSTT(BasicSTT):
-    def __init__(self):
-        super(IBMSTT, self).__init__()
+    def __init__(self, config=None):
+        super(IBMSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         self.lang = language or self.lang
@@ -122,8 +145,8 @@ class IBMSTT(BasicSTT):
 
 
 class MycroftSTT(STT):
-    def __init__(self):
-        super(MycroftSTT, self).__init__()
+    def __init__(self, config=None):
+        super(MycroftSTT, self).__init__(config)
         self.api = STTApi("stt")
 
     def execute(self, audio, language=None):
@@ -137,8 +160,8 @@ class MycroftSTT(STT):
 
 class MycroftDeepSpeechSTT(STT):
     """Mycroft Hosted DeepSpeech"""
-    def __init__(self):
-        super(MycroftDeepSpeechSTT, self).__init__()
+    def __init__(self, config=None):
+        super(MycroftDeepSpeechSTT, self).__init__(config)
         self.api = STTApi("deepspeech")
 
     def execute(self, audio, language=None):
@@ -154,8 +177,8 @@ class DeepSpeechServerSTT(STT):
         https://github.com/MainRo/deepspeech-server
         use this if you want to host DeepSpeech yourself
     """
-    def __init__(self):
-        super(DeepSpeechServerSTT, self).__init__()
+    def __init__(self, config=None):
+        super(DeepSpeechServerSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         language = language or self.lang
@@ -164,10 +187,27 @@ class DeepSpeechServerSTT(STT):
         response = post(self.config.get("uri"), data=audio.get_wav_data())
         return response.text
 
+    def stream(self, language=None, on_partial=None):
+        return DeepSpeechServerStream(self, language, on_partial)
+
+
+class DeepSpeechServerStream(STTStream):
+    """
+        Upload the audio to the deepspeech-server while it is recorded,
+        using chunked transfer encoding. The server decodes the audio
+        when the upload is complete.
+    """
+    def transcribe(self, chunks):
+        if not self.language.startswith("en"):
+            raise ValueError("Deepspeech is currently english only")
+        response = post(self.stt.config.get("uri"),
+                        data=self.wav_chunks(chunks))
+        return response.text
+
 
 class KaldiSTT(STT):
-    def __init__(self):
-        super(KaldiSTT, self).__init__()
+    def __init__(self, config=None):
+        super(KaldiSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         language = language or self.lang
@@ -177,14 +217,104 @@ class KaldiSTT(STT):
     def get_response(self, response):
         try:
             hypotheses = response.json()["hypotheses"]
-            return re.sub(r'\s*\[noise\]\s*', '', hypotheses[0]["utterance"])
+            return self.clean(hypotheses[0]["utterance"])
         except:
             return None
 
+    @staticmethod
+    def clean(utterance):
+        return re.sub(r'\s*\[noise\]\s*', '', utterance)
+
+    def stream(self, language=None, on_partial=None):
+        return KaldiStream(self, language, on_partial)
+
+
+class KaldiStream(STTStream):
+    """
+        Stream audio to a kaldi-gstreamer-server while it is recorded.
+
+        With "stream_uri" configured, e.g.
+        ws://localhost:8080/client/ws/speech, the websocket API is used and
+        the server reports partial results while decoding. Otherwise the
+        audio is uploaded to "uri" with chunked transfer encoding.
+    """
+    # Seconds to wait for the final result after the end of the audio
+    RESULT_TIMEOUT = 10.0
+
+    def __init__(self, stt, language=None, on_partial=None):
+        super(KaldiStream, self).__init__(stt, language, on_partial)
+        self.segments = []
+        self.receive_error = None
+        self.ws = None
+
+    def cancel(self):
+        super(KaldiStream, self).cancel()
+        # Stops the upload and the wait for results
+        ws = self.ws
+        if ws:
+            ws.close()
+
+    def transcribe(self, chunks):
+        uri = self.stt.config.get("stream_uri")
+        if not uri:
+            response = post(self.stt.config.get("uri"),
+                            data=self.wav_chunks(chunks))
+            return self.stt.get_response(response)
+
+        content_type = ('audio/x-raw, layout=(string)interleaved, '
+                        'rate=(int){}, format=(string)S{}LE, '
+                        'channels=(int)1').format(self.sample_rate,
+                                                  8 * self.sample_width)
+        ws = self.ws = create_connection(uri + '?content-type=' +
+                                         content_type.replace(' ', '+'))
+        receiver = Thread(target=self._receive, args=(ws,))
+        receiver.daemon = True
+        receiver.start()
+        try:
+            for chunk in chunks:
+                ws.send_binary(chunk)
+            if self.cancelled:
+                return None
+            ws.send('EOS')
+            receiver.join(self.RESULT_TIMEOUT)
+        finally:
+            ws.close()
+        if self.cancelled:
+            return None
+        if self.receive_error:
+            raise self.receive_error
+        return ' '.join(self.segments)
+
+    def _receive(self, ws):
+        """ Collect results until the server closes the connection. """
+        try:
+            while True:
+                data = ws.recv()
+                if not data:
+                    return
+                response = json.loads(data)
+                if response.get('status', 0) != 0:
+                    raise exceptions.RequestException(
+                        response.get('message', 'Kaldi error {}'.format(
+                            response['status'])))
+                result = response.get('result')
+                if not result:
+                    continue
+                text = self.stt.clean(result['hypotheses'][0]['transcript'])
+                if result.get('final'):
+                    if text:
+                        self.segments.append(text)
+                else:
+                    self.partial(' '.join(self.segments + [text]).strip())
+        except WebSocketConnectionClosedException:
+            pass
+        except Exception as e:
+            self.receive_error = e
+
 
 class BingSTT(TokenSTT):
-    def __init__(self):
-        super(BingSTT, self).__init__()
+    def __init__(self, config=None):
+        super(BingSTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         self.lang = language or self.lang
@@ -193,14 +323,250 @@ class BingSTT(TokenSTT):
 
 
 class HoundifySTT(KeySTT):
-    def __init__(self):
-        super(HoundifySTT, self).__init__()
+    def __init__(self, config=None):
+        super(HoundifySTT, self).__init__(config)
 
     def execute(self, audio, language=None):
         self.lang = language or self.lang
         return self.recognizer.recognize_houndify(audio, self.id, self.key)
 
 
+class CompositeSTT(STT):
+    """
+        Send the same audio to several engines and use the first non empty
+        transcription, cutting the tail latency of a single slow backend.
+
+        Policies:
+            first: all engines transcribe at once
+            hedge: the next engine starts when no result has arrived
+                   hedge_delay milliseconds after the previous one
+            fallback: the next engine starts when the previous one failed
+                      or returned nothing
+
+        With hedge and fallback an engine also starts as soon as all
+        running engines failed. Engines still running when a result is
+        chosen are abandoned, engines not started yet are never asked.
+        The latency and outcome of every engine is reported with
+        report_timing(), together with how often it won.
+    """
+    POLICIES = ('first', 'hedge', 'fallback')
+
+    def __init__(self, config=None):
+        super(CompositeSTT, self).__init__(config)
+        config_stt = Configuration.get().get("stt", {})
+        self.policy = self.config.get("policy", "first")
+        if self.policy not in self.POLICIES:
+            raise ValueError("Unknown STT policy " + self.policy)
+        self.hedge_delay = self.config.get("hedge_delay", 500) / 1000.0
+        self.timeout = self.config.get("timeout", 10.0)
+        self.engines = []  # (name, engine) in order of priority
+        for entry in self.config.get("engines", []):
+            if not isinstance(entry, dict):
+                entry = {"module": entry}
+            module = entry["module"]
+            engine_config = dict(config_stt.get(module, {}), **entry)
+            clazz = STTFactory.CLASSES.get(module)
+            if clazz is None or clazz is CompositeSTT:
+                raise ValueError("Unknown STT module " + str(module))
+            self.engines.append((entry.get("name", module),
+                                 clazz(engine_config)))
+        if not self.engines:
+            raise ValueError("No engines configured for the composite STT")
+        self.stats = {name: {"requests": 0, "wins": 0}
+                      for name, _ in self.engines}
+        self.stats_lock = Lock()
+
+    def execute(self, audio, language=None):
+        language = language or self.lang
+
+        def task(engine):
+            return lambda: engine.execute(audio, language)
+        return self.race([task(engine) for _, engine in self.engines])
+
+    def stream(self, language=None, on_partial=None):
+        return CompositeSTTStream(self, language, on_partial)
+
+    def start_delay(self, index):
+        """ Seconds after the start of a race an engine is started. """
+        if self.policy == "first" or index == 0:
+            return 0.0
+        elif self.policy == "hedge":
+            return index * self.hedge_delay
+        return float('inf')
+
+    def race(self, tasks):
+        """ Run transcriptions according to the policy.
+
+            Args:
+                tasks (list): function() returning a transcription for
+                              every engine
+
+            Returns:
+                str: first non empty transcription
+
+            Raises:
+                the error of the first engine if all engines failed,
+                requests.exceptions.Timeout if no result arrived in time
+        """
+        return self.race_winner(tasks)[1]
+
+    def race_winner(self, tasks):
+        """ Run transcriptions according to the policy, like race().
+
+            Returns:
+                tuple: (index of the winning engine, None if no engine
+                       had a non empty result, transcription)
+        """
+        results = Queue()
+        decided = Event()
+        state = {"winner": None}
+        ident = str(time.time())
+        started = 0
+        running = 0
+        errors = []
+        empty = None
+        start_time = time.time()
+        deadline = start_time + self.timeout
+
+        def run(index):
+            stopwatch = Stopwatch()
+            result = error = None
+            stopwatch.start()
+            try:
+                result = tasks[index]()
+            except Exception as e:
+                error = e
+            stopwatch.stop()
+            results.put((index, result, error))
+            decided.wait(self.timeout)
+            self._report(ident, index, stopwatch, result, error,
+                         state["winner"] == index)
+
+        while state["winner"] is None:
+            now = time.time()
+            while (started < len(tasks) and
+                   start_time + self.start_delay(started) <= now):
+                self._start(run, started)
+                started += 1
+                running += 1
+            if running == 0:
+                if started == len(tasks):
+                    break  # Every engine failed
+                self._start(run, started)
+                started += 1
+                running += 1
+            if now >= deadline:
+                break
+            wait = deadline - now
+            if started < len(tasks):
+                wait = min(wait, start_time + self.start_delay(started) -
+                           now)
+            try:
+                index, result, error = results.get(timeout=max(wait, 0))
+            except Empty:
+                continue
+            running -= 1
+            if error is not None:
+                LOG.warning("STT engine {} failed: {}".format(
+                    self.engines[index][0], repr(error)))
+                errors.append(error)
+            elif result:
+                state["result"] = result
+                state["winner"] = index
+            elif empty is None:
+                empty = result
+        decided.set()
+
+        if state["winner"] is not None:
+            return state["winner"], state["result"]
+        if running:
+            # Even if other engines failed
+            raise exceptions.Timeout(
+                "No STT result within {} seconds".format(self.timeout))
+        if errors and empty is None:
+            raise errors[0]
+        return None, empty
+
+    def _start(self, run, index):
+        with self.stats_lock:
+            self.stats[self.engines[index][0]]["requests"] += 1
+        t = Thread(target=run, args=(index,))
+        t.daemon = True
+        t.start()
+
+    def _report(self, ident, index, stopwatch, result, error, won):
+        name = self.engines[index][0]
+        with self.stats_lock:
+            stats = self.stats[name]
+            if won:
+                stats["wins"] += 1
+            win_rate = float(stats["wins"]) / stats["requests"]
+        if error is not None:
+            status = "error"
+        else:
+            status = "ok" if result else "empty"
+        report_timing(ident, 'stt_engine', stopwatch,
+                      {'engine': name, 'policy': self.policy, 'won': won,
+                       'status': status, 'win_rate': win_rate})
+
+
+class CompositeSTTStream(STTStream):
+    """
+        Stream the audio to the engines of a CompositeSTT.
+
+        Engines starting with the race are streamed to while recording,
+        engines hedged or falling back later get the recorded audio when
+        they start.
+    """
+    def __init__(self, stt, language=None, on_partial=None):
+        super(CompositeSTTStream, self).__init__(stt, language, on_partial)
+        self.streams = [None] * len(stt.engines)
+        self.audio = []
+
+    def start_stream(self, index):
+        engine = self.stt.engines[index][1]
+        # Only the primary engine reports partial results
+        stream = engine.stream(self.language,
+                               self.on_partial if index == 0 else None)
+        stream.start(self.sample_rate, self.sample_width)
+        for chunk in self.audio:
+            stream.feed(chunk)
+        self.streams[index] = stream
+        return stream
+
+    def transcribe(self, chunks):
+        for index in range(len(self.streams)):
+            if self.stt.start_delay(index) == 0:
+                self.start_stream(index)
+        for chunk in chunks:
+            self.audio.append(chunk)
+            for stream in self.streams:
+                if stream:
+                    stream.feed(chunk)
+        if self.cancelled:
+            for stream in self.streams:
+                if stream:
+                    stream.cancel()
+            return None
+
+        def task(index):
+            def finish():
+                stream = self.streams[index] or self.start_stream(index)
+                return stream.finish()
+            return finish
+        winner = None
+        try:
+            winner, result = self.stt.race_winner(
+                [task(i) for i in range(len(self.streams))])
+        finally:
+            # Stop the uploads and decoding of the losing engines, of all
+            # engines on timeout or error
+            for index, stream in enumerate(self.streams):
+                if stream and index != winner:
+                    stream.cancel()
+        return result
+
+
 class STTFactory(object):
     CLASSES = {
         "mycroft": MycroftSTT,
@@ -212,7 +578,8 @@ class STTFactory(object):
         "bing": BingSTT,
         "houndify": HoundifySTT,
         "deepspeech_server": DeepSpeechServerSTT,
-        "mycroft_deepspeech": MycroftDeepSpeechSTT
+        "mycroft_deepspeech": MycroftDeepSpeechSTT,
+        "composite": CompositeSTT
     }
 
     @staticmethod
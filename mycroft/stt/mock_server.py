@@ -0,0 +1,221 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Local STT server answering with a fixed transcription, for testing.
+
+Usage:
+    python -m mycroft.stt.mock_server [--port 8080] [--text 'hello world']
+        [--latency SECONDS] [--word-duration SECONDS]
+
+It speaks the protocols of the self hosted engines:
+
+    POST /stt                         deepspeech-server, plain text answer
+    POST /client/dynamic/recognize    kaldi-gstreamer-server HTTP API
+    WS   /client/ws/speech            kaldi-gstreamer-server websocket API
+
+Uploads may use chunked transfer encoding. On the websocket a partial
+result with one more word of the text is sent for every --word-duration
+seconds of audio received. --latency delays the final answer after the
+end of the audio, like the decoding time of a real server.
+"""
+import argparse
+import json
+import re
+import time
+from threading import Event, Thread
+
+from tornado import gen, ioloop, web, websocket
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+from mycroft.util import wait_for_exit_signal
+from mycroft.util.log import LOG
+
+
+class _Request(object):
+    """ Statistics of one request, for tests to check how audio arrived. """
+
+    def __init__(self, path, chunked=False):
+        self.path = path
+        self.chunked = chunked
+        self.bytes = 0
+        self.chunks = 0
+        self.first_data = None  # Time the first audio arrived
+        self.end = None  # Time the audio was complete
+
+    def data(self, chunk):
+        if self.first_data is None:
+            self.first_data = time.time()
+        self.bytes += len(chunk)
+        self.chunks += 1
+
+
+@web.stream_request_body
+class RecognizeHandler(web.RequestHandler):
+    def initialize(self, server, kaldi=False):
+        self.server = server
+        self.kaldi = kaldi
+
+    def prepare(self):
+        encoding = self.request.headers.get('Transfer-Encoding', '')
+        self.record = _Request(self.request.path, 'chunked' in encoding)
+        self.server.requests.append(self.record)
+
+    def data_received(self, chunk):
+        self.record.data(chunk)
+
+    @gen.coroutine
+    def post(self):
+        self.record.end = time.time()
+        if self.server.latency:
+            yield gen.sleep(self.server.latency)
+        if self.kaldi:
+            self.write({'status': 0, 'id': str(len(self.server.requests)),
+                        'hypotheses': [{'utterance': self.server.text}]})
+        else:
+            self.write(self.server.text)
+
+    put = post
+
+
+class KaldiSocketHandler(websocket.WebSocketHandler):
+    def initialize(self, server):
+        self.server = server
+
+    def open(self):
+        self.record = _Request(self.request.path)
+        self.server.requests.append(self.record)
+        content_type = self.get_argument('content-type', '')
+        rate = re.search(r'rate=\(int\)(\d+)', content_type)
+        bits = re.search(r'format=\(string\)S(\d+)', content_type)
+        self.bytes_per_sec = ((int(rate.group(1)) if rate else 16000) *
+                              (int(bits.group(1)) if bits else 16) // 8)
+        self.words_sent = 0
+
+    def on_message(self, message):
+        if not isinstance(message, bytes):
+            if message == 'EOS':
+                self.record.end = time.time()
+                ioloop.IOLoop.current().call_later(self.server.latency,
+                                                   self.send_final)
+            return
+        self.record.data(message)
+        words = self.server.text.split()
+        seconds = float(self.record.bytes) / self.bytes_per_sec
+        num_words = min(int(seconds / self.server.word_duration), len(words))
+        if num_words > self.words_sent:
+            self.words_sent = num_words
+            self.send_result(' '.join(words[:num_words]), False)
+
+    def send_result(self, text, final):
+        self.write_message(json.dumps({
+            'status': 0, 'segment': 0,
+            'result': {'hypotheses': [{'transcript': text}], 'final': final}
+        }))
+
+    def send_final(self):
+        self.send_result(self.server.text, True)
+        self.close()
+
+
+class MockSTTServer(object):
+    """ STT server running in a thread of this process.
+
+        Args:
+            text (str): transcription of every request
+            latency (float): seconds between the end of audio and the answer
+            word_duration (float): seconds of audio per word of partial
+                                   results
+            port (int): port to listen on, 0 for any free port
+            host (str): address to listen on
+    """
+
+    def __init__(self, text='hello world', latency=0.0, word_duration=0.3,
+                 port=0, host='127.0.0.1'):
+        self.text = text
+        self.latency = latency
+        self.word_duration = word_duration
+        self.host = host
+        self.port = port
+        self.requests = []
+        self.loop = None
+        self.thread = None
+        self.ready = Event()
+
+    def url(self, path, scheme='http'):
+        return '{}://{}:{}{}'.format(scheme, self.host, self.port, path)
+
+    def start(self):
+        sockets = bind_sockets(self.port, self.host)
+        self.port = sockets[0].getsockname()[1]
+        self.thread = Thread(target=self._run, args=(sockets,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def _run(self, sockets):
+        try:
+            import asyncio
+            asyncio.set_event_loop(asyncio.new_event_loop())
+        except ImportError:  # Python 2, tornado < 5
+            ioloop.IOLoop().make_current()
+        self.loop = ioloop.IOLoop.current()
+        application = web.Application([
+            (r'/stt', RecognizeHandler, {'server': self}),
+            (r'/client/dynamic/recognize', RecognizeHandler,
+             {'server': self, 'kaldi': True}),
+            (r'/client/ws/speech', KaldiSocketHandler, {'server': self})
+        ])
+        server = HTTPServer(application)
+        server.add_sockets(sockets)
+        self.loop.add_callback(self.ready.set)
+        self.loop.start()
+        server.stop()
+        self.loop.close(all_fds=True)
+
+    def stop(self):
+        if self.loop:
+            self.loop.add_callback(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-t', '--text', default='hello world',
+                        help='transcription of every request')
+    parser.add_argument('-l', '--latency', type=float, default=0.0,
+                        help='seconds to wait before answering')
+    parser.add_argument('-w', '--word-duration', type=float, default=0.3,
+                        help='seconds of audio per word of partial results')
+    args = parser.parse_args()
+
+    server = MockSTTServer(args.text, args.latency, args.word_duration,
+                           args.port, args.host).start()
+    LOG.info('Mock STT server listening on ' + server.url(''))
+    wait_for_exit_signal()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
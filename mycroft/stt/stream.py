@@ -0,0 +1,187 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Transcribe an utterance while it is being recorded.
+
+The listener asks the STT engine for a stream when recording begins,
+calls start(), feed() with every recorded chunk and finish() to get the
+transcription once the user has stopped speaking. A worker thread passes
+the audio to the engine, so feed() never blocks the recording and an
+engine able to decode incrementally has little left to do at finish().
+"""
+import struct
+from abc import ABCMeta, abstractmethod
+from threading import Thread
+
+from speech_recognition import AudioData
+from queue import Queue
+
+# Size used in the WAV header when the length of the audio isn't known
+UNKNOWN_SIZE = 0xffffffff
+
+
+def wav_header(sample_rate, sample_width, channels=1,
+               data_size=UNKNOWN_SIZE):
+    """ Create the header of a PCM WAV file.
+
+        Args:
+            sample_rate (int): samples per second
+            sample_width (int): bytes per sample
+            channels (int): number of channels
+            data_size (int): bytes of audio, unknown for a stream
+
+        Returns:
+            bytes: RIFF header followed by the start of the data chunk
+    """
+    block_align = sample_width * channels
+    riff_size = (UNKNOWN_SIZE if data_size == UNKNOWN_SIZE
+                 else data_size + 36)
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', riff_size, b'WAVE',
+                       b'fmt ', 16, 1, channels, sample_rate,
+                       sample_rate * block_align, block_align,
+                       8 * sample_width, b'data', data_size)
+
+
+class StreamCancelled(Exception):
+    """ The stream was cancelled while its audio was being uploaded. """
+    pass
+
+
+class STTStream(object):
+    """ Transcription of one utterance, fed while it is recorded.
+
+        Args:
+            stt (STT): engine transcribing the audio
+            language (str): language of the utterance, defaults to the
+                            language of the engine
+            on_partial: function(text) called with partial transcriptions
+    """
+    __metaclass__ = ABCMeta
+
+    def __init__(self, stt, language=None, on_partial=None):
+        self.stt = stt
+        self.language = language or stt.lang
+        self.on_partial = on_partial
+        self.sample_rate = None
+        self.sample_width = None
+        self.queue = Queue()
+        self.thread = None
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+    def start(self, sample_rate, sample_width):
+        """ Begin transcribing, called when recording starts.
+
+            Args:
+                sample_rate (int): samples per second of the audio
+                sample_width (int): bytes per sample
+        """
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def feed(self, chunk):
+        """ Add recorded audio.
+
+            Args:
+                chunk (bytes): audio following the previous chunk
+        """
+        self.queue.put(bytes(chunk))
+
+    def finish(self):
+        """ End the audio and wait for the transcription.
+
+            Returns:
+                str: the transcription
+
+            Raises:
+                the error raised by the engine while transcribing
+        """
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join()
+        if self.error:
+            raise self.error
+        return self.result
+
+    def cancel(self):
+        """ End the audio without waiting for a transcription.
+
+            The engine is not asked to transcribe what was fed so far,
+            an upload in progress is aborted.
+        """
+        self.cancelled = True
+        self.queue.put(None)
+
+    def chunks(self):
+        """ Yield the fed audio until finish() or cancel() is called. """
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def wav_chunks(self, chunks):
+        """ Yield the audio as a WAV file of unknown length.
+
+            Raises StreamCancelled at the end of a cancelled stream, so an
+            upload of the file is aborted instead of completed.
+        """
+        yield wav_header(self.sample_rate, self.sample_width)
+        for chunk in chunks:
+            yield chunk
+        if self.cancelled:
+            raise StreamCancelled()
+
+    def partial(self, text):
+        """ Report a partial transcription. """
+        if self.on_partial and text:
+            self.on_partial(text)
+
+    def _run(self):
+        try:
+            self.result = self.transcribe(self.chunks())
+        except Exception as e:
+            if not self.cancelled:
+                self.error = e
+
+    @abstractmethod
+    def transcribe(self, chunks):
+        """ Transcribe the audio, run by the worker thread.
+
+            Args:
+                chunks: iterator over the audio, ending with the recording
+
+            Returns:
+                str: the transcription, None if the stream was cancelled
+        """
+        pass
+
+
+class BatchSTTStream(STTStream):
+    """ Stream for engines transcribing a complete recording.
+
+        The audio is collected while recording and passed to
+        STT.execute() when the recording ends.
+    """
+
+    def transcribe(self, chunks):
+        audio = b''.join(chunks)
+        if self.cancelled:
+            return None
+        audio = AudioData(audio, self.sample_rate, self.sample_width)
+        return self.stt.execute(audio, self.language)
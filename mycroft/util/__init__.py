@@ -325,21 +325,25 @@ def wait_for_exit_signal():
 
 def create_echo_function(name, whitelist=None):
     from mycroft.configuration import Configuration
+    from mycroft.messagebus.wire import peek_type
     blacklist = Configuration.get().get("ignore_logs")
 
     def echo(message):
         """Listen for messages and echo them for logging"""
         try:
-            js_msg = json.loads(message)
+            msg_type = peek_type(message)
+            if msg_type is None:
+                msg_type = json.loads(message).get("type")
 
-            if whitelist and js_msg.get("type") not in whitelist:
+            if whitelist and msg_type not in whitelist:
                 return
 
-            if blacklist and js_msg.get("type") in blacklist:
+            if blacklist and msg_type in blacklist:
                 return
 
-            if js_msg.get("type") == "registration":
+            if msg_type == "registration":
                 # do not log tokens from registration messages
+                js_msg = json.loads(message)
                 js_msg["data"]["token"] = None
                 message = json.dumps(js_msg)
         except Exception:
@@ -0,0 +1,133 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Share the microphone level between processes.
+
+The listener publishes the current energy and threshold in a small
+memory mapped file in the IPC directory, readers like the CLI meter map
+the same file. Updates are plain memory writes, nothing is written to
+disk for every chunk of audio.
+
+A sequence number guards the values (a seqlock): the writer makes it odd
+while updating and even when done, readers retry when it is odd or has
+changed while reading.
+"""
+import mmap
+import os
+import struct
+from os.path import join
+
+from mycroft.util.signal import get_ipc_directory
+
+SEQUENCE = struct.Struct('<Q')
+VALUES = struct.Struct('<dd')  # energy, threshold
+SIZE = SEQUENCE.size + VALUES.size
+
+# Attempts to read a consistent value before giving up
+READ_ATTEMPTS = 100
+
+
+def get_mic_level_path():
+    return join(get_ipc_directory(), 'mic_level.mmap')
+
+
+class MicLevelWriter(object):
+    """ Publish the microphone level.
+
+        Args:
+            path (str): shared file, defaults to get_mic_level_path()
+    """
+
+    def __init__(self, path=None):
+        path = path or get_mic_level_path()
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.fstat(fd).st_size < SIZE:
+                os.ftruncate(fd, SIZE)
+            self.map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        # Continue the sequence so readers notice a restarted writer
+        self.sequence = SEQUENCE.unpack_from(self.map, 0)[0] & ~1
+
+    def set(self, energy, threshold):
+        """ Update the level.
+
+            Args:
+                energy (float): energy of the latest audio chunk
+                threshold (float): current energy threshold for speech
+        """
+        SEQUENCE.pack_into(self.map, 0, self.sequence + 1)
+        VALUES.pack_into(self.map, SEQUENCE.size, energy, threshold)
+        self.sequence += 2
+        SEQUENCE.pack_into(self.map, 0, self.sequence)
+
+    def close(self):
+        self.map.close()
+
+
+class MicLevelReader(object):
+    """ Read the microphone level published by the listener.
+
+        The shared file is opened on the first read after the listener
+        has created it.
+
+        Args:
+            path (str): shared file, defaults to get_mic_level_path()
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_mic_level_path()
+        self.map = None
+        self.sequence = None
+
+    def _open(self):
+        try:
+            with open(self.path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), SIZE,
+                                     access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            self.map = None
+        return self.map is not None
+
+    def read(self, only_changed=False):
+        """ Get the current level.
+
+            Args:
+                only_changed (bool): return None if the level wasn't
+                                     updated since the last read
+
+            Returns:
+                tuple: (energy, threshold) or None if not available
+        """
+        if self.map is None and not self._open():
+            return None
+        for _ in range(READ_ATTEMPTS):
+            sequence = SEQUENCE.unpack_from(self.map, 0)[0]
+            if sequence & 1:
+                continue  # Being written
+            values = VALUES.unpack_from(self.map, SEQUENCE.size)
+            if SEQUENCE.unpack_from(self.map, 0)[0] == sequence:
+                break
+        else:
+            return None
+        if sequence == 0 or (only_changed and sequence == self.sequence):
+            return None
+        self.sequence = sequence
+        return values
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
@@ -12,8 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import errno
+import fcntl
+import mmap
+import select
+import socket
+import struct
 import tempfile
 import time
+import zlib
+from contextlib import contextmanager
+from itertools import count
+from threading import Lock, RLock
 
 import os
 import os.path
@@ -84,6 +94,262 @@ def create_file(filename):
         f.write('')
 
 
+class SignalRegistry(object):
+    """ Signals in shared memory, mirrored to the signal files.
+
+        Every process maps the same table of signal names and creation
+        times, so checking for a signal is a memory read instead of
+        filesystem calls. Creating and consuming a signal still creates
+        and removes its file so external scripts keep working, and files
+        created or removed by others are picked up within SYNC_INTERVAL.
+
+        Processes waiting for a signal bind a datagram socket in the
+        signal_waiters directory and are woken up on every change.
+
+        Args:
+            ipc_dir (str): the IPC directory
+    """
+    MAGIC = b'MYCSIG01'
+    SLOTS = 64
+    NAME_SIZE = 56
+    SLOT = struct.Struct('<56sd')  # name, creation time or 0 if not set
+    CREATED = struct.Struct('<d')
+    SIZE = len(MAGIC) + SLOTS * SLOT.size
+    # Seconds between checks for signal files changed by others
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, ipc_dir):
+        self.signal_dir = os.path.join(ipc_dir, 'signal')
+        self.waiter_dir = os.path.join(ipc_dir, 'signal_waiters')
+        self.path = os.path.join(ipc_dir, 'signal.mmap')
+        self.thread_lock = RLock()
+        self.lock_depth = 0
+        self.fd = None
+        self._open()
+        self.dir_mtime = -1  # Not synced yet
+        self.next_sync = 0
+        self.waiter_ids = count()
+        self.notify_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.notify_socket.setblocking(False)
+
+    def _open(self):
+        with self.thread_lock:
+            if self.fd is not None:
+                self.map.close()
+                os.close(self.fd)
+            ensure_directory_exists(os.path.dirname(self.path))
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            with self._lock():
+                if os.fstat(self.fd).st_size < self.SIZE:
+                    os.ftruncate(self.fd, self.SIZE)
+                self.map = mmap.mmap(self.fd, self.SIZE)
+                if self.map[:len(self.MAGIC)] != self.MAGIC:
+                    self.map[:] = b'\0' * self.SIZE
+                    self.map[:len(self.MAGIC)] = self.MAGIC
+            self.slots = {}  # name -> slot index
+
+    @contextmanager
+    def _lock(self):
+        """ Exclusive access for threads of this and other processes. """
+        with self.thread_lock:
+            self.lock_depth += 1
+            if self.lock_depth == 1:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def supports(self, signal_name):
+        return len(signal_name.encode('utf-8')) <= self.NAME_SIZE
+
+    def _offset(self, index):
+        return len(self.MAGIC) + index * self.SLOT.size
+
+    def _find(self, signal_name):
+        """ Get the slot of a signal, assigning a free one if needed.
+
+            Returns:
+                int: slot index or None if the table is full
+        """
+        index = self.slots.get(signal_name)
+        if index is not None:
+            return index
+        name = signal_name.encode('utf-8')
+        first = zlib.crc32(name) % self.SLOTS
+        with self._lock():
+            for i in range(self.SLOTS):
+                index = (first + i) % self.SLOTS
+                offset = self._offset(index)
+                slot_name = self.map[offset:offset + self.NAME_SIZE]
+                slot_name = slot_name.rstrip(b'\0')
+                if not slot_name:
+                    self.map[offset:offset + self.NAME_SIZE] = \
+                        name.ljust(self.NAME_SIZE, b'\0')
+                if not slot_name or slot_name == name:
+                    self.slots[signal_name] = index
+                    return index
+        return None
+
+    def _get_created(self, index):
+        offset = self._offset(index) + self.NAME_SIZE
+        return self.CREATED.unpack_from(self.map, offset)[0]
+
+    def _set_created(self, index, created):
+        offset = self._offset(index) + self.NAME_SIZE
+        self.CREATED.pack_into(self.map, offset, created)
+
+    def _path(self, signal_name):
+        return os.path.join(self.signal_dir, signal_name)
+
+    def create(self, signal_name):
+        index = self._find(signal_name)
+        if index is None:
+            return None
+        with self._lock():
+            try:
+                create_file(self._path(signal_name))
+            except IOError:
+                return False
+            self._set_created(index, time.time())
+        self._notify()
+        return True
+
+    def check(self, signal_name, sec_lifetime=0):
+        self._sync()
+        index = self._find(signal_name)
+        if index is None:
+            return None
+        if not self._get_created(index):
+            return False
+
+        with self._lock():
+            created = self._get_created(index)
+            if not created:
+                return False
+            if sec_lifetime == -1:
+                return True
+            expired = int(created + sec_lifetime) < int(time.time())
+            if sec_lifetime != 0 and not expired:
+                return True
+            # Consume a single use signal or remove an expired one
+            self._set_created(index, 0)
+            try:
+                os.remove(self._path(signal_name))
+            except OSError:
+                pass
+        self._notify()
+        return sec_lifetime == 0
+
+    def _sync(self):
+        """ Pick up signal files created or removed by others. """
+        now = time.time()
+        if now < self.next_sync:
+            return
+        self.next_sync = now + self.SYNC_INTERVAL
+        if os.fstat(self.fd).st_nlink == 0:
+            LOG.info('Signal table was removed, creating a new one')
+            self._open()
+        try:
+            mtime = os.stat(self.signal_dir).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self.dir_mtime:
+            return
+        self.dir_mtime = mtime
+
+        changed = False
+        with self._lock():
+            try:
+                files = set(os.listdir(self.signal_dir))
+            except OSError:
+                files = set()
+            for index in range(self.SLOTS):
+                offset = self._offset(index)
+                name = self.map[offset:offset + self.NAME_SIZE]
+                name = name.rstrip(b'\0').decode('utf-8', 'ignore')
+                if name and name not in files and self._get_created(index):
+                    self._set_created(index, 0)
+                    changed = True
+            for name in files:
+                index = self._find(name) if self.supports(name) else None
+                if index is not None and not self._get_created(index):
+                    try:
+                        created = os.path.getctime(self._path(name))
+                    except OSError:
+                        continue
+                    self._set_created(index, created)
+                    changed = True
+        if changed:
+            self._notify()
+
+    def _notify(self):
+        """ Wake up all processes waiting for a signal. """
+        try:
+            waiters = os.listdir(self.waiter_dir)
+        except OSError:
+            return
+        for waiter in waiters:
+            path = os.path.join(self.waiter_dir, waiter)
+            try:
+                self.notify_socket.sendto(b'\0', path)
+            except socket.error as e:
+                if e.errno in (errno.ECONNREFUSED, errno.ENOENT):
+                    try:
+                        os.remove(path)  # Left behind by a dead process
+                    except OSError:
+                        pass
+
+    def wait(self, signal_name, exists=True, timeout=None):
+        ensure_directory_exists(self.waiter_dir)
+        path = os.path.join(self.waiter_dir, '{}-{}'.format(
+            os.getpid(), next(self.waiter_ids)))
+        waiter = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        waiter.bind(path)
+        os.chmod(path, 0o666)
+        waiter.setblocking(False)
+        deadline = None if timeout is None else time.time() + timeout
+        try:
+            while self.check(signal_name, -1) != exists:
+                wait_time = self.SYNC_INTERVAL
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    wait_time = min(wait_time, remaining)
+                if select.select([waiter], [], [], wait_time)[0]:
+                    try:
+                        while waiter.recv(16):
+                            pass
+                    except socket.error:
+                        pass
+            return True
+        finally:
+            waiter.close()
+            os.remove(path)
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def _get_registry():
+    """ Get the shared memory registry, None if it can't be used. """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                try:
+                    _registry = SignalRegistry(get_ipc_directory())
+                except (IOError, OSError, ValueError) as e:
+                    LOG.warning('Using file signals, shared memory signals '
+                                'are not available: {}'.format(e))
+                    _registry = False
+    return _registry or None
+
+
 def create_signal(signal_name):
     """Create a named signal
 
@@ -91,12 +357,12 @@ def create_signal(signal_name):
         signal_name (str): The signal's name.  Must only contain characters
             valid in filenames.
     """
-    try:
-        path = os.path.join(get_ipc_directory(), "signal", signal_name)
-        create_file(path)
-        return os.path.isfile(path)
-    except IOError:
-        return False
+    registry = _get_registry()
+    if registry and registry.supports(signal_name):
+        created = registry.create(signal_name)
+        if created is not None:
+            return created
+    return _create_signal_file(signal_name)
 
 
 def check_for_signal(signal_name, sec_lifetime=0):
@@ -112,6 +378,50 @@ def check_for_signal(signal_name, sec_lifetime=0):
     Returns:
         bool: True if the signal is defined, False otherwise
     """
+    registry = _get_registry()
+    if registry and registry.supports(signal_name):
+        found = registry.check(signal_name, sec_lifetime)
+        if found is not None:
+            return found
+    return _check_signal_file(signal_name, sec_lifetime)
+
+
+def wait_for_signal(signal_name, exists=True, timeout=None):
+    """Block until a named signal is created, or removed
+
+    The signal isn't consumed.
+
+    Args:
+        signal_name (str): The signal's name.
+        exists (bool): wait for the signal to exist if True, to not exist
+            if False
+        timeout (float, optional): Maximum seconds to wait
+
+    Returns:
+        bool: True if the signal reached the state, False on timeout
+    """
+    registry = _get_registry()
+    if registry and registry.supports(signal_name):
+        return registry.wait(signal_name, exists, timeout)
+
+    deadline = None if timeout is None else time.time() + timeout
+    while _check_signal_file(signal_name, -1) != exists:
+        if deadline is not None and time.time() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def _create_signal_file(signal_name):
+    try:
+        path = os.path.join(get_ipc_directory(), "signal", signal_name)
+        create_file(path)
+        return os.path.isfile(path)
+    except IOError:
+        return False
+
+
+def _check_signal_file(signal_name, sec_lifetime=0):
     path = os.path.join(get_ipc_directory(), "signal", signal_name)
     if os.path.isfile(path):
         if sec_lifetime == 0:
@@ -0,0 +1,526 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Measure the listener on a corpus of recorded audio.
+
+The recordings are played as one continuous stream, with --gap seconds of
+quiet noise before every file, to the AudioProducer of a RecognizerLoop in
+place of the microphone. ResponsiveRecognizer listens for the wake word and
+records the phrase after it just like on a device. The stream is paced to
+--speed times real time, 0 plays it as fast as the listener reads.
+
+Files with the wake word (--positive, by default the query_after recordings
+of the audio accuracy test) are expected to be followed by a query, files
+without it (--negative) should not trigger the listener. Reported for every
+wake word setup:
+
+    recall                  positive files with a detection
+    false accepts           detections in negative files, per hour of audio
+    detection latency       from the end of the wake word to record_begin,
+                            needs "wake_word_end" in the --labels file
+    end of utterance        from the end of speech to record_end, the end of
+                            speech is the end of the file unless labelled
+                            with "speech_end"
+    processing lag          how far the listener was behind the audio when
+                            it detected the wake word (paced runs only)
+    CPU and allocations     per audio second for every HotWordEngine, the
+                            allocations are measured with tracemalloc (-a)
+
+The labels file maps file names to seconds from the start of the file:
+    {"hey_mycroft_1.wav": {"wake_word_end": 1.2, "speech_end": 3.4}}
+
+Usage:
+    python test/benchmarks/client/listener.py [-p DIR_OR_WAV ...]
+        [-n DIR_OR_WAV ...] [-l labels.json] [-w 'hey mycroft' ...]
+        [-s SPEED] [-a] [-o results.json] [--compare previous.json]
+"""
+import argparse
+import bisect
+import copy
+import json
+import logging
+import platform
+import random
+import struct
+import subprocess
+import time
+import wave
+from glob import glob
+from os.path import basename, dirname, isdir, join
+from queue import Queue
+from threading import Lock
+
+from pyee import EventEmitter
+from speech_recognition import AudioSource
+
+from mycroft.client.speech.listener import AudioProducer, RecognizerLoop
+from mycroft.configuration import Configuration
+from mycroft.util.log import LOG
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+try:
+    from time import process_time
+except ImportError:  # Python 2
+    from time import clock as process_time
+
+try:
+    from time import thread_time
+except ImportError:  # Python < 3.7, includes the time of other threads
+    thread_time = process_time
+
+ACCURACY_DATA = join(dirname(dirname(dirname(dirname(__file__)))), 'mycroft',
+                     'audio-accuracy-test', 'data')
+CHUNK = 1024
+
+
+def find_files(paths):
+    """ The wav files given directly or in the given directories. """
+    files = []
+    for path in paths:
+        if isdir(path):
+            files += sorted(glob(join(path, '*.wav')))
+        else:
+            files.append(path)
+    return files
+
+
+def read_wav(file_name, sample_rate):
+    wav = wave.open(file_name, 'rb')
+    try:
+        if (wav.getframerate() != sample_rate or wav.getnchannels() != 1 or
+                wav.getsampwidth() != 2):
+            raise ValueError('{} is not {} Hz mono 16 bit audio'.format(
+                file_name, sample_rate))
+        return wav.readframes(wav.getnframes())
+    finally:
+        wav.close()
+
+
+def background_noise(num_samples, rand, level=50):
+    """ Quiet noise, a microphone never records digital silence. """
+    return struct.pack('<{}h'.format(num_samples),
+                       *[int(rand.gauss(0, level)) for _ in
+                         range(num_samples)])
+
+
+class Segment(object):
+    """ A file of the corpus, positions are bytes in the played stream. """
+
+    def __init__(self, name, positive, start, audio_start, audio_end,
+                 labels):
+        self.name = name
+        self.positive = positive
+        self.start = start  # Start of the gap before the file
+        self.audio_start = audio_start
+        self.audio_end = audio_end
+        self.labels = labels
+        self.detections = []
+        self.record_ends = []
+
+
+def build_corpus(positive, negative, labels, sample_rate, gap):
+    """ Join the files into one stream of audio.
+
+        Returns:
+            tuple: the audio and a Segment for every file
+    """
+    rand = random.Random(0)
+    audio = bytearray()
+    segments = []
+    files = [(f, True) for f in positive] + [(f, False) for f in negative]
+    for i, (file_name, is_positive) in enumerate(files):
+        start = len(audio)
+        # The listener reads a second to adjust to the ambient noise
+        # before the first file
+        lead = gap + (1.0 if i == 0 else 0.0)
+        audio += background_noise(int(lead * sample_rate), rand)
+        data = read_wav(file_name, sample_rate)
+        name = basename(file_name)
+        segments.append(Segment(name, is_positive, start, len(audio),
+                                len(audio) + len(data),
+                                labels.get(name, {})))
+        audio += data
+    # Room for the last phrase to end
+    audio += background_noise(int(gap * sample_rate), rand)
+    return bytes(audio), segments
+
+
+class PacedStream(object):
+    """ Plays audio like a microphone, speed 0 for no waiting. """
+
+    def __init__(self, audio, sample_rate, sample_width, speed, on_end):
+        self.audio = audio
+        self.bytes_per_sec = float(sample_rate * sample_width)
+        self.sample_width = sample_width
+        self.speed = speed
+        self.on_end = on_end
+        self.position = 0
+        self.start_time = None
+
+    def lag(self):
+        """ Seconds the reader is behind the audio it has read. """
+        if not self.speed or self.start_time is None:
+            return None
+        played = self.position / self.bytes_per_sec / self.speed
+        return max(0.0, time.time() - self.start_time - played)
+
+    def read(self, size, of_exc=False):
+        if self.start_time is None:
+            self.start_time = time.time()
+        num_bytes = size * self.sample_width
+        end = self.position + num_bytes
+        if self.speed:
+            ready = self.start_time + end / self.bytes_per_sec / self.speed
+            delay = ready - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        chunk = self.audio[self.position:end]
+        self.position = end
+        if len(chunk) < num_bytes:
+            if self.on_end:
+                self.on_end()
+                self.on_end = None
+            chunk += b'\0' * (num_bytes - len(chunk))
+        return chunk
+
+
+class FileMicrophone(AudioSource):
+    """ Audio source playing a PacedStream, replacing MutableMicrophone. """
+
+    def __init__(self, stream, sample_rate, sample_width):
+        self.stream = stream
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = sample_width
+        self.CHUNK = CHUNK
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class EngineMeter(object):
+    """ Measures the CPU time and allocations of a HotWordEngine. """
+
+    def __init__(self, engine, allocations=False):
+        self.engine = engine
+        self.allocations = allocations and hasattr(tracemalloc, 'reset_peak')
+        self.cpu_time = 0.0
+        self.allocated = 0
+        self.calls = 0
+        self.lock = Lock()
+        self._update = engine.update
+        self._found_wake_word = engine.found_wake_word
+        engine.update = self.update
+        engine.found_wake_word = self.found_wake_word
+
+    def measure(self, method, *args):
+        if self.allocations:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = thread_time()
+        try:
+            return method(*args)
+        finally:
+            cpu_time = thread_time() - start
+            with self.lock:
+                self.calls += 1
+                self.cpu_time += cpu_time
+                if self.allocations:
+                    # Lower bound, memory freed during the call is reused
+                    peak = tracemalloc.get_traced_memory()[1]
+                    self.allocated += max(0, peak - before)
+
+    def update(self, chunk):
+        return self.measure(self._update, chunk)
+
+    def found_wake_word(self, frame_data):
+        return self.measure(self._found_wake_word, frame_data)
+
+    def result(self, audio_sec):
+        return {
+            'calls': self.calls,
+            'cpu_sec_per_audio_sec': self.cpu_time / audio_sec,
+            'allocated_bytes_per_audio_sec': (
+                self.allocated / audio_sec if self.allocations else None)
+        }
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+
+def summary(values):
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'max': max(values)
+    }
+
+
+def configure(listener_config, wake_word):
+    """ Set up the listener config for a run, nothing is saved or played. """
+    config = Configuration.get()
+    config['listener'] = copy.deepcopy(listener_config)
+    config['listener'].update({
+        'record_wake_words': False,
+        'record_utterances': False
+    })
+    config['listener'].setdefault('wake_word_upload', {})['enable'] = False
+    config['opt_in'] = False
+    config['confirm_listening'] = False
+    if wake_word:
+        # The phonemes and threshold of the listener config belong to the
+        # configured wake word, others are looked up in "hotwords"
+        config['listener'].update({
+            'wake_word': wake_word,
+            'phonemes': None,
+            'threshold': None,
+            'extra_wake_words': []
+        })
+    return config
+
+
+def run(wake_word, listener_config, positive, negative, labels, args):
+    """ Play the corpus to a RecognizerLoop set up for the wake word. """
+    config = configure(listener_config, wake_word)
+    loop = RecognizerLoop()
+    sample_rate = loop.microphone.SAMPLE_RATE
+    sample_width = 2
+    audio, segments = build_corpus(positive, negative, labels, sample_rate,
+                                   args.gap)
+    bytes_per_sec = float(sample_rate * sample_width)
+    audio_sec = len(audio) / bytes_per_sec
+
+    recognizer = loop.wakeword_recognizer
+    meters = [EngineMeter(e, args.allocations)
+              for e in getattr(recognizer, 'engines', [recognizer])]
+
+    state = loop.state
+    state.running = True
+    producer = AudioProducer(state, Queue(), None, loop.responsive_recognizer,
+                             EventEmitter())
+    stream = PacedStream(audio, sample_rate, sample_width, args.speed,
+                         producer.stop)
+    producer.mic = FileMicrophone(stream, sample_rate, sample_width)
+
+    starts = [s.start for s in segments]
+    lags = []
+    detected = []
+
+    def segment_at(position):
+        return segments[max(0, bisect.bisect_right(starts, position) - 1)]
+
+    def on_record_begin():
+        detected.append(segment_at(stream.position))
+        detected[-1].detections.append(stream.position)
+        lag = stream.lag()
+        if lag is not None:
+            lags.append(lag)
+
+    def on_record_end():
+        detected[-1].record_ends.append(stream.position)
+
+    producer.emitter.on('recognizer_loop:record_begin', on_record_begin)
+    producer.emitter.on('recognizer_loop:record_end', on_record_end)
+
+    if args.allocations and tracemalloc:
+        tracemalloc.start()
+    start_cpu = process_time()
+    start = time.time()
+    producer.start()
+    producer.join()
+    elapsed = time.time() - start
+    cpu_time = process_time() - start_cpu
+    if args.allocations and tracemalloc:
+        tracemalloc.stop()
+    if hasattr(recognizer, 'stop'):
+        recognizer.stop()
+
+    def seconds(position, segment, label=None):
+        """ Seconds from the labelled time, or the end of the file. """
+        if label is None:
+            reference = segment.audio_end
+        else:
+            reference = segment.audio_start + segment.labels[label] * \
+                bytes_per_sec
+        return (position - reference) / bytes_per_sec
+
+    found = [s for s in segments if s.positive and s.detections]
+    num_positive = len([s for s in segments if s.positive])
+    negatives = [s for s in segments if not s.positive]
+    negative_sec = sum((s.audio_end - s.audio_start) / bytes_per_sec
+                       for s in negatives)
+    false_accepts = sum(len(s.detections) for s in negatives)
+
+    detection_latency = [seconds(s.detections[0], s, 'wake_word_end')
+                         for s in found if 'wake_word_end' in s.labels]
+    end_latency = [seconds(s.record_ends[0], s,
+                           'speech_end' if 'speech_end' in s.labels else None)
+                   for s in found if s.record_ends]
+
+    return {
+        'wake_word': config['listener']['wake_word'],
+        'audio_sec': audio_sec,
+        'elapsed_sec': elapsed,
+        'recall': (float(len(found)) / num_positive
+                   if num_positive else None),
+        'false_accepts': false_accepts,
+        'false_accepts_per_hour': (false_accepts * 3600.0 / negative_sec
+                                   if negative_sec else None),
+        'false_accept_files': (
+            float(len([s for s in negatives if s.detections])) /
+            len(negatives) if negatives else None),
+        'detection_latency_sec': summary(detection_latency),
+        'end_of_utterance_latency_sec': summary(end_latency),
+        'processing_lag_sec': summary(lags),
+        'cpu_sec_per_audio_sec': cpu_time / audio_sec,
+        'hotwords': {m.engine.key_phrase: m.result(audio_sec)
+                     for m in meters},
+        'files': [{
+            'name': s.name,
+            'positive': s.positive,
+            'detections': [(p - s.audio_start) / bytes_per_sec
+                           for p in s.detections],
+            'record_ends': [(p - s.audio_start) / bytes_per_sec
+                            for p in s.record_ends]
+        } for s in segments]
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD']).decode().strip()
+    except Exception:
+        return None
+
+
+def format_stat(stats, key='p50', unit='s'):
+    if not stats:
+        return '-'
+    return '{:.3f} {}'.format(stats[key], unit)
+
+
+def format_ratio(value):
+    return '-' if value is None else '{:.1f}%'.format(100.0 * value)
+
+
+def compare(results, file_name):
+    """ Print the change against the results of a previous run. """
+    with open(file_name) as f:
+        previous = json.load(f)
+    old = {r['wake_word']: r for r in previous['runs']}
+    print('\nCompared to {} ({}):'.format(file_name, previous.get('revision')))
+    for result in results['runs']:
+        before = old.get(result['wake_word'])
+        if not before:
+            continue
+        print('{:20} recall {:+6.1f} pts  false accepts/h {:+7.1f}  '
+              'cpu {:+7.1f}%'.format(
+                  result['wake_word'],
+                  100.0 * ((result['recall'] or 0) - (before['recall'] or 0)),
+                  ((result['false_accepts_per_hour'] or 0) -
+                   (before['false_accepts_per_hour'] or 0)),
+                  100.0 * (result['cpu_sec_per_audio_sec'] /
+                           max(before['cpu_sec_per_audio_sec'], 1e-9) - 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-p', '--positive', nargs='*',
+                        default=[join(ACCURACY_DATA, 'with_wake_word',
+                                      'query_after')],
+                        help='wav files or directories with the wake word')
+    parser.add_argument('-n', '--negative', nargs='*',
+                        default=[join(ACCURACY_DATA, 'without_wake_word')],
+                        help='wav files or directories without it')
+    parser.add_argument('-l', '--labels', help='json file with the times '
+                                               'of the wake word and speech')
+    parser.add_argument('-w', '--wake-word', action='append',
+                        help='wake word to test, repeat to compare engines, '
+                             'the configured listener by default')
+    parser.add_argument('-s', '--speed', type=float, default=0,
+                        help='times real time, 0 for as fast as possible')
+    parser.add_argument('--gap', type=float, default=5.0,
+                        help='seconds of noise before every file, room '
+                             'for the previous phrase to end')
+    parser.add_argument('-a', '--allocations', action='store_true',
+                        help='measure allocations, slows the engines down')
+    parser.add_argument('-o', '--output', help='write results as json')
+    parser.add_argument('--compare', help='results of a previous run')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+    LOG.level = logging.getLevelName(args.log_level)
+
+    positive = find_files(args.positive)
+    negative = find_files(args.negative)
+    if not positive and not negative:
+        parser.error('no wav files found')
+    labels = {}
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+
+    listener_config = copy.deepcopy(Configuration.get()['listener'])
+    results = {
+        'revision': git_revision(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'speed': args.speed,
+        'positive_files': len(positive),
+        'negative_files': len(negative),
+        'runs': []
+    }
+    for wake_word in args.wake_word or [None]:
+        result = run(wake_word, listener_config, positive, negative, labels,
+                     args)
+        results['runs'].append(result)
+        print('{:20} recall {:>6}  false accepts {:3d} ({}/h)  '
+              'detection {}  end of utterance {}  cpu {:.3f} s/s'.format(
+                  result['wake_word'], format_ratio(result['recall']),
+                  result['false_accepts'],
+                  '-' if result['false_accepts_per_hour'] is None else
+                  '{:.1f}'.format(result['false_accepts_per_hour']),
+                  format_stat(result['detection_latency_sec']),
+                  format_stat(result['end_of_utterance_latency_sec']),
+                  result['cpu_sec_per_audio_sec']))
+        for phrase, engine in sorted(result['hotwords'].items()):
+            allocated = engine['allocated_bytes_per_audio_sec']
+            print('    {:16} cpu {:.3f} s/s  allocated {}'.format(
+                phrase, engine['cpu_sec_per_audio_sec'],
+                '-' if allocated is None else
+                '{:.0f} kB/s'.format(allocated / 1024.0)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
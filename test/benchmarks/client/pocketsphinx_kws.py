@@ -0,0 +1,168 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare the CPU time of pocketsphinx wake word spotting per audio second.
+
+The recorded audio is played to the engine the way the listener does while
+waiting for the wake word, in chunks of 1024 samples with a check every
+SEC_BETWEEN_WW_CHECKS:
+
+    window       every check decodes the last TEST_WW_SEC of audio again
+                 (found_wake_word() without update(), the old behaviour)
+    incremental  every chunk is decoded once by update(), checks only read
+                 the result
+
+The files are played one after the other with a second of quiet noise
+between them, as one continuous stream.
+
+Usage:
+    python test/benchmarks/client/pocketsphinx_kws.py [-w 'hey mycroft']
+        [-r N] [-o out.json] [recording.wav ...]
+
+Without files the recordings of the unit tests are used.
+"""
+import argparse
+import glob
+import json
+import random
+import struct
+import wave
+from os.path import dirname, join
+
+from mycroft.client.speech.hotword_factory import HotWordFactory
+from mycroft.client.speech.mic import ResponsiveRecognizer
+from mycroft.configuration import Configuration
+
+try:
+    from time import process_time
+except ImportError:  # Python 2
+    from time import clock as process_time
+
+CHUNK = 1024
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+TEST_DATA = join(dirname(dirname(dirname(__file__))), 'unittests', 'client',
+                 'data')
+
+
+def background_noise(seconds, level=50):
+    """ Quiet noise, a microphone never records digital silence. """
+    rand = random.Random(0)
+    num_samples = int(seconds * SAMPLE_RATE)
+    return struct.pack('<{}h'.format(num_samples),
+                       *[int(rand.gauss(0, level)) for _ in
+                         range(num_samples)])
+
+
+def load_audio(file_names):
+    """ Read 16 kHz mono 16 bit wav files into one stream of audio. """
+    audio = bytearray()
+    silence = background_noise(1.0)
+    for file_name in file_names:
+        wav = wave.open(file_name, 'rb')
+        if (wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or
+                wav.getsampwidth() != SAMPLE_WIDTH):
+            raise ValueError(file_name + ' is not 16 kHz mono 16 bit audio')
+        audio += wav.readframes(wav.getnframes())
+        audio += silence
+        wav.close()
+    return bytes(audio)
+
+
+def run(engine, audio, incremental, test_sec):
+    """ Play the audio to the engine like the listener does.
+
+        Returns:
+            tuple: CPU seconds used and the times of detections
+    """
+    chunk_bytes = CHUNK * SAMPLE_WIDTH
+    sec_per_chunk = float(CHUNK) / SAMPLE_RATE
+    chunks_per_check = ResponsiveRecognizer.SEC_BETWEEN_WW_CHECKS / \
+        sec_per_chunk
+    test_bytes = int(test_sec * SAMPLE_RATE) * SAMPLE_WIDTH
+    silence = b'\0' * int(ResponsiveRecognizer.SILENCE_SEC * SAMPLE_RATE *
+                          SAMPLE_WIDTH)
+
+    detections = []
+    chunks_since_check = 0.0
+    start = process_time()
+    for pos in range(0, len(audio) - chunk_bytes + 1, chunk_bytes):
+        end = pos + chunk_bytes
+        if incremental:
+            engine.update(audio[pos:end])
+        chunks_since_check += 1.0
+        if chunks_since_check > chunks_per_check:
+            chunks_since_check -= chunks_per_check
+            window = audio[max(0, end - test_bytes):end] + silence
+            if engine.found_wake_word(window):
+                seconds = float(end) / (SAMPLE_RATE * SAMPLE_WIDTH)
+                # Overlapping windows find the same wake word again
+                if not detections or seconds - detections[-1] > test_sec:
+                    detections.append(seconds)
+    return process_time() - start, detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*', help='wav files to play')
+    parser.add_argument('-w', '--wake-word',
+                        help='hotword to spot, the configured wake word '
+                             'by default')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', help='write results as json')
+    args = parser.parse_args()
+
+    config = Configuration.get()
+    listener_config = config.get('listener', {})
+    wake_word = args.wake_word or listener_config.get('wake_word')
+    files = args.files or sorted(glob.glob(join(TEST_DATA, '*.wav')))
+    audio = load_audio(files)
+    audio_sec = float(len(audio)) / (SAMPLE_RATE * SAMPLE_WIDTH)
+
+    results = {'wake_word': wake_word, 'files': files,
+               'audio_sec': audio_sec, 'modes': {}}
+    for mode in ('window', 'incremental'):
+        cpu_times = []
+        for _ in range(args.repeat):
+            # A new engine each run, update() switches it to incremental
+            engine = HotWordFactory.create_hotword(
+                wake_word, config.get('hotwords'), config.get('lang'))
+            test_sec = (engine.num_phonemes *
+                        listener_config.get('phoneme_duration', 120) / 1000.0)
+            cpu_time, detections = run(engine, audio, mode == 'incremental',
+                                       test_sec)
+            cpu_times.append(cpu_time)
+        cpu_time = min(cpu_times)
+        results['modes'][mode] = {
+            'cpu_sec': cpu_time,
+            'cpu_sec_per_audio_sec': cpu_time / audio_sec,
+            'detections': detections
+        }
+        print('{:12} {:7.4f} CPU s per audio s  detections at {}'.format(
+            mode, cpu_time / audio_sec,
+            ', '.join('{:.1f}s'.format(d) for d in detections) or '-'))
+
+    window = results['modes']['window']['cpu_sec']
+    incremental = results['modes']['incremental']['cpu_sec']
+    if incremental:
+        print('incremental decoding uses {:.1f}x less CPU'.format(
+            window / incremental))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
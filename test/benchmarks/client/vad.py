@@ -0,0 +1,221 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare how soon the voice activity detections end recorded phrases.
+
+Every file is recorded by ResponsiveRecognizer._record_phrase from the end
+of the wake word, as after a detection, followed by background noise. The
+listener first adjusts to a second of the noise, like listen() does. Noise
+of every --noise-level RMS is mixed into the audio to simulate louder rooms.
+
+Reported per noise level and VAD: the end of utterance latency from the end
+of speech to the end of the recording, phrases cut off before the end of
+speech, and the seconds saved per utterance against the first --vad.
+
+The wake word end and speech end default to the start and end of the file,
+a labels file can give them in seconds from the start of the file:
+    {"hey_mycroft_1.wav": {"wake_word_end": 1.2, "speech_end": 3.4}}
+
+Usage:
+    python test/benchmarks/client/vad.py [-v energy -v spectral]
+        [--noise-levels 50,300,1000] [-l labels.json] [-o results.json]
+        [recording.wav or directory ...]
+
+Without files the query_after recordings of the audio accuracy test are used.
+"""
+import argparse
+import audioop
+import json
+import random
+import struct
+import time
+import wave
+from glob import glob
+from os.path import basename, dirname, isdir, join
+
+from speech_recognition import AudioSource
+
+from mycroft.client.speech.mic import ResponsiveRecognizer
+from mycroft.client.speech.vad import VADFactory
+from mycroft.configuration import Configuration
+
+ACCURACY_DATA = join(dirname(dirname(dirname(dirname(__file__)))), 'mycroft',
+                     'audio-accuracy-test', 'data')
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class NoHotWord(object):
+    """ ResponsiveRecognizer needs a wake word engine, it is not used. """
+    key_phrase = ''
+    num_phonemes = 1
+
+
+class AudioStream(object):
+    def __init__(self, audio):
+        self.audio = audio
+        self.position = 0
+
+    def read(self, size, of_exc=False):
+        end = self.position + size * SAMPLE_WIDTH
+        chunk = self.audio[self.position:end]
+        self.position = end
+        return chunk.ljust(size * SAMPLE_WIDTH, b'\0')
+
+
+class AudioFileSource(AudioSource):
+    def __init__(self, audio):
+        self.stream = AudioStream(audio)
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = SAMPLE_WIDTH
+        self.CHUNK = 1024
+
+
+def find_files(paths):
+    files = []
+    for path in paths:
+        if isdir(path):
+            files += sorted(glob(join(path, '*.wav')))
+        else:
+            files.append(path)
+    return files
+
+
+def read_wav(file_name):
+    wav = wave.open(file_name, 'rb')
+    try:
+        if (wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or
+                wav.getsampwidth() != SAMPLE_WIDTH):
+            raise ValueError(file_name + ' is not 16 kHz mono 16 bit audio')
+        return wav.readframes(wav.getnframes())
+    finally:
+        wav.close()
+
+
+def noise(num_samples, level, rand):
+    return struct.pack('<{}h'.format(num_samples),
+                       *[int(rand.gauss(0, level)) for _ in
+                         range(num_samples)])
+
+
+def record(vad_module, audio, speech_start, speech_end):
+    """ Record the phrase in the audio with the VAD.
+
+        Returns:
+            float: seconds from the end of speech to the end of recording
+    """
+    recognizer = ResponsiveRecognizer(NoHotWord())
+    recognizer.vad = VADFactory.create(
+        dict(Configuration.get()['listener'].get('vad', {}),
+             module=vad_module), SAMPLE_RATE, SAMPLE_WIDTH)
+    source = AudioFileSource(audio)
+    recognizer.adjust_for_ambient_noise(source, 1.0)
+    # Recording starts at the end of the wake word
+    source.stream.position = speech_start
+    recognizer._record_phrase(source, float(source.CHUNK) / SAMPLE_RATE)
+    return float(source.stream.position - speech_end) / \
+        (SAMPLE_RATE * SAMPLE_WIDTH)
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*', help='wav files or directories')
+    parser.add_argument('-v', '--vad', action='append',
+                        help='VAD module to test, repeat to compare, energy '
+                             'and spectral by default')
+    parser.add_argument('--noise-levels', type=int_list,
+                        default=[50, 300, 1000],
+                        help='RMS of the noise mixed into the audio')
+    parser.add_argument('-l', '--labels', help='json file with the times '
+                                               'of the wake word and speech')
+    parser.add_argument('-o', '--output', help='write results as json')
+    args = parser.parse_args()
+
+    vads = args.vad or ['energy', 'spectral']
+    files = find_files(args.files or [join(ACCURACY_DATA, 'with_wake_word',
+                                           'query_after')])
+    if not files:
+        parser.error('no wav files found')
+    labels = {}
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+
+    bytes_per_sec = SAMPLE_RATE * SAMPLE_WIDTH
+    lead = bytes_per_sec  # Listened to by adjust_for_ambient_noise
+    tail = int(ResponsiveRecognizer.RECORDING_TIMEOUT) * bytes_per_sec
+    results = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': len(files),
+        'vads': vads,
+        'runs': []
+    }
+    for level in args.noise_levels:
+        rand = random.Random(0)
+        latencies = {vad: {} for vad in vads}
+        for file_name in files:
+            name = basename(file_name)
+            data = read_wav(file_name)
+            label = labels.get(name, {})
+            speech_start = lead + SAMPLE_WIDTH * int(
+                label.get('wake_word_end', 0) * SAMPLE_RATE)
+            speech_end = lead + SAMPLE_WIDTH * int(
+                label.get('speech_end', len(data) / bytes_per_sec) *
+                SAMPLE_RATE)
+            audio = b'\0' * lead + data + b'\0' * tail
+            audio = audioop.add(audio, noise(len(audio) // SAMPLE_WIDTH,
+                                             level, rand), SAMPLE_WIDTH)
+            for vad in vads:
+                latencies[vad][name] = record(vad, audio, speech_start,
+                                              speech_end)
+
+        baseline = latencies[vads[0]]
+        for vad in vads:
+            values = list(latencies[vad].values())
+            saved = [baseline[n] - latencies[vad][n] for n in baseline]
+            result = {
+                'noise_level': level,
+                'vad': vad,
+                'latency_mean_s': sum(values) / len(values),
+                'latency_p50_s': percentile(values, 50),
+                'latency_p90_s': percentile(values, 90),
+                'cut_off': len([v for v in values if v < 0]),
+                'seconds_saved_per_utterance': sum(saved) / len(saved),
+                'latencies': latencies[vad]
+            }
+            results['runs'].append(result)
+            print('noise {:5d}  {:10} end of utterance mean {:6.3f} s  '
+                  'p90 {:6.3f} s  cut off {:3d}  saved {:+6.3f} s'.format(
+                      level, vad, result['latency_mean_s'],
+                      result['latency_p90_s'], result['cut_off'],
+                      result['seconds_saved_per_utterance']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Measure messagebus throughput and latency.
+
+For every combination of payload size and number of subscribers a fresh
+messagebus service is started on a local port, each subscriber and
+publisher runs a WebsocketClient in its own process. Publishers send
+--count messages each, as fast as possible or at --rate messages per
+second, and subscribers record the end to end latency of every message.
+
+Reported per scenario: delivered messages per second, p50/p99 latency,
+lost messages (dropped by the send queue policy), CPU time of the service
+and the clients and the memory growth of the service.
+
+Usage:
+    python test/benchmarks/messagebus/throughput.py [-s 1,4,16] [-p 1]
+        [--sizes 64,1024,16384] [-n 2000] [-o results.json]
+        [--compare previous.json]
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from multiprocessing import Process, Queue, Event
+from threading import Thread, Lock, Event as ThreadEvent
+
+import psutil
+import tornado
+from tornado import web, ioloop
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+from mycroft.util.log import LOG
+
+HOST = '127.0.0.1'
+ROUTE = '/core'
+BENCH_MESSAGE = 'bench.message'
+
+
+def run_service(port):
+    """ Run the messagebus service with the configured send queue. """
+    config = Configuration.get().get('websocket')
+    routes = [
+        (ROUTE, WebsocketEventHandler,
+         {'send_queue': config.get('send_queue')})
+    ]
+    application = web.Application(routes)
+    application.listen(port, HOST)
+    ioloop.IOLoop.current().start()
+
+
+def connect(port):
+    """ Connect a client receiving only the types it has handlers for. """
+    client = WebsocketClient(host=HOST, port=port, route=ROUTE)
+    client.subscribe()
+    thread = Thread(target=client.run_forever)
+    thread.daemon = True
+    thread.start()
+    client.connected_event.wait()
+    return client
+
+
+def process_stats(process):
+    cpu = process.cpu_times()
+    return {'cpu_s': cpu.user + cpu.system,
+            'rss_bytes': process.memory_info().rss}
+
+
+def subscriber(port, expected, ready, stop, results):
+    """ Record the latency of every benchmark message received. """
+    latencies = []
+    lock = Lock()
+    done = ThreadEvent()
+
+    def handler(message):
+        latency = time.time() - message.data['sent']
+        with lock:
+            latencies.append(latency)
+            if len(latencies) >= expected:
+                done.set()
+
+    client = connect(port)
+    client.on(BENCH_MESSAGE, handler)
+    # Let the subscription reach the service before publishing starts
+    client.wait_for_response(Message('mycroft.bus.stats'))
+    before = process_stats(psutil.Process())
+    ready.put(True)
+
+    while not done.wait(0.05) and not stop.is_set():
+        pass
+    after = process_stats(psutil.Process())
+    with lock:
+        results.put({
+            'latencies': latencies,
+            'last_received': time.time() if done.is_set() else None,
+            'cpu_s': after['cpu_s'] - before['cpu_s'],
+            'wire_format': client.wire_format
+        })
+    client.close()
+
+
+def publisher(port, count, payload_size, rate, ready, start, results):
+    """ Send count benchmark messages, at rate messages per second. """
+    client = connect(port)
+    payload = 'x' * payload_size
+    interval = 1.0 / rate if rate else 0
+    ready.put(True)
+    start.wait()
+
+    before = process_stats(psutil.Process())
+    first_sent = time.time()
+    for i in range(count):
+        if interval:
+            delay = first_sent + i * interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        client.emit(Message(BENCH_MESSAGE,
+                            {'sent': time.time(), 'payload': payload}))
+    after = process_stats(psutil.Process())
+    results.put({
+        'first_sent': first_sent,
+        'last_sent': time.time(),
+        'cpu_s': after['cpu_s'] - before['cpu_s']
+    })
+    client.close()
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+
+def run_scenario(args, subscribers, payload_size):
+    """ Run publishers and subscribers against a fresh service. """
+    service = Process(target=run_service, args=(args.port,))
+    service.daemon = True
+    service.start()
+    time.sleep(0.5)
+    service_process = psutil.Process(service.pid)
+
+    expected = args.publishers * args.count
+    ready, stop, start = Queue(), Event(), Event()
+    sub_results, pub_results = Queue(), Queue()
+    processes = []
+    for _ in range(subscribers):
+        processes.append(Process(target=subscriber,
+                                 args=(args.port, expected, ready, stop,
+                                       sub_results)))
+    for _ in range(args.publishers):
+        processes.append(Process(target=publisher,
+                                 args=(args.port, args.count, payload_size,
+                                       args.rate, ready, start, pub_results)))
+    for p in processes:
+        p.daemon = True
+        p.start()
+    for _ in processes:
+        ready.get(timeout=30)
+
+    service_before = process_stats(service_process)
+    start.set()
+    published = [pub_results.get() for _ in range(args.publishers)]
+
+    # Wait for subscribers to receive everything, lost messages never come
+    deadline = time.time() + args.timeout
+    received = []
+    while len(received) < subscribers:
+        try:
+            received.append(sub_results.get(
+                timeout=max(deadline - time.time(), 0.1)))
+        except Exception:
+            if stop.is_set():
+                break  # A subscriber died
+            stop.set()
+            deadline = time.time() + 10
+    service_after = process_stats(service_process)
+
+    for p in processes:
+        p.join(5)
+        if p.is_alive():
+            p.terminate()
+    service.terminate()
+    service.join()
+
+    latencies = [latency for r in received for latency in r['latencies']]
+    delivered = len(latencies)
+    first_sent = min(p['first_sent'] for p in published)
+    last_received = max([r['last_received'] for r in received
+                         if r['last_received']] or [time.time()])
+    duration = max(last_received - first_sent, 1e-6)
+    return {
+        'subscribers': subscribers,
+        'publishers': args.publishers,
+        'payload_bytes': payload_size,
+        'published': expected,
+        'delivered': delivered,
+        'lost': expected * subscribers - delivered,
+        'msgs_per_s': delivered / duration,
+        'latency_p50_ms': 1000 * (percentile(latencies, 50) or 0),
+        'latency_p99_ms': 1000 * (percentile(latencies, 99) or 0),
+        'latency_max_ms': 1000 * max(latencies or [0]),
+        'service_cpu_s': service_after['cpu_s'] - service_before['cpu_s'],
+        'service_rss_growth_bytes': (service_after['rss_bytes'] -
+                                     service_before['rss_bytes']),
+        'subscriber_cpu_s': [r['cpu_s'] for r in received],
+        'publisher_cpu_s': [p['cpu_s'] for p in published],
+        'wire_format': received[0]['wire_format'] if received else None
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD']).decode().strip()
+    except Exception:
+        return None
+
+
+def scenario_key(result):
+    return (result['subscribers'], result['publishers'],
+            result['payload_bytes'])
+
+
+def compare(results, file_name):
+    """ Print the change against the results of a previous run. """
+    with open(file_name) as f:
+        previous = json.load(f)
+    old = {scenario_key(r): r for r in previous['scenarios']}
+    print('\nCompared to {} ({}):'.format(file_name, previous.get('revision')))
+    for result in results['scenarios']:
+        before = old.get(scenario_key(result))
+        if not before:
+            continue
+        print('subs {:3d} size {:6d}  msgs/s {:+7.1f}%  p99 {:+7.1f}%'.format(
+            result['subscribers'], result['payload_bytes'],
+            100.0 * (result['msgs_per_s'] / before['msgs_per_s'] - 1),
+            100.0 * (result['latency_p99_ms'] /
+                     max(before['latency_p99_ms'], 1e-6) - 1)))
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-s', '--subscribers', type=int_list,
+                        default=[1, 4, 16], help='fan-out levels')
+    parser.add_argument('-p', '--publishers', type=int, default=1)
+    parser.add_argument('--sizes', type=int_list, default=[64, 1024, 16384],
+                        help='payload sizes in bytes')
+    parser.add_argument('-n', '--count', type=int, default=2000,
+                        help='messages sent by each publisher')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='messages per second per publisher, 0 for '
+                             'as fast as possible')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds to wait for the last messages')
+    parser.add_argument('--port', type=int, default=18181)
+    parser.add_argument('-o', '--output', help='write results as json')
+    parser.add_argument('--compare', help='results of a previous run')
+    parser.add_argument('--log-level', default='WARNING',
+                        help='log level of the service and the clients')
+    args = parser.parse_args()
+    LOG.level = logging.getLevelName(args.log_level)
+
+    results = {
+        'revision': git_revision(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'tornado': tornado.version,
+        'count': args.count,
+        'rate': args.rate,
+        'scenarios': []
+    }
+    for payload_size in args.sizes:
+        for subscribers in args.subscribers:
+            result = run_scenario(args, subscribers, payload_size)
+            results['scenarios'].append(result)
+            print('subs {:3d} pubs {:2d} size {:6d}  {:8.0f} msgs/s  '
+                  'p50 {:7.2f} ms  p99 {:7.2f} ms  lost {:6d}  '
+                  'service cpu {:5.2f} s  rss +{:d} kB'.format(
+                      subscribers, args.publishers, payload_size,
+                      result['msgs_per_s'], result['latency_p50_ms'],
+                      result['latency_p99_ms'], result['lost'],
+                      result['service_cpu_s'],
+                      result['service_rss_growth_bytes'] // 1024))
+            sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare encode/decode CPU time and frame size of the bus wire formats.
+
+Traffic is read from log files containing one serialized message per line,
+for example the skills log, where every message received by the skills
+process is echoed. Without files a synthetic sample of viseme, vocabulary
+and settings messages is used.
+
+Usage:
+    python test/benchmarks/messagebus/wire_format.py [-r N] [-o out.json]
+        [/var/log/mycroft/skills.log ...]
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+from mycroft.messagebus import wire
+from mycroft.messagebus.message import Message
+
+
+def load_messages(file_names):
+    """ Read all json messages found in the given log files. """
+    messages = []
+    for file_name in file_names:
+        with open(file_name) as f:
+            for line in f:
+                start = line.find('{')
+                if start < 0:
+                    continue
+                try:
+                    message = Message.deserialize(line[start:])
+                except ValueError:
+                    continue
+                if message.type:
+                    messages.append(message)
+    return messages
+
+
+def sample_messages():
+    """ Synthetic traffic resembling speech output and skill loading. """
+    messages = []
+    for i in range(200):
+        messages.append(Message('enclosure.mouth.viseme',
+                                {'code': str(i % 7),
+                                 'until': 1522331423.5 + i * 0.12}))
+    for i in range(300):
+        messages.append(Message('register_vocab', {
+            'start': 'weather keyword {}'.format(i),
+            'end': 'WeatherSkillWeatherKeyword',
+            'alias_of': None}))
+    for i in range(20):
+        messages.append(Message('speak', {
+            'utterance': 'It is currently 12 degrees and cloudy in Lawrence',
+            'expect_response': False},
+            context={'target': None, 'request_id': str(i)}))
+    messages.append(Message('mycroft.skills.settings.update', {
+        'skillMetadata': {'sections': [{
+            'name': 'Options', 'fields': [{
+                'name': 'field{}'.format(i), 'type': 'text',
+                'label': 'Option number {}'.format(i),
+                'value': 'value {}'.format(i)} for i in range(50)]}]}}))
+    return messages
+
+
+def measure(messages, wire_format, repeat):
+    """ Time encoding and decoding all messages in a wire format. """
+    start = time.time()
+    for _ in range(repeat):
+        frames = [wire.encode(m, wire_format) for m in messages]
+    encode_time = (time.time() - start) / repeat
+
+    start = time.time()
+    for _ in range(repeat):
+        for frame in frames:
+            wire.decode(frame)
+    decode_time = (time.time() - start) / repeat
+
+    sizes = Counter()
+    for message, frame in zip(messages, frames):
+        sizes[message.type] += len(frame)
+    return {
+        'encode_us_per_msg': 1e6 * encode_time / len(messages),
+        'decode_us_per_msg': 1e6 * decode_time / len(messages),
+        'total_bytes': sum(sizes.values()),
+        'bytes_per_type': dict(sizes.most_common(10))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*', help='logs with bus traffic')
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    parser.add_argument('-o', '--output', help='write results as json')
+    args = parser.parse_args()
+
+    messages = load_messages(args.files) if args.files else sample_messages()
+    if not messages:
+        print('No messages found')
+        sys.exit(1)
+
+    results = {'messages': len(messages), 'formats': {}}
+    for wire_format in wire.supported_formats():
+        result = measure(messages, wire_format, args.repeat)
+        results['formats'][wire_format] = result
+        print('{:8} encode {:6.1f} us/msg  decode {:6.1f} us/msg  '
+              '{:9d} bytes'.format(wire_format, result['encode_us_per_msg'],
+                                   result['decode_us_per_msg'],
+                                   result['total_bytes']))
+    if wire.MSGPACK not in results['formats']:
+        print('msgpack is not installed, only json was measured')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Measure the latency of Padatious intents with and without speculation.
+
+A messagebus service is started on a local port and the intent service,
+the Padatious service and the fallback handling run in a separate process
+connected to it, set up like the skills service. Padatious is trained on
+--copies copies of a set of intents, Adapt on a few keyword intents.
+
+Every utterance is sent as recognizer_loop:utterance and timed until it is
+handled: Padatious utterances until the fallback handling completes,
+Adapt utterances until their intent arrives. Utterances are sent --gap
+seconds apart, like spoken ones. Skills made active by their intents
+decline to converse after --converse-delay seconds.
+
+Speculation can at most save the time spent before the fallback handling
+starts: converse, Adapt and the messagebus round trip of intent_failure.
+
+Reported per mode: p50/p90 latency of the Padatious (intent_failure) path
+and the Adapt path and the CPU time of the skills process, speculative
+Padatious matches every utterance.
+
+Usage:
+    python test/benchmarks/skills/padatious_speculation.py [-n 5]
+        [--copies 10] [--gap 0.5] [--converse-delay 0] [-o results.json]
+        [--compare previous.json]
+"""
+import argparse
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+import time
+from multiprocessing import Process, Event
+from os.path import join
+from threading import Thread
+
+import psutil
+from adapt.intent import IntentBuilder
+from tornado import web, ioloop
+
+from mycroft.configuration import Configuration
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import WebsocketEventHandler
+from mycroft.util.log import LOG
+
+HOST = '127.0.0.1'
+ROUTE = '/core'
+
+PADATIOUS_INTENTS = {
+    'weather': ['what is the weather like',
+                'will it rain (today|tomorrow)',
+                'do i need an umbrella',
+                'how hot is it going to be',
+                'is it going to snow'],
+    'timer': ['set a timer for {duration}',
+              'start a {duration} timer',
+              'count down {duration}',
+              'remind me in {duration}'],
+    'music': ['play {artist}',
+              'play some music by {artist}',
+              'put on {artist}',
+              'i want to listen to {artist}'],
+    'joke': ['tell me a joke',
+             'make me laugh',
+             'say something funny',
+             'do you know any jokes'],
+    'volume': ['turn (it|the volume) (up|down)',
+               'make it (louder|quieter)',
+               'set the volume to {level}'],
+    'wiki': ['tell me about {topic}',
+             'who (is|was) {topic}',
+             'what do you know about {topic}',
+             'search wikipedia for {topic}']
+}
+
+PADATIOUS_UTTERANCES = [
+    'will it rain tomorrow',
+    'do i need my umbrella today',
+    'set a timer for ten minutes',
+    'play some music by the beatles',
+    'tell me a joke',
+    'make it louder',
+    'who was albert einstein',
+    'what do you know about volcanoes'
+]
+
+ADAPT_INTENTS = {
+    'TimeIntent': ['time', 'clock'],
+    'DateIntent': ['date', 'day'],
+    'StopIntent': ['stop', 'cancel']
+}
+
+ADAPT_UTTERANCES = [
+    'what time is it',
+    'what is the date',
+    'stop'
+]
+
+
+def run_service(port):
+    routes = [(ROUTE, WebsocketEventHandler,
+               {'send_queue': Configuration.get()['websocket'].get(
+                   'send_queue')})]
+    web.Application(routes).listen(port, HOST)
+    ioloop.IOLoop.current().start()
+
+
+def connect(port):
+    client = WebsocketClient(host=HOST, port=port, route=ROUTE)
+    thread = Thread(target=client.run_forever)
+    thread.daemon = True
+    thread.start()
+    client.connected_event.wait()
+    return client
+
+
+def write_intents(directory, copies):
+    """ Write the .intent files, returns [(intent name, file name)]. """
+    intents = []
+    for i in range(copies):
+        for name, lines in PADATIOUS_INTENTS.items():
+            file_name = join(directory, '{}{}.intent'.format(name, i))
+            with open(file_name, 'w') as f:
+                f.write('\n'.join(lines))
+            intents.append(('bench{}:{}'.format(i, name), file_name))
+    return intents
+
+
+def skills(port, speculative, intents, cache_dir, converse_delay, ready):
+    """ Run the intent services like the skills service does. """
+    from mycroft.skills.core import FallbackSkill
+    from mycroft.skills.intent_service import IntentService
+    from mycroft.skills.padatious_service import PadatiousService
+
+    config = Configuration.get()
+    config['padatious']['speculative'] = speculative
+    config['padatious']['intent_cache'] = cache_dir
+
+    def decline_converse(message):
+        # Like the skill manager for skills not implementing converse
+        time.sleep(converse_delay)
+        ws.emit(message.reply('skill.converse.response', {
+            'skill_id': message.data['skill_id'], 'result': False}))
+
+    ws = connect(port)
+    ws.on('intent_failure', FallbackSkill.make_intent_failure_handler(ws))
+    ws.on('skill.converse.request', decline_converse)
+    service = IntentService(ws)
+    padatious = PadatiousService(ws, service)
+
+    for intent_type, keywords in ADAPT_INTENTS.items():
+        entity_type = intent_type + 'Keyword'
+        for keyword in keywords:
+            service.handle_register_vocab(Message('register_vocab', {
+                'start': keyword, 'end': entity_type}))
+        intent = IntentBuilder('bench:' + intent_type).require(
+            entity_type).build()
+        service.handle_register_intent(Message('register_intent',
+                                               intent.__dict__))
+    for name, file_name in intents:
+        padatious.register_intent(Message('padatious:register_intent', {
+            'file_name': file_name, 'name': name}))
+    padatious.train()
+    ready.set()
+    while True:
+        time.sleep(1)
+
+
+def time_utterance(client, utterance, reply_type):
+    start = time.time()
+    reply = client.wait_for_response(
+        Message('recognizer_loop:utterance', {'utterances': [utterance],
+                                              'lang': 'en-us'},
+                {'ident': str(start)}),
+        reply_type=reply_type, timeout=30)
+    if reply is None:
+        raise RuntimeError('"{}" was not handled'.format(utterance))
+    return time.time() - start
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(round(percent / 100.0 * (len(values) - 1)))]
+
+
+def run(args, speculative, intents, cache_dir):
+    service = Process(target=run_service, args=(args.port,))
+    service.daemon = True
+    service.start()
+    time.sleep(0.5)
+
+    ready = Event()
+    skills_process = Process(target=skills,
+                             args=(args.port, speculative, intents,
+                                   cache_dir, args.converse_delay, ready))
+    skills_process.daemon = True
+    skills_process.start()
+    if not ready.wait(600):
+        raise RuntimeError('Training did not finish')
+    client = connect(args.port)
+
+    # Warm up both paths before measuring
+    time_utterance(client, PADATIOUS_UTTERANCES[0],
+                   'mycroft.skill.handler.complete')
+    time_utterance(client, ADAPT_UTTERANCES[0], 'bench:TimeIntent')
+
+    process = psutil.Process(skills_process.pid)
+    cpu_before = sum(process.cpu_times()[:2])
+    padatious_latencies = []
+    adapt_latencies = []
+    for _ in range(args.repeat):
+        for utterance in PADATIOUS_UTTERANCES:
+            time.sleep(args.gap)
+            padatious_latencies.append(time_utterance(
+                client, utterance, 'mycroft.skill.handler.complete'))
+        for utterance, intent_type in zip(ADAPT_UTTERANCES, ADAPT_INTENTS):
+            time.sleep(args.gap)
+            adapt_latencies.append(time_utterance(
+                client, utterance, 'bench:' + intent_type))
+    time.sleep(args.gap)  # Let speculation of the last utterance finish
+    cpu = sum(process.cpu_times()[:2]) - cpu_before
+
+    client.close()
+    skills_process.terminate()
+    service.terminate()
+    skills_process.join()
+    service.join()
+    return {
+        'speculative': speculative,
+        'padatious_p50_ms': 1000 * percentile(padatious_latencies, 50),
+        'padatious_p90_ms': 1000 * percentile(padatious_latencies, 90),
+        'padatious_mean_ms': 1000 * sum(padatious_latencies) /
+        len(padatious_latencies),
+        'adapt_p50_ms': 1000 * percentile(adapt_latencies, 50),
+        'adapt_p90_ms': 1000 * percentile(adapt_latencies, 90),
+        'skills_cpu_s': cpu,
+        'utterances': len(padatious_latencies) + len(adapt_latencies)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD']).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, file_name):
+    """ Print the change against the results of a previous run. """
+    with open(file_name) as f:
+        previous = json.load(f)
+    old = {r['speculative']: r for r in previous['runs']}
+    print('\nCompared to {} ({}):'.format(file_name, previous.get('revision')))
+    for result in results['runs']:
+        before = old.get(result['speculative'])
+        if not before:
+            continue
+        print('speculative {:5}  padatious p50 {:+7.1f}%  '
+              'adapt p50 {:+7.1f}%'.format(
+                  str(result['speculative']),
+                  100.0 * (result['padatious_p50_ms'] /
+                           before['padatious_p50_ms'] - 1),
+                  100.0 * (result['adapt_p50_ms'] /
+                           before['adapt_p50_ms'] - 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--repeat', type=int, default=5,
+                        help='times every utterance is sent')
+    parser.add_argument('--copies', type=int, default=10,
+                        help='copies of the Padatious intents to train')
+    parser.add_argument('--gap', type=float, default=0.5,
+                        help='seconds between utterances')
+    parser.add_argument('--converse-delay', type=float, default=0,
+                        help='seconds active skills take to decline '
+                             'converse')
+    parser.add_argument('--port', type=int, default=18182)
+    parser.add_argument('-o', '--output', help='write results as json')
+    parser.add_argument('--compare', help='results of a previous run')
+    parser.add_argument('--log-level', default='WARNING',
+                        help='log level of the services')
+    args = parser.parse_args()
+    LOG.level = logging.getLevelName(args.log_level)
+
+    directory = tempfile.mkdtemp()
+    try:
+        intents = write_intents(directory, args.copies)
+        results = {
+            'revision': git_revision(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'padatious_intents': len(intents),
+            'converse_delay_s': args.converse_delay,
+            'runs': []
+        }
+        for speculative in (False, True):
+            result = run(args, speculative, intents,
+                         join(directory, 'cache'))
+            results['runs'].append(result)
+            print('speculative {:5}  padatious p50 {:7.1f} ms  '
+                  'p90 {:7.1f} ms  adapt p50 {:7.1f} ms  '
+                  'skills cpu {:5.2f} s'.format(
+                      str(speculative), result['padatious_p50_ms'],
+                      result['padatious_p90_ms'], result['adapt_p50_ms'],
+                      result['skills_cpu_s']))
+    finally:
+        shutil.rmtree(directory)
+
+    off, on = results['runs']
+    results['padatious_latency_reduction_ms'] = \
+        off['padatious_p50_ms'] - on['padatious_p50_ms']
+    print('Padatious path p50 {:.1f} ms faster with speculation'.format(
+        results['padatious_latency_reduction_ms']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,14 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import time
 import unittest
 
+import mock
 import speech_recognition
 from os.path import dirname, join
 from speech_recognition import WavFile, AudioData
 
-from mycroft.client.speech.listener import AudioConsumer, RecognizerLoop
+from mycroft.client.speech.listener import AudioConsumer, RecognizerLoop, \
+    RecognizerLoopState
 from mycroft.stt import MycroftSTT
+from mycroft.stt.stream import BatchSTTStream
 from queue import Queue
 
 
@@ -153,6 +157,34 @@ class AudioConsumerTest(unittest.TestCase):
         self.assertIsNone(monitor.get('wakeword'))
         self.assertTrue(self.loop.state.sleeping)
 
+    def test_stream(self):
+        audio = self.__create_sample_from_test_file('mycroft')
+        stream = mock.Mock()
+        stream.finish.return_value = 'Turn on the lights '
+        self.queue.put((audio, stream, time.time()))
+        monitor = {}
+
+        def callback(message):
+            monitor['utterances'] = message.get('utterances')
+
+        self.loop.once('recognizer_loop:utterance', callback)
+        self.consumer.read()
+        self.assertTrue(stream.finish.called)
+        self.assertEqual(monitor.get('utterances'), ['turn on the lights'])
+
+    def test_stream_cancelled_when_sleeping(self):
+        audio = self.__create_sample_from_test_file('mycroft')
+        stt = mock.Mock(lang='en-US')
+        stream = BatchSTTStream(stt)
+        stream.start(audio.sample_rate, audio.sample_width)
+        stream.feed(audio.frame_data)
+        self.queue.put((audio, stream, time.time()))
+        self.loop.sleep()
+        self.consumer.read()
+        stream.thread.join()
+        self.assertTrue(stream.cancelled)
+        self.assertFalse(stt.execute.called)
+
     def test_wakeup(self):
         self.queue.put(self.__create_sample_from_test_file('mycroft_wakeup'))
         self.loop.sleep()
@@ -198,3 +230,72 @@ class AudioConsumerTest(unittest.TestCase):
         self.assertIsNotNone(utterances)
         self.assertTrue(len(utterances) == 1)
         self.assertEquals("record", utterances[0])
+
+
+class AudioConsumerPipelineTest(unittest.TestCase):
+    """
+    Transcription of utterances by a pool of STT workers
+    """
+
+    def setUp(self):
+        self.queue = Queue()
+        self.emitter = mock.Mock()
+        self.stt = mock.Mock(lang='en-US')
+        # Utterances of 1 second, the first byte tells how long the STT
+        # engine takes, in tenths of a second
+        self.stt.execute.side_effect = self.execute
+
+    def execute(self, audio):
+        delay = bytearray(audio.frame_data)[0]
+        time.sleep(delay / 10.0)
+        return 'utterance {}'.format(delay)
+
+    def create_consumer(self, workers, max_audio_age=0):
+        state = RecognizerLoopState()
+        state.running = True
+        return AudioConsumer(state, self.queue, self.emitter, self.stt,
+                             mock.Mock(), mock.Mock(key_phrase='hey'),
+                             workers, max_audio_age)
+
+    def put(self, delay, recorded=None):
+        audio = AudioData(bytes(bytearray([delay])) * 32000, 16000, 2)
+        self.queue.put((audio, None, recorded or time.time()))
+
+    def utterances(self):
+        return [c[0][1]['utterances'][0]
+                for c in self.emitter.emit.call_args_list
+                if c[0][0] == 'recognizer_loop:utterance']
+
+    def test_in_order(self):
+        consumer = self.create_consumer(3)
+        for delay in (3, 1, 0):
+            self.put(delay)
+        start = time.time()
+        for _ in range(3):
+            consumer.read()
+        consumer.pool.shutdown()
+        # Transcribed at the same time, emitted in order of recording
+        self.assertLess(time.time() - start, 0.55)
+        self.assertEqual(self.utterances(),
+                         ['utterance 3', 'utterance 1', 'utterance 0'])
+        self.assertEqual(len(consumer.metrics._timers['stt.stt']), 3)
+        self.assertEqual(len(consumer.metrics._timers['stt.queue_wait']), 3)
+        self.assertIn('stt.queue_depth', consumer.metrics._levels)
+
+    def test_serial(self):
+        consumer = self.create_consumer(1)
+        self.assertIsNone(consumer.pool)
+        self.put(0)
+        consumer.read()
+        self.assertEqual(self.utterances(), ['utterance 0'])
+
+    def test_drop_stale_audio(self):
+        consumer = self.create_consumer(2, max_audio_age=5)
+        self.put(0, recorded=time.time() - 10)
+        self.put(1)
+        consumer.read()
+        consumer.read()
+        consumer.pool.shutdown()
+        self.assertEqual(self.utterances(), ['utterance 1'])
+        self.assertEqual(self.stt.execute.call_count, 1)
+        self.assertEqual(consumer.metrics._counters['stt.dropped'], 1)
@@ -0,0 +1,133 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+
+import mock
+
+from mycroft.client.speech.hotword_factory import HotWordEngine, \
+    HotWordMultiplexer
+
+
+class FakeHotWord(HotWordEngine):
+    """ Finds its key phrase in audio containing it as text. """
+    def __init__(self, key_phrase, delay=0.0, config=None):
+        with mock.patch('mycroft.client.speech.hotword_factory.'
+                        'Configuration'):
+            super(FakeHotWord, self).__init__(key_phrase, config or {})
+        self.delay = delay
+        self.chunks = []
+
+    def update(self, chunk):
+        time.sleep(self.delay)
+        self.chunks.append(chunk)
+
+    def reset(self):
+        self.chunks = []
+
+    def found_wake_word(self, frame_data):
+        time.sleep(self.delay)
+        return self.key_phrase.encode('utf-8') in frame_data
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+class HotWordMultiplexerTest(unittest.TestCase):
+    def create(self, engines, **kwargs):
+        multiplexer = HotWordMultiplexer(engines, **kwargs)
+        self.addCleanup(multiplexer.stop)
+        return multiplexer
+
+    def test_reports_phrase(self):
+        multiplexer = self.create([FakeHotWord('hey mycroft'),
+                                   FakeHotWord('computer')], max_wait=1.0)
+        self.assertEqual(multiplexer.key_phrase, 'hey mycroft')
+        self.assertFalse(multiplexer.found_wake_word(b'nothing'))
+        self.assertTrue(multiplexer.found_wake_word(b'ok computer'))
+        self.assertEqual(multiplexer.key_phrase, 'computer')
+        self.assertTrue(multiplexer.found_wake_word(b'hey mycroft'))
+        self.assertEqual(multiplexer.key_phrase, 'hey mycroft')
+
+    def test_slow_engine_does_not_block(self):
+        multiplexer = self.create([FakeHotWord('hey mycroft'),
+                                   FakeHotWord('computer', delay=0.5)],
+                                  max_wait=0.05)
+        start = time.time()
+        self.assertFalse(multiplexer.found_wake_word(b'computer'))
+        self.assertLess(time.time() - start, 0.3)
+        # A fast engine answers within the wait
+        self.assertTrue(multiplexer.found_wake_word(b'hey mycroft'))
+        self.assertLess(time.time() - start, 0.3)
+
+    def test_late_detection(self):
+        multiplexer = self.create([FakeHotWord('computer', delay=0.2)],
+                                  max_wait=0.0)
+        self.assertFalse(multiplexer.found_wake_word(b'computer'))
+        self.assertTrue(wait_for(lambda: multiplexer.found_phrase))
+        self.assertTrue(multiplexer.found_wake_word(b'silence'))
+        self.assertEqual(multiplexer.key_phrase, 'computer')
+
+    def test_update_fan_out(self):
+        engines = [FakeHotWord('a'), FakeHotWord('b')]
+        multiplexer = self.create(engines)
+        chunks = [bytes(bytearray([i])) for i in range(10)]
+        for chunk in chunks:
+            multiplexer.update(chunk)
+        for engine in engines:
+            self.assertTrue(wait_for(lambda: engine.chunks == chunks))
+
+    def test_reset(self):
+        engines = [FakeHotWord('a'), FakeHotWord('b')]
+        multiplexer = self.create(engines)
+        multiplexer.update(b'\0')
+        for engine in engines:
+            self.assertTrue(wait_for(lambda: engine.chunks == [b'\0']))
+        multiplexer.reset()
+        for engine in engines:
+            self.assertTrue(wait_for(lambda: engine.chunks == []))
+
+    def test_backlog_dropped(self):
+        slow = FakeHotWord('slow', delay=0.05)
+        multiplexer = self.create([slow], max_backlog=4)
+        for i in range(20):
+            multiplexer.update(bytes(bytearray([i])))
+        self.assertTrue(wait_for(
+            lambda: multiplexer.stats()['slow']['dropped'] > 0))
+        # The most recent audio is kept
+        self.assertTrue(wait_for(lambda: slow.chunks[-1:] == [b'\x13']))
+
+    def test_cpu_budget(self):
+        class BusyHotWord(FakeHotWord):
+            def update(self, chunk):
+                end = time.time() + 0.01
+                while time.time() < end:
+                    pass
+                self.chunks.append(chunk)
+
+        busy = BusyHotWord('busy', config={'cpu_budget': 0.25})
+        multiplexer = self.create([busy])
+        start = time.time()
+        for i in range(10):
+            multiplexer.update(b'\0')
+        self.assertTrue(wait_for(lambda: len(busy.chunks) == 10))
+        elapsed = time.time() - start
+        cpu_time = multiplexer.stats()['busy']['cpu_time']
+        self.assertGreater(cpu_time, 0.05)
+        self.assertLess(cpu_time / elapsed, 0.4)
@@ -84,6 +84,31 @@ class LocalRecognizerTest(unittest.TestCase):
         with source as audio:
             assert self.recognizer.found_wake_word(audio.stream.read())
 
+    def testIncrementalRecognition(self):
+        source = WavFile(os.path.join(DATA_DIR, "hey_mycroft.wav"))
+        with source as audio:
+            data = audio.stream.read()
+        self.recognizer.incremental = True
+        found = False
+        for i in range(0, len(data), 2048):
+            self.recognizer.update(data[i:i + 2048])
+            # The audio is already decoded, what is passed is not used
+            found = found or self.recognizer.found_wake_word(b'')
+        assert found
+        assert not self.recognizer.found_wake_word(b'')
+
+    def testResetIncrementalRecognition(self):
+        source = WavFile(os.path.join(DATA_DIR, "hey_mycroft.wav"))
+        with source as audio:
+            data = audio.stream.read()
+        self.recognizer.incremental = True
+        # Hand off to recording halfway through the wake word
+        half = len(data) // 2
+        self.recognizer.update(data[:half])
+        self.recognizer.reset()
+        self.recognizer.update(data[half:])
+        assert not self.recognizer.found_wake_word(b'')
+
 
 class LocalRecognizerInitTest(unittest.TestCase):
     @mock.patch.object(Configuration, 'get')
@@ -0,0 +1,119 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+
+from mycroft.client.speech.mic import ResponsiveRecognizer
+from mycroft.client.speech.ring_buffer import RingBuffer
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_fill(self):
+        buf = RingBuffer(8)
+        buf.append(b'abc')
+        self.assertEqual(len(buf), 3)
+        self.assertEqual(buf.get(), b'abc')
+        self.assertEqual(buf.get_last(2).tobytes(), b'bc')
+        self.assertEqual(buf.get_last(10).tobytes(), b'abc')
+
+    def test_wrap(self):
+        buf = RingBuffer(8)
+        for chunk in (b'abcde', b'fghij', b'klm'):
+            buf.append(chunk)
+        self.assertEqual(len(buf), 8)
+        self.assertEqual(buf.get(), b'fghijklm')
+        self.assertEqual(buf.get_last(5).tobytes(), b'ijklm')
+
+    def test_large_chunk(self):
+        buf = RingBuffer(4)
+        buf.append(b'ab')
+        buf.append(b'0123456789')
+        self.assertEqual(buf.get(), b'6789')
+
+    def test_no_copy(self):
+        buf = RingBuffer(4)
+        buf.append(b'abcd')
+        self.assertIsInstance(buf.get_last(4), memoryview)
+
+    def test_clear(self):
+        buf = RingBuffer(4)
+        buf.append(b'abcd')
+        buf.clear()
+        self.assertEqual(buf.get(), b'')
+
+
+class MockStream(object):
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def read(self, size, of_exc=False):
+        return self.chunks.pop(0)
+
+
+class MockSource(object):
+    def __init__(self, chunks):
+        self.stream = MockStream(chunks)
+        self.CHUNK = 4
+        self.SAMPLE_RATE = 16000
+        self.SAMPLE_WIDTH = 2
+
+
+class RecordPhraseTest(unittest.TestCase):
+    @mock.patch('mycroft.client.speech.mic.DeviceApi')
+    def test_record_phrase(self, mock_api):
+        recognizer = ResponsiveRecognizer(mock.Mock(num_phonemes=10,
+                                                    key_phrase='hey'))
+        recognizer.RECORDING_TIMEOUT = 3 * 4 / 16000.0
+        chunks = [bytes(bytearray([i] * 8)) for i in range(1, 4)]
+        audio = recognizer._record_phrase(MockSource(chunks), 4 / 16000.0)
+        self.assertEqual(audio, b'\0\0' + b''.join(chunks))
+
+    @mock.patch('mycroft.client.speech.mic.DeviceApi')
+    def test_record_phrase_stream(self, mock_api):
+        recognizer = ResponsiveRecognizer(mock.Mock(num_phonemes=10,
+                                                    key_phrase='hey'))
+        recognizer.RECORDING_TIMEOUT = 3 * 4 / 16000.0
+        chunks = [bytes(bytearray([i] * 8)) for i in range(1, 4)]
+        stream = mock.Mock()
+        recognizer._record_phrase(MockSource(chunks), 4 / 16000.0, stream)
+        fed = b''.join(c[0][0] for c in stream.feed.call_args_list)
+        self.assertEqual(fed, b'\0\0' + b''.join(chunks))
+
+    @mock.patch('mycroft.client.speech.mic.DeviceApi')
+    def test_wake_word_window(self, mock_api):
+        tested = []
+
+        def found_wake_word(audio):
+            tested.append(audio)
+            return len(tested) == 2
+
+        ww = mock.Mock(num_phonemes=1, key_phrase='hey',
+                       found_wake_word=found_wake_word)
+        recognizer = ResponsiveRecognizer(ww)
+        recognizer.save_wake_words = False
+        recognizer.TEST_WW_SEC = recognizer.SAVED_WW_SEC = 8 / 16000.0
+        recognizer.SEC_BETWEEN_WW_CHECKS = 4 / 16000.0
+        recognizer._skip_wake_word = mock.Mock(return_value=False)
+        chunks = [bytes(bytearray([i] * 8)) for i in range(1, 10)]
+        recognizer._wait_until_wake_word(MockSource(chunks), 4 / 16000.0)
+
+        silence = b'\0' * int(recognizer.SILENCE_SEC * 16000 * 2)
+        self.assertEqual(tested[0], b'\1' * 8 + b'\2' * 8 + silence)
+        self.assertEqual(tested[1], b'\2' * 8 + b'\3' * 8 + silence)
+
+
+if __name__ == "__main__":
+    unittest.main()
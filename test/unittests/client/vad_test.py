@@ -0,0 +1,140 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import math
+import random
+import struct
+import unittest
+
+from mycroft.client.speech.vad import EnergyVAD, SpectralVAD, VADFactory, np
+
+CHUNK = 1024
+SEC_PER_BUFFER = CHUNK / 16000.0
+
+
+def audio(seconds, voiced, noise_level=1000, seed=0):
+    """ Noise, with a harmonic vowel like sound on top when voiced. """
+    rand = random.Random(seed)
+    samples = []
+    for i in range(int(seconds * 16000)):
+        value = rand.gauss(0, noise_level)
+        if voiced:
+            t = i / 16000.0
+            value += sum(3000.0 / h * math.sin(2 * math.pi * 150 * h * t)
+                         for h in range(1, 12))
+        samples.append(max(-32768, min(32767, int(value))))
+    return struct.pack('<{}h'.format(len(samples)), *samples)
+
+
+def chunks(data):
+    size = 2 * CHUNK
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def chunks_until_complete(vad, data, is_loud=True):
+    for i, chunk in enumerate(chunks(data)):
+        if vad.update(chunk, is_loud):
+            return i + 1
+    return None
+
+
+class EnergyVADTest(unittest.TestCase):
+    def test_loud_then_quiet(self):
+        vad = EnergyVAD()
+        vad.start(SEC_PER_BUFFER)
+        for _ in range(20):
+            self.assertFalse(vad.update(b'', True))
+        # The noise counter has to drop and stay down for a while
+        quiet = 0
+        while not vad.update(b'', False):
+            quiet += 1
+            self.assertLess(quiet, 20)
+        self.assertGreater(quiet * SEC_PER_BUFFER, vad.MIN_SILENCE_AT_END)
+
+    def test_silence_timeout(self):
+        vad = EnergyVAD()
+        vad.start(SEC_PER_BUFFER)
+        num_chunks = 1
+        while not vad.update(b'', False):
+            num_chunks += 1
+        self.assertAlmostEqual(num_chunks * SEC_PER_BUFFER,
+                               vad.RECORDING_TIMEOUT_WITH_SILENCE, delta=0.1)
+
+    def test_continuous_noise(self):
+        vad = EnergyVAD()
+        vad.start(SEC_PER_BUFFER)
+        for _ in range(200):
+            self.assertFalse(vad.update(b'', True))
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class SpectralVADTest(unittest.TestCase):
+    def setUp(self):
+        self.vad = SpectralVAD()
+        self.vad.start(SEC_PER_BUFFER, 1000)
+
+    def test_end_of_speech_in_noise(self):
+        data = audio(1.0, True) + audio(3.0, False, seed=1)
+        num_chunks = chunks_until_complete(self.vad, data)
+        self.assertIsNotNone(num_chunks)
+        # Ended within the hangover after the speech
+        seconds = num_chunks * SEC_PER_BUFFER
+        self.assertGreater(seconds, 1.0 + self.vad.hangover_sec)
+        self.assertLess(seconds, 1.0 + self.vad.hangover_sec + 0.2)
+
+    def test_pause_bridged(self):
+        data = audio(0.5, True) + audio(0.3, False, seed=1) + \
+            audio(0.5, True, seed=2) + audio(3.0, False, seed=3)
+        seconds = chunks_until_complete(self.vad, data) * SEC_PER_BUFFER
+        self.assertGreater(seconds, 1.3 + self.vad.hangover_sec)
+
+    def test_no_speech(self):
+        seconds = chunks_until_complete(self.vad, audio(5.0, False)) * \
+            SEC_PER_BUFFER
+        self.assertAlmostEqual(seconds,
+                               self.vad.RECORDING_TIMEOUT_WITH_SILENCE,
+                               delta=0.1)
+
+    def test_partial_frames(self):
+        # Chunks not divisible into frames are carried over
+        data = audio(1.0, True) + audio(3.0, False, seed=1)
+        for i in range(0, len(data), 302):
+            if self.vad.update(data[i:i + 302], True):
+                break
+        seconds = (i + 302) / 32000.0
+        self.assertLess(seconds, 1.0 + self.vad.hangover_sec + 0.1)
+
+    def test_loud_noise_never_ends_energy_vad(self):
+        vad = EnergyVAD()
+        vad.start(SEC_PER_BUFFER)
+        data = audio(1.0, True) + audio(3.0, False, seed=1)
+        self.assertIsNone(chunks_until_complete(vad, data))
+
+
+class VADFactoryTest(unittest.TestCase):
+    def test_default(self):
+        self.assertIsInstance(VADFactory.create(), EnergyVAD)
+        self.assertIsInstance(VADFactory.create({'module': 'energy'}),
+                              EnergyVAD)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_spectral_config(self):
+        vad = VADFactory.create({'module': 'spectral',
+                                 'spectral': {'hangover_sec': 0.8}})
+        self.assertIsInstance(vad, SpectralVAD)
+        self.assertEqual(vad.hangover_sec, 0.8)
+
+    def test_fallback(self):
+        vad = VADFactory.create({'module': 'spectral'}, sample_width=1)
+        self.assertIsInstance(vad, EnergyVAD)
@@ -0,0 +1,141 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import mock
+
+from mycroft.messagebus.capture import (CaptureWriter, CaptureReader,
+                                        index_path)
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.replay import replay
+
+
+def frame(msg_type, i=0):
+    return Message(msg_type, {'i': i}).serialize()
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = join(self.dir, 'test.bus')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, count, start=100.0, interval=0.5):
+        with CaptureWriter(self.path, index_interval=1.0) as writer:
+            for i in range(count):
+                msg_type = 'speak' if i % 2 else 'enclosure.mouth.viseme'
+                writer.write(frame(msg_type, i), start + i * interval)
+
+    def test_read_back(self):
+        self.write(10)
+        records = list(CaptureReader(self.path).records())
+        self.assertEqual(len(records), 10)
+        self.assertEqual(records[0].type, 'enclosure.mouth.viseme')
+        self.assertEqual(records[1].type, 'speak')
+        self.assertEqual(records[3].timestamp, 101.5)
+        self.assertEqual(Message.deserialize(records[3].frame.decode()).data,
+                         {'i': 3})
+        self.assertFalse(records[0].binary)
+
+    def test_start_and_end(self):
+        self.write(10)
+        reader = CaptureReader(self.path)
+        self.assertEqual(len(reader.index), 5)
+        records = list(reader.records(start=102.0, end=103.0))
+        self.assertEqual([r.timestamp for r in records],
+                         [102.0, 102.5, 103.0])
+
+    def test_without_index(self):
+        self.write(10)
+        os.remove(index_path(self.path))
+        records = list(CaptureReader(self.path).records(start=102.0))
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[1].type, 'speak')
+
+    def test_incomplete_record(self):
+        self.write(10)
+        with open(self.path, 'ab') as f:
+            f.write(b'\x02\x00\x00')
+        self.assertEqual(len(list(CaptureReader(self.path).records())), 10)
+
+    def test_continue_recording(self):
+        self.write(4)
+        with open(self.path, 'ab') as f:
+            f.write(b'\x02\x00\x00')  # Cut short by a crash
+        with CaptureWriter(self.path) as writer:
+            writer.write(frame('speak', 4), 110.0)
+            writer.write(frame('new.type', 5), 111.0)
+        reader = CaptureReader(self.path)
+        records = list(reader.records())
+        self.assertEqual([r.type for r in records][-3:],
+                         ['speak', 'speak', 'new.type'])
+        self.assertEqual(len(list(reader.records(start=111.0))), 1)
+
+    def test_summary(self):
+        self.write(10)
+        summary = CaptureReader(self.path).summary()
+        self.assertEqual(summary['messages'], 10)
+        self.assertEqual(summary['duration'], 4.5)
+        self.assertEqual(summary['types']['speak']['messages'], 5)
+
+    def test_not_a_capture(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"type": "speak"}')
+        with self.assertRaises(ValueError):
+            CaptureReader(self.path)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = join(self.dir, 'test.bus')
+        with CaptureWriter(self.path) as writer:
+            for i in range(4):
+                writer.write(frame('speak' if i % 2 else 'other', i),
+                             100.0 + i)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    @mock.patch('mycroft.messagebus.replay.time')
+    def test_timing(self, mock_time):
+        now = [0.0]
+        mock_time.time.side_effect = lambda: now[0]
+
+        def sleep(delay):
+            now[0] += delay
+        mock_time.sleep.side_effect = sleep
+
+        sent = []
+        result = replay(CaptureReader(self.path),
+                        lambda r: sent.append((now[0], r.type)), speed=2.0)
+        self.assertEqual(result['messages'], 4)
+        self.assertEqual([t for t, _ in sent], [0.0, 0.5, 1.0, 1.5])
+
+    def test_types(self):
+        sent = []
+        replay(CaptureReader(self.path), sent.append, speed=0,
+               types=['sp*'])
+        self.assertEqual([r.type for r in sent], ['speak', 'speak'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import unittest
+from threading import Event
+
+import mock
+
+from mycroft.messagebus.client.ws import DISPATCH_STATS, WebsocketClient
+from mycroft.messagebus.message import Message
+
+
+def create_client(local_delivery):
+    config = {
+        'websocket': {
+            'host': '0.0.0.0',
+            'port': 8181,
+            'route': '/core',
+            'transport': 'tcp',
+            'local_delivery': local_delivery,
+            'dispatch': {'inline': ['test']}
+        }
+    }
+    with mock.patch('mycroft.messagebus.client.ws.Configuration') as conf, \
+            mock.patch('mycroft.messagebus.client.ws.WebSocketApp'):
+        conf.get.return_value = config
+        client = WebsocketClient()
+    client.connected_event.set()
+    return client
+
+
+class TestLocalDelivery(unittest.TestCase):
+    def test_url(self):
+        self.assertTrue(create_client(True).url.endswith('/core?echo=0'))
+        self.assertTrue(create_client(False).url.endswith('/core'))
+
+    def test_delivered_locally_and_sent(self):
+        client = create_client(True)
+        handler = mock.Mock()
+        client.on('test', handler)
+        client.emit(Message('test', {'x': 1}))
+
+        self.assertEqual(client.client.send.call_count, 1)
+        self.assertEqual(handler.call_count, 1)
+        received = handler.call_args[0][0]
+        self.assertEqual(received.data, {'x': 1})
+
+    def test_plain_object_delivered_locally(self):
+        class Event(object):
+            def __init__(self):
+                self.type = 'test'
+                self.data = {'x': 1}
+                self.context = None
+
+        client = create_client(True)
+        handler = mock.Mock()
+        client.on('test', handler)
+        client.emit(Event())
+
+        self.assertEqual(client.client.send.call_count, 1)
+        self.assertEqual(handler.call_args[0][0].data, {'x': 1})
+
+    def test_handlers_get_a_copy(self):
+        client = create_client(True)
+        handler = mock.Mock()
+        client.on('test', handler)
+        message = Message('test', {'x': 1})
+        client.emit(message)
+        self.assertIsNot(handler.call_args[0][0], message)
+
+    def test_not_delivered_locally(self):
+        client = create_client(False)
+        handler = mock.Mock()
+        client.on('test', handler)
+        client.emit(Message('test'))
+        handler.assert_not_called()
+
+    def test_local_reply_resolves_request(self):
+        client = create_client(True)
+        replied = Event()
+
+        def respond(message):
+            client.emit(message.response({'answer': 42}))
+            replied.set()
+
+        client.on('question', respond)
+        future = client.request(Message('question'))
+        self.assertTrue(replied.wait(5))
+        self.assertEqual(future.result(5).data, {'answer': 42})
+
+
+class TestDispatchStats(unittest.TestCase):
+    def test_stats_reply(self):
+        client = create_client(False)
+        client.on('test', mock.Mock())
+        client.on_message(client.client, Message('test').serialize())
+        client.on_message(client.client,
+                          Message(DISPATCH_STATS).serialize())
+
+        frame = client.client.send.call_args[0][0]
+        reply = Message.deserialize(frame)
+        self.assertEqual(reply.type, DISPATCH_STATS + '.response')
+        self.assertEqual(reply.data['pid'], os.getpid())
+        self.assertEqual(reply.data['lanes']['test']['handled'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
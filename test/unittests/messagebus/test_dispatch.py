@@ -0,0 +1,161 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from threading import Event, current_thread
+
+from pyee import EventEmitter
+
+from mycroft.messagebus.client.dispatch import Dispatcher
+from mycroft.messagebus.message import Message
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.emitter = EventEmitter()
+
+    def create_dispatcher(self, **kwargs):
+        return Dispatcher(self.emitter.emit, **kwargs)
+
+    def test_ordered_per_type(self):
+        dispatcher = self.create_dispatcher(pool_size=4, ordered=['test'])
+        received = []
+        done = Event()
+
+        def handler(message):
+            # Later messages are faster, would overtake without lanes
+            time.sleep(0.01 * (5 - message.data['n']))
+            received.append(message.data['n'])
+            if len(received) == 5:
+                done.set()
+
+        self.emitter.on('test', handler)
+        for n in range(5):
+            dispatcher.dispatch(Message('test', {'n': n}))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(received, list(range(5)))
+        stats = dispatcher.stats()['test']
+        self.assertEqual(stats['handled'], 5)
+        self.assertEqual(stats['queued'], 0)
+
+    def test_unordered_by_default(self):
+        dispatcher = self.create_dispatcher(pool_size=2)
+        release = Event()
+        handled = Event()
+
+        def handler(message):
+            if message.data['n'] == 0:
+                release.wait(5)
+            else:
+                handled.set()
+
+        self.emitter.on('test', handler)
+        dispatcher.dispatch(Message('test', {'n': 0}))
+        dispatcher.dispatch(Message('test', {'n': 1}))
+        # The second message doesn't wait for the first
+        self.assertTrue(handled.wait(1))
+        release.set()
+
+    def test_keep_order(self):
+        dispatcher = self.create_dispatcher(pool_size=2)
+        dispatcher.keep_order('test')
+        release = Event()
+        handled = Event()
+
+        def handler(message):
+            if message.data['n'] == 0:
+                release.wait(5)
+            else:
+                handled.set()
+
+        self.emitter.on('test', handler)
+        dispatcher.dispatch(Message('test', {'n': 0}))
+        dispatcher.dispatch(Message('test', {'n': 1}))
+        self.assertFalse(handled.wait(0.1))
+        release.set()
+        self.assertTrue(handled.wait(1))
+
+    def test_priority_not_blocked(self):
+        dispatcher = self.create_dispatcher(pool_size=1,
+                                            priority=['mycroft.stop'])
+        release = Event()
+        stopped = Event()
+        self.emitter.on('slow', lambda m: release.wait(5))
+        self.emitter.on('mycroft.stop', lambda m: stopped.set())
+        dispatcher.dispatch(Message('slow'))
+        dispatcher.dispatch(Message('mycroft.stop'))
+        self.assertTrue(stopped.wait(1))
+        release.set()
+
+    def test_priority_types_not_blocking_each_other(self):
+        dispatcher = self.create_dispatcher(
+            priority=['mycroft.stop', 'recognizer_loop:utterance'],
+            priority_pool_size=1)
+        release = Event()
+        stopped = Event()
+        self.emitter.on('recognizer_loop:utterance', lambda m: release.wait(5))
+        self.emitter.on('mycroft.stop', lambda m: stopped.set())
+        dispatcher.dispatch(Message('recognizer_loop:utterance'))
+        dispatcher.dispatch(Message('mycroft.stop'))
+        self.assertTrue(stopped.wait(1))
+        release.set()
+
+    def test_pool_backlog_in_stats(self):
+        dispatcher = self.create_dispatcher(pool_size=1)
+        release = Event()
+        self.emitter.on('slow', lambda m: release.wait(5))
+        for _ in range(3):
+            dispatcher.dispatch(Message('slow'))
+        time.sleep(0.1)
+        # One is being handled, two wait for the worker
+        self.assertEqual(dispatcher.stats()['slow']['queued'], 2)
+        release.set()
+
+    def test_keyed_lanes(self):
+        dispatcher = self.create_dispatcher(
+            pool_size=2, ordered=['skill.converse.request'],
+            lane_keys={'skill.converse.request': 'skill_id'})
+        release = Event()
+        handled = Event()
+
+        def handler(message):
+            if message.data['skill_id'] == 'slow':
+                release.wait(5)
+            else:
+                handled.set()
+
+        self.emitter.on('skill.converse.request', handler)
+        dispatcher.dispatch(Message('skill.converse.request',
+                                    {'skill_id': 'slow'}))
+        dispatcher.dispatch(Message('skill.converse.request',
+                                    {'skill_id': 'fast'}))
+        # The lane of the other skill isn't held up
+        self.assertTrue(handled.wait(1))
+        self.assertEqual(sorted(dispatcher.stats()),
+                         ['skill.converse.request:fast',
+                          'skill.converse.request:slow'])
+        release.set()
+
+    def test_inline(self):
+        dispatcher = self.create_dispatcher(inline=['enclosure.mouth.viseme'])
+        threads = []
+        self.emitter.on('enclosure.mouth.viseme',
+                        lambda m: threads.append(current_thread()))
+        dispatcher.dispatch(Message('enclosure.mouth.viseme'))
+        self.assertEqual(threads, [current_thread()])
+
+
+if __name__ == "__main__":
+    unittest.main()
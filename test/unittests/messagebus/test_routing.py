@@ -0,0 +1,60 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.messagebus.service.routing import SubscriptionIndex
+
+
+class TestSubscriptionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SubscriptionIndex()
+        self.index.add_client('cli')
+        self.index.add_client('audio')
+
+    def test_broadcast_by_default(self):
+        self.assertEqual(self.index.recipients('speak'), {'cli', 'audio'})
+
+    def test_exact_subscription(self):
+        self.index.subscribe('audio', ['speak'])
+        self.assertEqual(self.index.recipients('speak'), {'cli', 'audio'})
+        self.assertEqual(self.index.recipients('register_vocab'), {'cli'})
+
+    def test_pattern_subscription(self):
+        self.index.subscribe('audio', ['recognizer_loop:*'])
+        self.assertEqual(self.index.recipients('recognizer_loop:wakeword'),
+                         {'cli', 'audio'})
+        self.assertEqual(self.index.recipients('enclosure.mouth.viseme'),
+                         {'cli'})
+
+    def test_unsubscribe(self):
+        self.index.subscribe('audio', ['speak', 'mycroft.audio.*'])
+        self.index.unsubscribe('audio', ['speak', 'mycroft.audio.*'])
+        self.assertEqual(self.index.recipients('speak'), {'cli'})
+        self.assertEqual(self.index.recipients('mycroft.audio.service.play'),
+                         {'cli'})
+
+    def test_remove_client(self):
+        self.index.subscribe('audio', ['speak', 'recognizer_loop:*'])
+        self.index.remove_client('audio')
+        self.index.remove_client('cli')
+        self.assertEqual(self.index.recipients('speak'), set())
+        self.assertEqual(self.index.recipients('recognizer_loop:wakeword'),
+                         set())
+        self.assertEqual(self.index.exact, {})
+        self.assertEqual(self.index.patterns, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
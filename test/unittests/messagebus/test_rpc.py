@@ -0,0 +1,60 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.messagebus.client.rpc import PendingRequests, REQUEST_ID
+from mycroft.messagebus.message import Message
+
+
+class TestPendingRequests(unittest.TestCase):
+    def setUp(self):
+        self.pending = PendingRequests()
+
+    def test_reply_matched_by_request_id(self):
+        first = Message('skillmanager.list')
+        second = Message('skillmanager.list')
+        first_future = self.pending.add(first, 'mycroft.skills.list')
+        second_future = self.pending.add(second, 'mycroft.skills.list')
+        self.assertNotEqual(first.context[REQUEST_ID],
+                            second.context[REQUEST_ID])
+
+        reply = second.reply('mycroft.skills.list', {'skills': []})
+        self.assertTrue(self.pending.resolve(reply))
+        self.assertIs(second_future.result(0), reply)
+        self.assertFalse(first_future.done())
+
+    def test_reply_without_request_id(self):
+        future = self.pending.add(Message('test'), 'test.response')
+        self.assertFalse(self.pending.resolve(Message('other')))
+        reply = Message('test.response')
+        self.assertTrue(self.pending.resolve(reply))
+        self.assertIs(future.result(0), reply)
+        self.assertEqual(len(self.pending.requests), 0)
+
+    def test_foreign_request_id_ignored(self):
+        future = self.pending.add(Message('test'), 'test.response')
+        reply = Message('test.response', context={REQUEST_ID: 'other'})
+        self.assertFalse(self.pending.resolve(reply))
+        self.assertFalse(future.done())
+
+    def test_cancel(self):
+        future = self.pending.add(Message('test'), 'test.response')
+        future.cancel()
+        self.assertEqual(len(self.pending.requests), 0)
+        self.assertFalse(self.pending.resolve(Message('test.response')))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from concurrent.futures import Future
+
+import mock
+
+from mycroft.messagebus.service.send_queue import (SendQueue, DROP_OLDEST,
+                                                   DROP_TYPE, DISCONNECT)
+
+
+class StalledClient(object):
+    """ Connection whose writes are only flushed when asked to. """
+    def __init__(self):
+        self.written = []
+        self.futures = []
+
+    def write(self, frame, binary=False):
+        self.written.append(frame)
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def flush(self):
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.set_result(None)
+
+
+class TestSendQueue(unittest.TestCase):
+    def create_queue(self, policy, **kwargs):
+        self.client = StalledClient()
+        self.close = mock.Mock()
+        return SendQueue(self.client.write, self.close, max_messages=3,
+                         window_bytes=1, policy=policy, **kwargs)
+
+    def test_write_and_pump(self):
+        queue = self.create_queue(DROP_OLDEST)
+        for frame in ('a', 'b', 'c'):
+            queue.put('test', frame)
+        self.assertEqual(self.client.written, ['a'])
+        self.assertEqual(queue.stats()['queued_messages'], 2)
+        self.client.flush()
+        self.assertEqual(self.client.written, ['a', 'b'])
+        self.client.flush()
+        self.client.flush()
+        self.assertEqual(self.client.written, ['a', 'b', 'c'])
+        self.assertEqual(queue.stats()['queued_messages'], 0)
+
+    def test_drop_oldest(self):
+        queue = self.create_queue(DROP_OLDEST)
+        for frame in ('a', 'b', 'c', 'd', 'e'):
+            queue.put('test', frame)
+        self.assertEqual([q[1] for q in queue.queue], ['c', 'd', 'e'])
+        self.assertEqual(queue.stats()['dropped'], 1)
+
+    def test_drop_type(self):
+        queue = self.create_queue(DROP_TYPE,
+                                  drop_types=['enclosure.mouth.*'])
+        queue.put('speak', 'a')
+        queue.put('speak', 'b')
+        queue.put('enclosure.mouth.viseme', 'c')
+        queue.put('speak', 'd')
+        queue.put('speak', 'e')
+        self.assertEqual([q[1] for q in queue.queue], ['b', 'd', 'e'])
+        queue.put('enclosure.mouth.viseme', 'f')
+        self.assertEqual([q[1] for q in queue.queue], ['b', 'd', 'e'])
+        self.assertEqual(queue.dropped['enclosure.mouth.viseme'], 2)
+        queue.put('speak', 'g')
+        self.assertEqual([q[1] for q in queue.queue], ['d', 'e', 'g'])
+
+    def test_disconnect(self):
+        queue = self.create_queue(DISCONNECT)
+        for frame in ('a', 'b', 'c', 'd', 'e'):
+            queue.put('test', frame)
+        self.close.assert_called_once_with()
+        self.assertEqual(queue.stats()['queued_messages'], 0)
+        queue.put('test', 'f')
+        self.assertEqual(self.client.written, ['a'])
+
+
+if __name__ == "__main__":
+    unittest.main()
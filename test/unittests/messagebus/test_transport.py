@@ -0,0 +1,41 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from os.path import join
+
+import mock
+
+from mycroft.messagebus.transport import get_unix_socket_path
+
+
+class TestUnixSocketPath(unittest.TestCase):
+    def test_disabled(self):
+        self.assertIsNone(get_unix_socket_path({}))
+        self.assertIsNone(get_unix_socket_path({'unix_socket': ''}))
+
+    def test_absolute(self):
+        config = {'unix_socket': '/run/mycroft/bus.sock'}
+        self.assertEqual(get_unix_socket_path(config),
+                         '/run/mycroft/bus.sock')
+
+    @mock.patch('mycroft.messagebus.transport.get_ipc_directory')
+    def test_relative(self, mock_ipc_dir):
+        mock_ipc_dir.return_value = '/tmp/mycroft/ipc'
+        self.assertEqual(get_unix_socket_path({'unix_socket': 'bus.sock'}),
+                         join('/tmp/mycroft/ipc', 'bus.sock'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.messagebus import wire
+from mycroft.messagebus.message import Message
+
+
+class TestWireFormats(unittest.TestCase):
+    def setUp(self):
+        self.message = Message('enclosure.mouth.viseme',
+                               {'code': '3', 'until': 1522331423.5},
+                               {'target': 'enclosure'})
+
+    def check_round_trip(self, wire_format):
+        frame = wire.encode(self.message, wire_format)
+        decoded = wire.decode(frame)
+        self.assertEqual(decoded.type, self.message.type)
+        self.assertEqual(decoded.data, self.message.data)
+        self.assertEqual(decoded.context, self.message.context)
+
+    def test_json(self):
+        self.assertFalse(wire.is_binary(wire.JSON))
+        self.check_round_trip(wire.JSON)
+        # json received as bytes is still decoded as json
+        frame = wire.encode(self.message, wire.JSON).encode('utf-8')
+        self.assertEqual(wire.decode(frame).data, self.message.data)
+
+    @unittest.skipIf(wire.msgpack is None, 'msgpack not installed')
+    def test_msgpack(self):
+        self.assertTrue(wire.is_binary(wire.MSGPACK))
+        self.check_round_trip(wire.MSGPACK)
+
+    def test_lazy_decode(self):
+        for wire_format in wire.supported_formats():
+            frame = wire.encode(self.message, wire_format)
+            self.assertEqual(wire.peek_type(frame), self.message.type)
+            message = wire.decode_lazy(frame)
+            self.assertFalse(message._decoded)
+            self.assertEqual(message.type, self.message.type)
+            self.assertEqual(message.context, self.message.context)
+            self.assertTrue(message._decoded)
+            self.assertEqual(message.data, self.message.data)
+
+    def test_lazy_decode_fallback(self):
+        frame = '{"data": {"code": "3"}, "type": "enclosure.mouth.viseme"}'
+        self.assertIsNone(wire.peek_type(frame))
+        message = wire.decode_lazy(frame)
+        self.assertEqual(message.type, 'enclosure.mouth.viseme')
+        self.assertEqual(message.data, {'code': '3'})
+
+    def test_select_format(self):
+        self.assertEqual(wire.select_format(None), wire.JSON)
+        self.assertEqual(wire.select_format('unknown'), wire.JSON)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -88,10 +88,14 @@ class MycroftSkillTest(unittest.TestCase):
         self.check_emitter(result_list)
 
     def check_emitter(self, result_list):
-        for type in self.emitter.get_types():
-            self.assertEquals(type, 'register_vocab')
-        self.assertEquals(sorted(self.emitter.get_results(),
-                                 key=lambda d: sorted(d.items())),
+        # Everything loaded at once is sent in a single message
+        self.assertLessEqual(len(self.emitter.get_types()), 1)
+        vocab = []
+        for type, data in zip(self.emitter.get_types(),
+                              self.emitter.get_results()):
+            self.assertEquals(type, 'register_vocab_batch')
+            vocab += data['vocab']
+        self.assertEquals(sorted(vocab, key=lambda d: sorted(d.items())),
                           sorted(result_list, key=lambda d: sorted(d.items())))
         self.emitter.reset()
 
@@ -281,12 +285,13 @@ class MycroftSkillTest(unittest.TestCase):
 
         # Normal vocaubulary
         self.emitter.reset()
-        expected = [{'start': 'hello', 'end': 'AHelloKeyword'}]
+        expected = [{'start': 'hello', 'end': 'AHelloKeyword',
+                     'skill_id': 'A'}]
         s.register_vocabulary('hello', 'HelloKeyword')
         self.check_register_vocabulary(expected)
         # Regex
         s.register_regex('weird (?P<Weird>.+) stuff')
-        expected = [{'regex': 'weird (?P<AWeird>.+) stuff'}]
+        expected = [{'regex': 'weird (?P<AWeird>.+) stuff', 'skill_id': 'A'}]
         self.check_register_vocabulary(expected)
 
     def check_register_object_file(self, types_list, result_list):
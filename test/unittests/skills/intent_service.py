@@ -12,9 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import json
+import shutil
+import tempfile
+import time
 import unittest
+from concurrent.futures import Future
+from os.path import join
+from threading import Timer
 
-from mycroft.skills.intent_service import ContextManager
+import mock
+from adapt.intent import IntentBuilder
+
+from mycroft.messagebus.message import Message
+from mycroft.skills.intent_service import ContextManager, IntentCache, \
+    IntentService
+from mycroft.skills.intent_snapshot import IntentSnapshot
 
 
 class MockEmitter(object):
@@ -68,5 +81,371 @@ class ContextManagerTest(unittest.TestCase):
         self.assertEqual(len(self.context_manager.frame_stack), 0)
 
 
+class IntentCacheTest(unittest.TestCase):
+    def test_lru(self):
+        cache = IntentCache(2)
+        cache.put('a', {'n': 1})
+        cache.put('b', {'n': 2})
+        self.assertEqual(cache.get('a'), (True, {'n': 1}))
+        cache.put('c', {'n': 3})
+        # b was the least recently used
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertTrue(cache.get('a')[0])
+        self.assertTrue(cache.get('c')[0])
+        self.assertEqual(cache.stats()['hits'], 3)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_copies(self):
+        cache = IntentCache(2)
+        intent = {'n': 1}
+        cache.put('a', intent)
+        intent['n'] = 2
+        cache.get('a')[1]['n'] = 3
+        self.assertEqual(cache.get('a'), (True, {'n': 1}))
+
+    def test_disabled(self):
+        cache = IntentCache(0)
+        cache.put('a', {'n': 1})
+        self.assertEqual(cache.get('a'), (False, None))
+
+
+class IntentServiceCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.emitter = mock.Mock()
+        self.service = IntentService(self.emitter)
+        self.register_vocab('time', 'TimeKeyword')
+        self.register_intent(IntentBuilder('skill1:TimeIntent')
+                             .require('TimeKeyword').build())
+        self.determine_intent = mock.Mock(
+            side_effect=self.service.engine.determine_intent)
+        self.service.engine.determine_intent = self.determine_intent
+
+    def register_vocab(self, word, entity_type):
+        self.service.handle_register_vocab(Message('register_vocab', {
+            'start': word, 'end': entity_type}))
+
+    def register_intent(self, intent):
+        self.service.handle_register_intent(Message('register_intent',
+                                                    intent.__dict__))
+
+    def match(self, utterance):
+        return self.service._adapt_intent_match([utterance], 'en-us')
+
+    def test_repeated_utterance(self):
+        intent = self.match('what time is it')
+        self.assertEqual(intent['intent_type'], 'skill1:TimeIntent')
+        self.assertEqual(self.match('what time is it'), intent)
+        self.assertEqual(self.determine_intent.call_count, 1)
+        self.assertIsNone(self.match('hello'))
+        self.assertIsNone(self.match('hello'))
+        self.assertEqual(self.determine_intent.call_count, 2)
+        stats = self.service.intent_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_registration_invalidates(self):
+        self.assertIsNone(self.match('hello'))
+        self.register_vocab('hello', 'HelloKeyword')
+        self.register_intent(IntentBuilder('skill2:HelloIntent')
+                             .require('HelloKeyword').build())
+        self.assertEqual(self.match('hello')['intent_type'],
+                         'skill2:HelloIntent')
+        self.service.handle_detach_skill(Message('detach_skill',
+                                                 {'skill_id': 'skill2'}))
+        self.assertIsNone(self.match('hello'))
+        self.assertEqual(self.determine_intent.call_count, 3)
+
+    def test_context_in_key(self):
+        self.match('what time is it')
+        self.service.handle_add_context(Message('add_context', {
+            'context': 'TimeKeyword', 'word': 'time'}))
+        self.match('what time is it')
+        self.assertEqual(self.determine_intent.call_count, 2)
+        self.service.handle_clear_context(Message('clear_context'))
+        self.match('what time is it')
+        self.assertEqual(self.determine_intent.call_count, 2)
+
+    def test_vocab_batch(self):
+        self.service.handle_register_vocab_batch(Message(
+            'register_vocab_batch', {'vocab': [
+                {'start': 'hello', 'end': 'HelloKeyword'},
+                {'start': 'hi', 'end': 'HelloKeyword', 'alias_of': 'hello'},
+                {'regex': '(?P<Name>mycroft)'}]}))
+        self.register_intent(IntentBuilder('skill2:HelloIntent')
+                             .require('HelloKeyword').require('Name').build())
+        intent = self.match('hi mycroft')
+        self.assertEqual(intent['intent_type'], 'skill2:HelloIntent')
+        self.assertEqual(intent['HelloKeyword'], 'hello')
+        self.assertEqual(self.service.registry_version, 4)
+
+    def test_stats_message(self):
+        self.match('what time is it')
+        self.service.handle_cache_stats(
+            Message('intent.service.cache.stats'))
+        reply = self.emitter.emit.call_args[0][0]
+        self.assertEqual(reply.type, 'intent.service.cache.stats.response')
+        self.assertEqual(reply.data['misses'], 1)
+
+
+class ConverseTest(unittest.TestCase):
+    """ Active skills answer after the given delay with the given result. """
+    def setUp(self):
+        self.emitter = mock.Mock()
+        self.emitter.request.side_effect = self.request
+        self.service = IntentService(self.emitter)
+        self.service.converse_deadline = 0.5
+        self.service.CONVERSE_REPORT_TIMEOUT = 0.5
+        self.answers = {}
+        self.requested = []
+        patcher = mock.patch('mycroft.skills.intent_service.report_timing')
+        self.report = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, message, reply_type=None):
+        skill_id = message.data['skill_id']
+        self.requested.append(skill_id)
+        future = Future()
+        delay, result = self.answers[skill_id]
+        if delay is not None:
+            reply = message.reply(reply_type, {'skill_id': skill_id,
+                                               'result': result})
+            Timer(delay, future.set_result, (reply,)).start()
+        return future
+
+    def activate(self, *answers):
+        # The last added skill is the most recently active
+        for skill_id, answer in reversed(list(enumerate(answers))):
+            self.answers[skill_id] = answer
+            self.service.add_active_skill(skill_id)
+
+    def converse(self):
+        start = time.time()
+        result = self.service._converse(['hello'], 'en-us', 'ident')
+        return result, time.time() - start
+
+    @property
+    def reports(self):
+        """ Reported converse time per skill. """
+        return {c[0][3]['skill']: c[0][2] for c in
+                self.report.call_args_list}
+
+    def wait_for_reports(self, count):
+        end = time.time() + 5
+        while len(self.reports) < count and time.time() < end:
+            time.sleep(0.01)
+        return self.reports
+
+    def test_recency_order(self):
+        self.activate((0.1, False), (0.1, True), (0.0, True))
+        result, seconds = self.converse()
+        self.assertTrue(result)
+        # The least recent skill is never asked
+        self.assertEqual(self.requested, [0, 1])
+        self.assertGreaterEqual(seconds, 0.2)
+        self.assertEqual(self.service.active_skills[0][0], 1)
+        self.assertEqual(sorted(self.wait_for_reports(2)), [0, 1])
+
+    def test_deadline(self):
+        self.activate((None, False), (0.1, False))
+        result, seconds = self.converse()
+        self.assertFalse(result)
+        self.assertAlmostEqual(seconds, 0.5, delta=0.1)
+        # No time left to ask the next skill
+        self.assertEqual(self.requested, [0])
+        # Given up on after the report timeout
+        self.assertIsNone(self.wait_for_reports(1)[0].time)
+
+    def test_concurrent_requests(self):
+        self.service.converse_concurrent = True
+        self.activate((0.2, False), (0.2, False), (0.2, True))
+        result, seconds = self.converse()
+        self.assertTrue(result)
+        self.assertEqual(self.requested, [0, 1, 2])
+        self.assertLess(seconds, 0.4)
+        self.assertEqual(self.service.active_skills[0][0], 2)
+        reports = self.wait_for_reports(3)
+        for stopwatch in reports.values():
+            self.assertGreaterEqual(stopwatch.time, 0.2)
+
+    def test_concurrent_recency_priority(self):
+        self.service.converse_concurrent = True
+        # The most recent skill wins, even though it answers last
+        self.activate((0.2, True), (0.0, True))
+        result, _ = self.converse()
+        self.assertTrue(result)
+        self.assertEqual(self.service.active_skills[0][0], 0)
+
+    def test_concurrent_late_answer_reported(self):
+        self.service.converse_concurrent = True
+        self.activate((0.0, True), (0.3, False))
+        result, seconds = self.converse()
+        self.assertTrue(result)
+        self.assertLess(seconds, 0.2)
+        # The less recent skill isn't waited for but still reported
+        self.assertGreaterEqual(self.wait_for_reports(2)[1].time, 0.3)
+
+    def test_concurrent_answer_after_missed_deadline(self):
+        self.service.converse_concurrent = True
+        self.activate((None, False), (0.1, True))
+        result, _ = self.converse()
+        self.assertTrue(result)
+        self.assertEqual(self.service.active_skills[0][0], 1)
+
+    def test_utterance_without_ident(self):
+        self.activate((0.0, True))
+        self.service.handle_utterance(Message(
+            'recognizer_loop:utterance', {'utterances': ['hello']},
+            {'request_id': '1'}))
+        self.assertEqual(self.requested, [0])
+
+    def test_no_active_skills(self):
+        self.assertEqual(self.converse()[0], False)
+        self.assertEqual(self.requested, [])
+
+    def test_reset_converse(self):
+        self.activate((0.0, False), (0.0, False))
+        self.service.reset_converse(Message(
+            'mycroft.speech.recognition.unknown', {'lang': 'en-us'}))
+        self.assertEqual(self.requested, [])
+        messages = [c[0][0] for c in self.emitter.emit.call_args_list]
+        self.assertEqual([m.data['skill_id'] for m in messages], [0, 1])
+        self.assertEqual(messages[0].type, 'skill.converse.request')
+        self.assertIsNone(messages[0].data['utterances'])
+
+
+class SpeculativeMatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.emitter = mock.Mock()
+        self.service = IntentService(self.emitter)
+
+    def test_started_before_matching(self):
+        def matcher(utterances, lang):
+            # Adapt has not been tried yet
+            self.assertFalse(self.emitter.emit.called)
+            calls.append((utterances, lang))
+        calls = []
+        self.service.add_speculative_matcher(matcher)
+        self.service.handle_utterance(Message('recognizer_loop:utterance', {
+            'utterances': ['hello'], 'lang': 'en-us'}))
+        self.assertEqual(calls, [(['hello'], 'en-us')])
+        reply = self.emitter.emit.call_args[0][0]
+        self.assertEqual(reply.type, 'intent_failure')
+
+    def test_failing_matcher(self):
+        self.service.add_speculative_matcher(mock.Mock(side_effect=Exception))
+        self.service.handle_utterance(Message('recognizer_loop:utterance', {
+            'utterances': ['hello'], 'lang': 'en-us'}))
+        reply = self.emitter.emit.call_args[0][0]
+        self.assertEqual(reply.type, 'intent_failure')
+
+
+class IntentSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = join(self.directory, 'intent_snapshot.json')
+        self.services = []
+
+    def tearDown(self):
+        for service in self.services:
+            if service.snapshot_timer:
+                service.snapshot_timer.cancel()
+        shutil.rmtree(self.directory)
+
+    def start(self):
+        service = IntentService(mock.Mock(),
+                                IntentSnapshot(self.path, 'en-us'))
+        self.services.append(service)
+        return service
+
+    def load_skill(self, service, skill_id, words, intent_name):
+        keyword = skill_id + 'Keyword'
+        service.handle_register_vocab_batch(Message('register_vocab_batch', {
+            'vocab': [{'start': w, 'end': keyword} for w in words],
+            'skill_id': skill_id}))
+        intent = IntentBuilder(skill_id + ':' + intent_name) \
+            .require(keyword).build()
+        service.handle_register_intent(Message('register_intent',
+                                               intent.__dict__))
+        service.handle_skill_loaded(Message('mycroft.skills.loaded',
+                                            {'id': skill_id}))
+
+    def first_run(self):
+        service = self.start()
+        self.load_skill(service, 'time', ['time'], 'TimeIntent')
+        self.load_skill(service, 'hello', ['hello', 'hi'], 'HelloIntent')
+        service.handle_skills_initialized(Message('initialized'))
+        service.save_snapshot()
+
+    def match(self, service, utterance):
+        intent = service._adapt_intent_match([utterance], 'en-us')
+        return intent['intent_type'] if intent else None
+
+    def ready_message(self, service):
+        for call in service.emitter.emit.call_args_list:
+            if call[0][0].type == 'intent.service.ready':
+                return call[0][0]
+
+    def test_restored_before_skills_load(self):
+        self.first_run()
+        service = self.start()
+        self.assertEqual(self.match(service, 'what time is it'),
+                         'time:TimeIntent')
+        self.assertEqual(self.match(service, 'hi there'),
+                         'hello:HelloIntent')
+        ready = self.ready_message(service)
+        self.assertEqual(ready.data['source'], 'snapshot')
+        self.assertGreater(ready.data['seconds'], 0)
+
+        # Registered again, the intents are not doubled and nothing changed
+        self.load_skill(service, 'time', ['time'], 'TimeIntent')
+        self.load_skill(service, 'hello', ['hello', 'hi'], 'HelloIntent')
+        service.handle_skills_initialized(Message('initialized'))
+        self.assertEqual(len(service.engine.intent_parsers), 2)
+        self.assertFalse(service.snapshot.save())
+
+    def test_reconcile(self):
+        self.first_run()
+        service = self.start()
+        # Updated skill, the intent was renamed and a word replaced
+        self.load_skill(service, 'time', ['clock'], 'ClockIntent')
+        self.assertEqual(self.match(service, 'show the clock'),
+                         'time:ClockIntent')
+        self.assertIsNone(self.match(service, 'what time is it'))
+        # Skill was uninstalled
+        self.assertEqual(self.match(service, 'hello'), 'hello:HelloIntent')
+        service.handle_skills_initialized(Message('initialized'))
+        self.assertIsNone(self.match(service, 'hello'))
+        self.assertEqual(list(service.engine.trie.lookup('hello')), [])
+        self.assertIsNotNone(service.snapshot_timer)
+
+        service.save_snapshot()
+        with open(self.path) as f:
+            skills = json.load(f)['skills']
+        self.assertEqual(list(skills), ['time'])
+        self.assertEqual(list(skills['time']['intents']), ['time:ClockIntent'])
+
+    def test_shared_vocab_kept(self):
+        self.first_run()
+        service = self.start()
+        # Another skill registers the vocab the updated skill dropped
+        service.handle_register_vocab(Message('register_vocab', {
+            'start': 'time', 'end': 'timeKeyword', 'skill_id': 'alarm'}))
+        self.load_skill(service, 'time', ['clock'], 'ClockIntent')
+        self.assertEqual(self.match(service, 'what time is it'),
+                         'time:ClockIntent')
+
+    def test_off_by_default(self):
+        service = IntentService(mock.Mock())
+        self.assertIsNone(service.snapshot)
+        self.assertFalse(any(c[0][0] == 'mycroft.skills.initialized'
+                             for c in service.emitter.on.call_args_list))
+
+    def test_ready_without_snapshot(self):
+        service = self.start()
+        self.assertIsNone(self.ready_message(service))
+        self.load_skill(service, 'time', ['time'], 'TimeIntent')
+        self.assertEqual(self.ready_message(service).data['source'],
+                         'skills')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import mock
+
+from mycroft.skills.intent_snapshot import IntentSnapshot
+
+INTENT = {'name': 'A:TestIntent', 'requires': [('AKeyword', 'AKeyword')],
+          'at_least_one': [], 'optional': []}
+
+
+class IntentSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = join(self.directory, 'mycroft', 'snapshot.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save(self):
+        snapshot = IntentSnapshot(self.path, 'en-us')
+        snapshot.add_vocab('A', [{'start': 'test', 'end': 'AKeyword',
+                                  'skill_id': 'A'}])
+        snapshot.add_vocab('B', [{'regex': '(?P<BName>.*)'}])
+        snapshot.add_intent(INTENT)
+        self.assertTrue(snapshot.save())
+        self.assertFalse(snapshot.save())  # Unchanged
+
+    def test_save_and_load(self):
+        self.save()
+        skills = IntentSnapshot(self.path, 'en-us').load()
+        self.assertEqual(skills['A']['vocab'],
+                         [{'start': 'test', 'end': 'AKeyword'}])
+        self.assertEqual(skills['A']['intents']['A:TestIntent']['requires'],
+                         [['AKeyword', 'AKeyword']])
+        self.assertEqual(skills['B']['vocab'], [{'regex': '(?P<BName>.*)'}])
+
+    def test_stale(self):
+        self.save()
+        snapshot = IntentSnapshot(self.path, 'en-us')
+        snapshot.load()
+        snapshot.add_vocab('A', [{'start': 'other', 'end': 'AKeyword'}])
+        snapshot.add_vocab('C', [{'start': 'test', 'end': 'AKeyword'}])
+        # The vocab dropped by A is still registered by C
+        self.assertEqual(snapshot.stale('A'), ([], ['A:TestIntent']))
+        self.assertEqual(snapshot.stale('A'), ([], []))
+        self.assertEqual(snapshot.reconcile(),
+                         ([{'regex': '(?P<BName>.*)'}], []))
+        self.assertEqual(sorted(snapshot.skills), ['A', 'C'])
+
+    def test_saved_copy(self):
+        snapshot = IntentSnapshot(self.path, 'en-us')
+        snapshot.add_intent(INTENT)
+        dump = json.dump
+
+        def add_while_writing(obj, f):
+            # Registered by a bus handler while the snapshot is written
+            snapshot.add_vocab('A', [{'start': 'late', 'end': 'AKeyword'}])
+            dump(obj, f)
+
+        with mock.patch('mycroft.skills.intent_snapshot.json.dump',
+                        add_while_writing):
+            self.assertTrue(snapshot.save())
+        # What was written matches its hash
+        skills = IntentSnapshot(self.path, 'en-us').load()
+        self.assertEqual(skills['A']['vocab'], [])
+
+    def test_other_language(self):
+        self.save()
+        self.assertEqual(IntentSnapshot(self.path, 'de-de').load(), {})
+
+    def test_corrupt_skill(self):
+        self.save()
+        with open(self.path) as f:
+            data = json.load(f)
+        data['skills']['A']['vocab'][0]['start'] = 'changed'
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+        self.assertEqual(list(IntentSnapshot(self.path, 'en-us').load()),
+                         ['B'])
+
+    def test_unreadable(self):
+        self.save()
+        with open(self.path, 'w') as f:
+            f.write('{')
+        self.assertEqual(IntentSnapshot(self.path, 'en-us').load(), {})
@@ -0,0 +1,175 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+
+import mock
+from requests.exceptions import Timeout
+
+import mycroft.stt
+from mycroft.configuration import Configuration
+
+
+class FakeSTT(mycroft.stt.STT):
+    """ Engine answering config['text'] after config['delay'] seconds. """
+    def __init__(self, config=None):
+        super(FakeSTT, self).__init__(config)
+        self.audio = []
+
+    def execute(self, audio, language=None):
+        self.audio.append(audio.frame_data)
+        time.sleep(self.config.get('delay', 0))
+        if self.config.get('error'):
+            raise ValueError(self.config['error'])
+        return self.config.get('text')
+
+
+class TestCompositeSTT(unittest.TestCase):
+    def setUp(self):
+        self.config = {'lang': 'en-US', 'stt': {'module': 'composite'}}
+        patchers = [
+            mock.patch.object(Configuration, 'get', return_value=self.config),
+            mock.patch.dict(mycroft.stt.STTFactory.CLASSES, {'fake': FakeSTT}),
+            mock.patch('mycroft.stt.report_timing')
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.report_timing = mycroft.stt.report_timing
+        self.audio = mock.Mock(frame_data=b'audio')
+
+    def create(self, policy, engines, **config):
+        config.update({'policy': policy, 'engines': [
+            dict({'module': 'fake', 'name': str(i)}, **engine)
+            for i, engine in enumerate(engines)]})
+        self.config['stt']['composite'] = config
+        return mycroft.stt.STTFactory.create()
+
+    def reports(self, *names):
+        """ Wait for the reports of the named engines. """
+        end = time.time() + 5
+        while time.time() < end:
+            reports = {c[0][3]['engine']: c[0][3]
+                       for c in self.report_timing.call_args_list}
+            if all(name in reports for name in names):
+                break
+            time.sleep(0.01)
+        return reports
+
+    def test_engine_config(self):
+        self.config['stt']['fake'] = {'text': 'shared', 'delay': 0}
+        self.config['stt']['composite'] = {
+            'engines': ['fake', {'module': 'fake', 'name': 'b', 'text': 'b'}]
+        }
+        stt = mycroft.stt.STTFactory.create()
+        self.assertEqual(stt.policy, 'first')
+        self.assertEqual([name for name, _ in stt.engines], ['fake', 'b'])
+        self.assertEqual(stt.engines[0][1].config['text'], 'shared')
+        self.assertEqual(stt.engines[1][1].config['text'], 'b')
+
+    def test_first_wins(self):
+        stt = self.create('first', [
+            {'name': 'slow', 'text': 'slow', 'delay': 0.3},
+            {'name': 'fast', 'text': 'fast'}])
+        start = time.time()
+        self.assertEqual(stt.execute(self.audio), 'fast')
+        self.assertLess(time.time() - start, 0.25)
+        reports = self.reports('slow', 'fast')
+        self.assertTrue(reports['fast']['won'])
+        self.assertFalse(reports['slow']['won'])
+        self.assertEqual(reports['slow']['win_rate'], 0.0)
+        self.assertEqual(reports['fast']['win_rate'], 1.0)
+
+    def test_first_non_empty_wins(self):
+        stt = self.create('first', [{'text': ''},
+                                    {'text': 'words', 'delay': 0.05}])
+        self.assertEqual(stt.execute(self.audio), 'words')
+
+    def test_hedge(self):
+        stt = self.create('hedge', [{'text': 'slow', 'delay': 0.5},
+                                    {'text': 'hedged'}], hedge_delay=50)
+        start = time.time()
+        self.assertEqual(stt.execute(self.audio), 'hedged')
+        self.assertLess(time.time() - start, 0.3)
+
+    def test_hedge_not_needed(self):
+        stt = self.create('hedge', [{'text': 'primary'},
+                                    {'text': 'hedged'}], hedge_delay=200)
+        self.assertEqual(stt.execute(self.audio), 'primary')
+        time.sleep(0.3)
+        self.assertEqual(stt.stats['1']['requests'], 0)
+        self.assertEqual(stt.engines[1][1].audio, [])
+
+    def test_fallback(self):
+        stt = self.create('fallback', [{'error': 'down'},
+                                       {'text': 'fallback'}])
+        self.assertEqual(stt.execute(self.audio), 'fallback')
+        stt = self.create('fallback', [{'text': 'primary', 'delay': 0.1},
+                                       {'text': 'fallback'}])
+        self.assertEqual(stt.execute(self.audio), 'primary')
+        self.assertEqual(stt.stats['1']['requests'], 0)
+
+    def test_all_failed(self):
+        stt = self.create('first', [{'error': 'first'}, {'error': 'second',
+                                                         'delay': 0.05}])
+        with self.assertRaises(ValueError):
+            stt.execute(self.audio)
+
+    def test_timeout(self):
+        stt = self.create('first', [{'text': 'slow', 'delay': 0.5}],
+                          timeout=0.1)
+        with self.assertRaises(Timeout):
+            stt.execute(self.audio)
+
+    def test_timeout_after_failure(self):
+        stt = self.create('first', [{'error': 'down'},
+                                    {'text': 'slow', 'delay': 0.5}],
+                          timeout=0.1)
+        with self.assertRaises(Timeout):
+            stt.execute(self.audio)
+
+    def stream(self, stt):
+        stream = stt.stream()
+        stream.start(16000, 2)
+        stream.feed(b'ab')
+        return stream
+
+    def test_stream_losers_cancelled(self):
+        stt = self.create('first', [{'text': 'slow', 'delay': 0.5},
+                                    {'text': 'fast'}])
+        stream = self.stream(stt)
+        self.assertEqual(stream.finish(), 'fast')
+        self.assertTrue(stream.streams[0].cancelled)
+        self.assertFalse(stream.streams[1].cancelled)
+
+    def test_stream_all_cancelled_on_timeout(self):
+        stt = self.create('first', [{'error': 'down'},
+                                    {'text': 'slow', 'delay': 0.5}],
+                          timeout=0.1)
+        stream = self.stream(stt)
+        with self.assertRaises(Timeout):
+            stream.finish()
+        self.assertTrue(all(s.cancelled for s in stream.streams))
+
+    def test_stream(self):
+        stt = self.create('hedge', [{'text': 'slow', 'delay': 0.5},
+                                    {'text': 'hedged'}], hedge_delay=50)
+        stream = stt.stream()
+        stream.start(16000, 2)
+        stream.feed(b'ab')
+        stream.feed(b'cd')
+        self.assertEqual(stream.finish(), 'hedged')
+        # The hedged engine started late and still got all audio
+        self.assertEqual(stt.engines[1][1].audio, [b'abcd'])
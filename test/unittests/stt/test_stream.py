@@ -0,0 +1,197 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+import wave
+from io import BytesIO
+
+import mock
+import requests.api
+
+import mycroft.stt
+from mycroft.configuration import Configuration
+from mycroft.stt.mock_server import MockSTTServer
+from mycroft.stt.stream import BatchSTTStream, wav_header
+
+# One second of 16 kHz 16 bit audio in 0.1 second chunks
+CHUNKS = [b'\x01\x00' * 1600] * 10
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestWavHeader(unittest.TestCase):
+    def test_header(self):
+        data = b'\x01\x00' * 100
+        wav = wave.open(BytesIO(wav_header(16000, 2, data_size=len(data)) +
+                                data))
+        self.assertEqual(wav.getframerate(), 16000)
+        self.assertEqual(wav.getsampwidth(), 2)
+        self.assertEqual(wav.getnchannels(), 1)
+        self.assertEqual(wav.readframes(1000), data)
+
+    def test_unknown_size(self):
+        data = b'\x01\x00' * 100
+        wav = wave.open(BytesIO(wav_header(16000, 2) + data))
+        self.assertEqual(wav.readframes(1000), data)
+
+
+class TestBatchSTTStream(unittest.TestCase):
+    def test_execute_on_finish(self):
+        stt = mock.Mock(lang='en-US')
+        stt.execute.return_value = 'hello'
+        stream = BatchSTTStream(stt)
+        stream.start(16000, 2)
+        for chunk in CHUNKS:
+            stream.feed(chunk)
+        self.assertFalse(stt.execute.called)
+        self.assertEqual(stream.finish(), 'hello')
+        audio, language = stt.execute.call_args[0]
+        self.assertEqual(audio.frame_data, b''.join(CHUNKS))
+        self.assertEqual(audio.sample_rate, 16000)
+        self.assertEqual(language, 'en-US')
+
+    def test_error_raised_by_finish(self):
+        stt = mock.Mock(lang='en-US')
+        stt.execute.side_effect = ValueError('failed')
+        stream = BatchSTTStream(stt)
+        stream.start(16000, 2)
+        stream.feed(CHUNKS[0])
+        with self.assertRaises(ValueError):
+            stream.finish()
+
+    def test_cancel(self):
+        stt = mock.Mock(lang='en-US')
+        stream = BatchSTTStream(stt)
+        stream.start(16000, 2)
+        for chunk in CHUNKS:
+            stream.feed(chunk)
+        stream.cancel()
+        stream.thread.join()
+        self.assertFalse(stt.execute.called)
+        self.assertIsNone(stream.result)
+        self.assertIsNone(stream.error)
+
+
+class TestStreamingEngines(unittest.TestCase):
+    def setUp(self):
+        self.server = MockSTTServer('turn on the lights',
+                                    word_duration=0.2).start()
+        self.config = {'lang': 'en-US', 'stt': {}}
+        patcher = mock.patch.object(Configuration, 'get',
+                                    return_value=self.config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Other tests replace requests.post when imported
+        patcher = mock.patch('mycroft.stt.post', requests.api.post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.stop)
+
+    def create(self, module, **config):
+        self.config['stt'] = {'module': module, module: config}
+        return mycroft.stt.STTFactory.create()
+
+    def feed(self, stream):
+        stream.start(16000, 2)
+        for chunk in CHUNKS:
+            stream.feed(chunk)
+        # The audio reaches the server before the recording is finished
+        self.assertTrue(wait_for(lambda: self.server.requests and
+                                 self.server.requests[0].bytes >=
+                                 len(b''.join(CHUNKS))))
+        self.assertIsNone(self.server.requests[0].end)
+
+    def test_deepspeech_server(self):
+        stt = self.create('deepspeech_server', uri=self.server.url('/stt'))
+        stream = stt.stream()
+        self.feed(stream)
+        self.assertEqual(stream.finish(), 'turn on the lights')
+        self.assertTrue(self.server.requests[0].chunked)
+
+    def test_deepspeech_server_cancel(self):
+        stt = self.create('deepspeech_server', uri=self.server.url('/stt'))
+        stream = stt.stream()
+        self.feed(stream)
+        stream.cancel()
+        stream.thread.join()
+        # The upload is aborted, the server never gets the end of the audio
+        self.assertIsNone(self.server.requests[0].end)
+        self.assertIsNone(stream.result)
+        self.assertIsNone(stream.error)
+
+    def test_deepspeech_server_language(self):
+        stt = self.create('deepspeech_server', uri=self.server.url('/stt'))
+        stream = stt.stream('de-DE')
+        stream.start(16000, 2)
+        with self.assertRaises(ValueError):
+            stream.finish()
+
+    def test_kaldi_http(self):
+        stt = self.create('kaldi',
+                          uri=self.server.url('/client/dynamic/recognize'))
+        stream = stt.stream()
+        self.feed(stream)
+        self.assertEqual(stream.finish(), 'turn on the lights')
+
+    def test_kaldi_websocket(self):
+        stt = self.create('kaldi',
+                          stream_uri=self.server.url('/client/ws/speech',
+                                                     'ws'))
+        partials = []
+        stream = stt.stream(on_partial=partials.append)
+        self.feed(stream)
+        self.assertTrue(wait_for(lambda: len(partials) == 4))
+        self.assertEqual(stream.finish(), 'turn on the lights')
+        self.assertEqual(partials, ['turn', 'turn on', 'turn on the',
+                                    'turn on the lights'])
+
+    def test_kaldi_websocket_cancel(self):
+        stt = self.create('kaldi',
+                          stream_uri=self.server.url('/client/ws/speech',
+                                                     'ws'))
+        stream = stt.stream()
+        self.feed(stream)
+        stream.cancel()
+        stream.thread.join()
+        self.assertIsNone(self.server.requests[0].end)
+        self.assertIsNone(stream.result)
+
+    def test_kaldi_websocket_cancel_after_audio(self):
+        stt = self.create('kaldi',
+                          stream_uri=self.server.url('/client/ws/speech',
+                                                     'ws'))
+        stream = stt.stream()
+        self.feed(stream)
+        stream.queue.put(None)  # End of the audio, like finish()
+        self.assertTrue(wait_for(lambda: self.server.requests[0].end))
+        # The results take 0.8 s, they aren't waited for
+        stream.cancel()
+        stream.thread.join(0.5)
+        self.assertFalse(stream.thread.is_alive())
+        self.assertIsNone(stream.result)
+
+    def test_kaldi_websocket_error(self):
+        stt = self.create('kaldi', stream_uri=self.server.url('/nothing',
+                                                              'ws'))
+        stream = stt.stream()
+        stream.start(16000, 2)
+        stream.feed(CHUNKS[0])
+        with self.assertRaises(Exception):
+            stream.finish()
@@ -0,0 +1,61 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from mycroft.util.mic_level import MicLevelWriter, MicLevelReader
+
+
+class TestMicLevel(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = join(self.dir, 'mic_level.mmap')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_no_writer(self):
+        self.assertIsNone(MicLevelReader(self.path).read())
+
+    def test_read(self):
+        reader = MicLevelReader(self.path)
+        writer = MicLevelWriter(self.path)
+        self.assertIsNone(reader.read())  # Nothing published yet
+        writer.set(120.0, 80.5)
+        self.assertEqual(reader.read(), (120.0, 80.5))
+        writer.set(20.0, 81.0)
+        self.assertEqual(reader.read(), (20.0, 81.0))
+
+    def test_only_changed(self):
+        writer = MicLevelWriter(self.path)
+        reader = MicLevelReader(self.path)
+        writer.set(1.0, 2.0)
+        self.assertEqual(reader.read(only_changed=True), (1.0, 2.0))
+        self.assertIsNone(reader.read(only_changed=True))
+        writer.set(1.0, 2.0)
+        self.assertEqual(reader.read(only_changed=True), (1.0, 2.0))
+
+    def test_restarted_writer(self):
+        MicLevelWriter(self.path).set(1.0, 2.0)
+        reader = MicLevelReader(self.path)
+        reader.read(only_changed=True)
+        MicLevelWriter(self.path).set(1.0, 2.0)
+        self.assertEqual(reader.read(only_changed=True), (1.0, 2.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
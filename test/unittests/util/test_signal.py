@@ -12,18 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import time
 import unittest
+from multiprocessing import Process
 from shutil import rmtree
+from threading import Timer
 
+import mock
 from os.path import exists, isfile
 
-from mycroft.util import create_signal, check_for_signal
+import mycroft.util.signal
+from mycroft.util import create_signal, check_for_signal, wait_for_signal
 
 
 class TestSignals(unittest.TestCase):
     def setUp(self):
         if exists('/tmp/mycroft'):
             rmtree('/tmp/mycroft')
+        mycroft.util.signal._registry = None
 
     def test_create_signal(self):
         create_signal('test_signal')
@@ -41,6 +47,51 @@ class TestSignals(unittest.TestCase):
         # Check that the signal is removed after use
         self.assertFalse(isfile('/tmp/mycroft/ipc/signal/test_signal'))
 
+    def test_lifetime(self):
+        create_signal('test_signal')
+        self.assertTrue(check_for_signal('test_signal', -1))
+        self.assertTrue(check_for_signal('test_signal', 10))
+        later = time.time() + 20
+        with mock.patch('mycroft.util.signal.time') as mock_time:
+            mock_time.time.return_value = later
+            self.assertFalse(check_for_signal('test_signal', 10))
+        self.assertFalse(check_for_signal('test_signal', -1))
+
+    def test_other_process(self):
+        check_for_signal('test_signal')  # Map the signal table
+        p = Process(target=create_signal, args=('test_signal',))
+        p.start()
+        p.join()
+        self.assertTrue(check_for_signal('test_signal'))
+        self.assertFalse(check_for_signal('test_signal'))
+
+    def test_external_file(self):
+        registry = mycroft.util.signal._get_registry()
+        self.assertFalse(check_for_signal('test_signal', -1))
+        mycroft.util.signal.create_file('/tmp/mycroft/ipc/signal/test_signal')
+        registry.next_sync = 0
+        registry.dir_mtime = -1
+        self.assertTrue(check_for_signal('test_signal', -1))
+
+    def test_wait_for_signal(self):
+        self.assertFalse(wait_for_signal('test_signal', timeout=0.1))
+        Timer(0.1, create_signal, args=('test_signal',)).start()
+        start = time.time()
+        self.assertTrue(wait_for_signal('test_signal', timeout=5))
+        self.assertLess(time.time() - start, 0.5)
+
+        Timer(0.1, check_for_signal, args=('test_signal',)).start()
+        self.assertTrue(wait_for_signal('test_signal', exists=False,
+                                        timeout=5))
+        self.assertFalse(check_for_signal('test_signal', -1))
+
+    def test_file_fallback(self):
+        name = 'x' * 100  # Too long for the shared table
+        create_signal(name)
+        self.assertTrue(isfile('/tmp/mycroft/ipc/signal/' + name))
+        self.assertTrue(check_for_signal(name))
+        self.assertFalse(check_for_signal(name))
+
 
 if __name__ == "__main__":
     unittest.main()